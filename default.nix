@@ -135,7 +135,7 @@ let
 in rec {
   dev = stdenv.mkDerivation rec {
     name = "dev";
-    buildInputs = [ python3 pyeda python-cryptominisat
+    buildInputs = [ python3 pyeda ppackages.numpy python-cryptominisat
                     minisolvers hypothesis cryptominisat
                     minisat depqbf rareqs bloqqer ];
   };
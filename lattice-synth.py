@@ -7,6 +7,9 @@ import argparse
 import pyeda.boolalg.expr
 
 import synth
+import synth.constraint
+import synth.base.shape_cache
+import synth.base.cnf_cache
 import synth.irredundant
 import synth.reachability
 from synth.search import Simple
@@ -15,6 +18,8 @@ from synth.search import BinaryPartition
 from synth.search import Saddleback
 
 SAT_SOLVER = ("libcryptominisat", "libminisat") + tuple(synth.sat.Dimacs.SOLVER)
+PORTFOLIO = "portfolio"
+SYNTHESIZER = ("qbf", "qbfu", "cegar", "hybrid")
 
 def parse_args():
 
@@ -22,22 +27,49 @@ def parse_args():
         (m, n) = argument.split(",", 1)
         return (int(m), int(n))
 
+    def backends(argument):
+        names = tuple(name.strip().lower() for name in argument.split(","))
+        unknown = [name for name in names if name not in SAT_SOLVER]
+        if unknown:
+            raise argparse.ArgumentTypeError(
+                "unknown SAT solver {}".format(", ".join(unknown)))
+        return names
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--sat-solver", type=str.lower, default="libminisat",
-                        choices=SAT_SOLVER,
+                        choices=SAT_SOLVER + (PORTFOLIO, ),
                         help="Which SAT solver to use (default: libminisat).")
     parser.add_argument("--list-sat-solver", action="store_true",
                         help="Print available SAT solver.")
+    parser.add_argument("--portfolio", type=backends,
+                        default=synth.sat.Portfolio.BACKENDS,
+                        help=("Comma separated SAT solvers that race each "
+                              "other with --sat-solver={} (default: "
+                              "{}).".format(PORTFOLIO, ",".join(
+                                  synth.sat.Portfolio.BACKENDS))))
     parser.add_argument("--qbf-solver", choices=synth.sat.QDimacs.SOLVER,
                         default="depqbf", type=str.lower,
                         help="Which QBF solver to use (default: depqbf).")
     parser.add_argument("--list-qbf-solver", action="store_true",
                         help="Print available QBF solver.")
-    parser.add_argument("--synthesizer", choices=("qbf", "qbfu", "cegar"),
+    parser.add_argument("--synthesizer",
+                        choices=SYNTHESIZER,
                         action="append", default=[], type=str.lower,
                         help="Use this synthesizer technique (default: all).")
     parser.add_argument("--list-synthesizer", action="store_true",
                         help="Print available synthesizer.")
+    parser.add_argument("--retry-synthesizer",
+                        choices=SYNTHESIZER,
+                        type=str.lower,
+                        help=("Synthesize a lattice size again with this "
+                              "technique if a solver reaches a limit."))
+    parser.add_argument("--time-limit", type=float, metavar="SECONDS",
+                        help=("Wall clock limit of each solver call, a call "
+                              "reaching it leaves the size unknown."))
+    parser.add_argument("--cpu-limit", type=int, metavar="SECONDS",
+                        help="CPU time limit of each solver call.")
+    parser.add_argument("--memory-limit", type=int, metavar="MIB",
+                        help="Address space limit of each solver process.")
     parser.add_argument("--search", default="simple",
                         choices=("simple", "split", "partition", "saddleback"),
                         help="Use this search technique (default: simple).")
@@ -48,6 +80,49 @@ def parse_args():
                         help="Use this synth method (default: irredundant).")
     parser.add_argument("--list-method", action="store_true",
                         help="Print available synth methods.")
+    parser.add_argument("--encoding", default="pyeda",
+                        choices=synth.base.BaseSynth.ENCODING,
+                        help=("How unfolded constraints are encoded "
+                              "(default: pyeda)."))
+    parser.add_argument("--tseitin-threshold", type=int,
+                        default=synth.base.BaseSynth.TSEITIN_THRESHOLD,
+                        help=("Encode function constraints structurally if "
+                              "their CNF would exceed this many clauses "
+                              "(default: {}).".format(
+                                  synth.base.BaseSynth.TSEITIN_THRESHOLD)))
+    parser.add_argument("--no-constant-propagation", action="store_true",
+                        help=("Don't partially evaluate unfolded constraints "
+                              "before passing them to the solver."))
+    parser.add_argument("--symmetry-breaking", action="store_true",
+                        help="Rule out mirror images of the lattice.")
+    parser.add_argument("--reduce-domain", action="store_true",
+                        help=("Only offer the literals of the ISOPs of the "
+                              "function and its dual to each position."))
+    parser.add_argument("--path-deepening", action="store_true",
+                        help=("Start the unfolded reachability paths short "
+                              "and add rounds in the same solver while "
+                              "unsatisfiable."))
+    parser.add_argument("--expanded-inputs", type=int,
+                        help=("Number of inputs the hybrid synthesizer "
+                              "expands (default: {}).".format(
+                                  synth.irredundant.HybridSynth.EXPANDED_INPUTS)))
+    parser.add_argument("--preprocess", action="store_true",
+                        help=("Simplify the CNF in-process before passing it "
+                              "to an external (Q)DIMACS solver."))
+    parser.add_argument("--cardinality-encoding", default="auto",
+                        choices=("auto",) + synth.constraint.ENCODINGS,
+                        help=("Encode cardinality constraints with this "
+                              "encoding where it applies (default: auto, "
+                              "the smallest)."))
+    parser.add_argument("--shape-cache", metavar="DIRECTORY",
+                        help=("Store the function independent clause blocks "
+                              "in this directory and reuse them across "
+                              "runs."))
+    parser.add_argument("--cnf-cache", metavar="DIRECTORY",
+                        help=("Store the encoded formulas for DIMACS and "
+                              "QDIMACS solvers in this directory and reuse "
+                              "them for the same function, synthesizer, "
+                              "lattice size and options."))
     parser.add_argument("--dump-csv", action="store_true",
                         help="Write statistics to as CSV to stdout.")
     parser.add_argument("--dump-csv-header", action="store_true",
@@ -70,6 +145,21 @@ def parse_args():
 
     if arguments.upper_bound and not arguments.search == "simple":
         parser.error("--upper-bound may only be given with --search=simple")
+    synthesizers = set(arguments.synthesizer or SYNTHESIZER)
+    synthesizers.add(arguments.retry_synthesizer)
+    if arguments.path_deepening and (arguments.method != "reachability"
+                                     or "qbfu" not in synthesizers):
+        parser.error("--path-deepening may only be given with "
+                     "--method=reachability and --synthesizer=qbfu")
+    if arguments.expanded_inputs is not None and "hybrid" not in synthesizers:
+        parser.error("--expanded-inputs may only be given with "
+                     "--synthesizer=hybrid")
+    if arguments.expanded_inputs is None:
+        arguments.expanded_inputs = \
+            synth.irredundant.HybridSynth.EXPANDED_INPUTS
+    arguments.limits = synth.sat.Limits(arguments.time_limit,
+                                        arguments.cpu_limit,
+                                        arguments.memory_limit)
 
     return arguments
 
@@ -83,7 +173,8 @@ def select_synthesizer(search, synthesizer, arguments):
                     "saddleback": Saddleback}.get(search)
     selected = (("QBF", search_class.with_qbf(module, arguments)),
                 ("QBFU", search_class.with_qbf_unfolded(module, arguments)),
-                ("CEGAR", search_class.with_cegar(module, arguments)))
+                ("CEGAR", search_class.with_cegar(module, arguments)),
+                ("HYBRID", search_class.with_hybrid(module, arguments)))
     return tuple((n, s) for (n, s) in selected if n.lower() in synthesizer) \
         or selected
 
@@ -98,7 +189,12 @@ def run_search(function, selected_synthesizer):
                   "path": function.path, "upper_height": m, "upper_width": n,
                   "lower_bound": lower_bound, "inputs": function.inputs()}
 
+        synth.constraint.reset_clause_counts()
+        synth.sat.reset_portfolio_wins()
         result.update(synthesizer.synth())
+        result["cardinality_clauses"] = synth.constraint.clause_counts()
+        wins = synth.sat.portfolio_wins()
+        if wins: result["portfolio_wins"] = wins
         yield result
 
 
@@ -129,10 +225,18 @@ def dump_csv(results, header=False):
     fieldnames = ["search", "method", "synthesizer", "solver", "path",
                   "upper_height", "upper_width", "time", "steps",
                   "solution_height", "solution_width", "lower_bound", "inputs",
-                  "unfolding_steps", "num_variables", "num_clauses"]
+                  "unfolding_steps", "num_variables", "num_clauses",
+                  "eliminated_variables", "eliminated_clauses", "path_rounds",
+                  "expanded_inputs", "cnf_cached", "portfolio_wins",
+                  "unknown_probes", "minimal"]
     writer = csv.DictWriter(sys.stdout, fieldnames=fieldnames, extrasaction="ignore")
     if header: writer.writeheader()
-    for row in results: writer.writerow(row)
+    for row in results:
+        wins = row.get("portfolio_wins")
+        if wins:
+            row = dict(row, portfolio_wins=" ".join(
+                "{}={}".format(*item) for item in sorted(wins.items())))
+        writer.writerow(row)
 
 
 def print_results(results):
@@ -141,9 +245,26 @@ def print_results(results):
         (synth_time, steps) = (row.get("time"), row.get("steps"))
         solution = row.get("solution")
         print("Timing: {} in {} steps".format(synth_time, steps))
-        if solution is None: print("No solution")
+        eliminated = (row.get("eliminated_clauses"),
+                      row.get("eliminated_variables"))
+        if any(eliminated):
+            print("Eliminated {} clauses and {} variables".format(*eliminated))
+        clauses = row.get("cardinality_clauses")
+        if clauses:
+            print("Cardinality clauses:", *("{}={}".format(*item)
+                                            for item in sorted(clauses.items())))
+        wins = row.get("portfolio_wins")
+        if wins:
+            print("Portfolio wins:", *("{}={}".format(*item)
+                                       for item in sorted(wins.items())))
+        unknown = row.get("unknown_probes")
+        if unknown: print("Probes without answer:", unknown)
+        if solution is None and unknown:
+            print("Unknown", row.get("limit") or "", sep="\n")
+        elif solution is None: print("No solution")
         else:
             print("Got solution: {solution_height} {solution_width}".format(**row))
+            if row.get("minimal") is False: print("Not proven minimal")
             if solution is not True: print(*solution, sep="\n")
         reference = row.get("reference")
         if reference: print("DP reference:", *reference, sep="\n")
@@ -153,11 +274,11 @@ def print_results(results):
 def main(*args):
     arguments = parse_args()
     if arguments.list_sat_solver:
-        print(*SAT_SOLVER, sep="\n")
+        print(*SAT_SOLVER + (PORTFOLIO, ), sep="\n")
     elif arguments.list_qbf_solver:
         print(*synth.sat.QDimacs.SOLVER, sep="\n")
     elif arguments.list_synthesizer:
-        print("qbf", "qbfu", "cegar", sep="\n")
+        print("qbf", "qbfu", "cegar", "hybrid", sep="\n")
     elif arguments.list_search:
         print("simple", "split", "partition", "saddleback", sep="\n")
     elif arguments.list_method:
@@ -165,6 +286,10 @@ def main(*args):
     elif arguments.dump_csv_header:
         dump_csv((), header=True)
     else:
+        if arguments.cardinality_encoding != "auto":
+            synth.constraint.override(arguments.cardinality_encoding)
+        synth.base.shape_cache.persist(arguments.shape_cache)
+        synth.base.cnf_cache.persist(arguments.cnf_cache)
         functions = build_functions(arguments)
         results = iterate_functions(functions, arguments)
         if arguments.dump_csv: dump_csv(results)
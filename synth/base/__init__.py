@@ -1,3 +1,4 @@
 from synth.base.synth import Synth
 from synth.base.synth import BaseSynth
 from synth.base.function import Function
+from synth.base.hybrid_synth import HybridSynthBase
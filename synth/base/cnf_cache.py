@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import os.path
+import json
+import hashlib
+import itertools as it
+
+import numpy as np
+import pyeda.boolalg.expr as expr
+
+import synth.constraint as constraint
+
+# Encoded formulas of the synthesizers that solve once are stored on disk,
+# content addressed by a hash of everything the encoding depends on: the
+# canonical form of the function, the synthesizer, the lattice size and the
+# encoding options. A hit restores the variables, clauses and quantifier
+# prefix into the new solver and skips the encoding. Only solvers keeping
+# their clauses (`Dimacs` and `QDimacs`) take part.
+
+_directory = None
+
+def persist(directory):
+    """
+    Stores encoded formulas in `directory` and loads them from it, `None`
+    disables the cache.
+    """
+    global _directory
+    if directory is not None: os.makedirs(directory, exist_ok=True)
+    _directory = directory
+
+
+def key(*parts):
+    """
+    Hash of `parts` and the cardinality encoding selection, `None` if the
+    cache is disabled or the selection may decide differently per call.
+    """
+    selection = constraint.selection()
+    if _directory is None or callable(selection): return None
+    text = repr(tuple(parts) + (selection or "auto", ))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def _path(key):
+    return os.path.join(_directory, key + ".npz")
+
+
+def _flatten(sequences, dtype):
+    sequences = [list(s) for s in sequences]
+    values = np.fromiter(it.chain.from_iterable(sequences), dtype=dtype)
+    ends = np.cumsum([len(s) for s in sequences], dtype=np.int64)
+    return (values, ends)
+
+def _split(values, ends):
+    values = values.tolist()
+    return [values[start:end]
+            for (start, end) in zip([0] + ends.tolist()[:-1], ends.tolist())]
+
+def _variable_names(variables):
+    return json.dumps([None if v is None else [list(v.names), list(v.indices)]
+                       for v in variables])
+
+def _variables(names):
+    return [None if n is None else expr.exprvar(tuple(n[0]), tuple(n[1]))
+            for n in json.loads(names)]
+
+
+def supports(solver):
+    return hasattr(solver, "encoded") and hasattr(solver, "restore")
+
+def load(solver, key):
+    """
+    Restores the formula `key` into the new `solver`, returns whether it
+    was found.
+    """
+    if not os.path.exists(_path(key)): return False
+    with np.load(_path(key)) as data:
+        clauses = data["clauses"]
+        quantifiers = list(zip(str(data["kinds"]),
+                               _split(data["quantified"],
+                                      data["quantified_ends"])))
+        solver.restore(_variables(str(data["variables"])), clauses,
+                       quantifiers)
+    return True
+
+def store(solver, key):
+    """
+    Stores the formula of `solver` as `key`.
+    """
+    (variables, clauses, quantifiers) = solver.encoded()
+    (quantified, quantified_ends) = _flatten((q for (_, q) in quantifiers),
+                                             np.int32)
+    np.savez_compressed(_path(key), clauses=np.frombuffer(clauses.literals,
+                                                          dtype=np.intc),
+                        kinds="".join(kind for (kind, _) in quantifiers),
+                        quantified=quantified, quantified_ends=quantified_ends,
+                        variables=_variable_names(variables))
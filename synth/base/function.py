@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
 
 import math
+import itertools as it
+import collections
 
 import pyeda.parsing.pla
 import pyeda.boolalg.expr as expr
 import pyeda.boolalg.table as table
 import pyeda.boolalg.minimization as minimization
 
+from synth.base.truth_table import TruthTable
+from synth.util import variable_key
+
 
 class Function:
     def __init__(self, path, function):
@@ -14,6 +19,11 @@ class Function:
         self.function = function
         self.isop_function = self._minimize(self.function)
         self.isop_dual = self._minimize(self._dual(self.function))
+        self._sorted_inputs = tuple(sorted(self.function.support,
+                                           key=variable_key))
+        self._truth_table = None
+        self._symmetry_groups = None
+        self._admissible_literals = None
 
     def __repr__(self):
         arguments = (self.path, self.function)
@@ -23,6 +33,95 @@ class Function:
     def inputs(self):
         return len(self.function.support)
 
+    def sorted_inputs(self):
+        """
+        The inputs ordered by name, unlike pyeda's `support` and `inputs`
+        this does not depend on the order the variables were created in.
+        """
+        return self._sorted_inputs
+
+    def iter_domain(self):
+        """
+        The assignments of the inputs like `iter_domain()` of pyeda, over
+        `sorted_inputs()`.
+        """
+        inputs = self.sorted_inputs()
+        for values in it.product((0, 1), repeat=len(inputs)):
+            yield dict(zip(inputs, reversed(values)))
+
+    def canonical_form(self):
+        """
+        The ISOP of the function as a string that is the same for every run
+        and every order of its products and literals.
+        """
+        products = (" & ".join(sorted(str(l) for l in self.literals(p)))
+                    for p in self.products(self.isop_function))
+        return " | ".join(sorted(products))
+
+    def truth_table(self):
+        if self._truth_table is None:
+            products = [list(self.literals(p))
+                        for p in self.products(self.isop_function)]
+            self._truth_table = TruthTable(self.sorted_inputs(), products)
+        return self._truth_table
+
+    def admissible_literals(self):
+        """
+        Literals of the ISOPs of the function and its dual. A lattice never
+        needs the others: literals of inputs the function does not depend
+        on, and the negative (positive) literal of a positive (negative)
+        unate input.
+        """
+        if self._admissible_literals is None:
+            products = it.chain(self.products(self.isop_function),
+                                self.products(self.isop_dual))
+            self._admissible_literals = frozenset(
+                l for p in products for l in self.literals(p)
+                if not (l.is_one() or l.is_zero()))
+        return self._admissible_literals
+
+    def inputs_by_frequency(self):
+        """
+        The inputs ordered by their number of occurrences in the ISOPs of the
+        function and its dual, most frequent first.
+        """
+        counts = collections.Counter()
+        products = it.chain(self.products(self.isop_function),
+                            self.products(self.isop_dual))
+        for literal in (l for p in products for l in self.literals(p)):
+            counts.update(literal.support)
+        return sorted(self.sorted_inputs(), key=lambda x: -counts[x])
+
+    def symmetry_groups(self):
+        """
+        Partition of the inputs into maximal groups of interchangeable inputs,
+        groups of a single input are left out.
+        """
+        if self._symmetry_groups is None:
+            table = self.truth_table()
+            groups = list()
+            for inp in self.sorted_inputs():
+                group = next((g for g in groups
+                              if table.symmetric(g[0], inp)), None)
+                if group is None: groups.append([inp])
+                else: group.append(inp)
+            self._symmetry_groups = [tuple(g) for g in groups if len(g) > 1]
+        return self._symmetry_groups
+
+    def symmetric_pairs(self):
+        """
+        Yields `(a, b, skew)` such that swapping the inputs `a` and `b`, and
+        complementing both if `skew`, preserves the function: consecutive
+        inputs of each symmetry group and all skew symmetric pairs.
+        """
+        for group in self.symmetry_groups():
+            yield from ((a, b, False) for (a, b) in zip(group, group[1:]))
+        table = self.truth_table()
+        inputs = self.sorted_inputs()
+        for (index, a) in enumerate(inputs):
+            for b in inputs[index + 1:]:
+                if table.symmetric(a, b, skew=True): yield (a, b, True)
+
     def naive_lattice_bounds(self):
         rows = sum(1 for _ in self.products(self.isop_dual))
         columns = sum(1 for _ in self.products(self.isop_function))
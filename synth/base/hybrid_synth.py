@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import itertools as it
+
+import pyeda.boolalg.expr as expr
+
+from synth.util import assert_cnf
+from synth.util import Expansion
+
+class HybridSynthBase:
+    """
+    Partial expansion between `QBFSynth` and `QBFUnfolded`: the
+    `expanded_inputs` inputs occurring most often in the ISOPs get a copy of
+    the path constraints per assignment, the other inputs stay universally
+    quantified. At least one input stays universal.
+
+    Mixed into the `QBFSynth` of a method, which provides the path
+    constraints per assignment as `_expanded_assertions()`.
+    """
+    EXPANDED_INPUTS = 4
+    DIMACS_NAME = "hybrid"
+
+    def __init__(self, *args, expanded_inputs=EXPANDED_INPUTS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.expanded_inputs = expanded_inputs
+
+    @classmethod
+    def _options_from_arguments(cls, arguments):
+        options = super()._options_from_arguments(arguments)
+        options["expanded_inputs"] = arguments.expanded_inputs
+        return options
+
+    def _encoding_options(self):
+        return super()._encoding_options() \
+               + (("expanded_inputs", self.expanded_inputs), )
+
+    def _expanded_count(self):
+        count = min(self.expanded_inputs, len(self.function.support) - 1)
+        return max(count, 0)
+
+    def _expanded(self):
+        inputs = self.function_container.inputs_by_frequency()
+        return inputs[:self._expanded_count()]
+
+    @assert_cnf
+    def _shared_assertions(self):
+        # `_add_one_literal_used()` adds the remaining shared clauses
+        yield from self._assert_variables_set()
+        yield from self._assert_symmetry_breaking()
+
+    def _expanded_assertions(self):
+        raise NotImplementedError()
+
+    def _add_formula(self, solver):
+        expanded = self._expanded()
+        inputs = [x for x in self.function_container.sorted_inputs()
+                  if x not in expanded]
+        elements = list(self._all_literals_at_position())
+
+        solver.exists(elements)
+        solver.forall(inputs)
+        for clause in self._shared_assertions():
+            solver.add(clause)
+        self._add_one_literal_used(solver)
+
+        shared = elements + inputs + [expr.exprvar("constant")]
+        expansion = Expansion(self._expanded_assertions(), shared, expanded)
+        for values in it.product((False, True), repeat=len(expanded)):
+            assignment = dict(zip(expanded, values))
+            solver.add_clauses(expansion.clauses(solver, assignment))
+
+    def synth(self, timer=None):
+        elements = list(self._all_literals_at_position())
+        solver = self.solver()
+        self._encode_cached(solver, self._add_formula)
+
+        self.print_dimacs(solver, self.DIMACS_NAME)
+        solution = solver.solve(of_interest=elements, no_decode=self.no_decode,
+                                timer=timer)
+        (num_clauses, num_variables) = solver.num_clauses_variables()
+        return self._build_result(solution, num_clauses=num_clauses,
+                                  num_variables=num_variables,
+                                  expanded_inputs=self._expanded_count())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import os.path
+import itertools as it
+
+import numpy as np
+
+import synth.constraint as constraint
+from synth.util import split_literals
+
+# Clause blocks that only depend on the shape of the lattice (and the number
+# of literals per position), not on the function, are generated once per
+# process and, if a directory is given, stored on disk for later processes.
+# A block is a template over slots: the slots `1..len(interface)` are the
+# interface variables given when loading it, the higher slots are its
+# auxiliaries and fresh per load.
+
+_blocks = dict()
+_directory = None
+
+def persist(directory):
+    """
+    Stores generated blocks in `directory` and loads missing ones from it,
+    `None` keeps them in memory only.
+    """
+    global _directory
+    if directory is not None: os.makedirs(directory, exist_ok=True)
+    _directory = directory
+
+def clear():
+    _blocks.clear()
+
+
+def _path(key):
+    name = "-".join(str(x) for x in key)
+    return os.path.join(_directory, name + ".npz")
+
+def _generate(size, generate):
+    counter = it.count(size + 1)
+    clauses = [list(c) for c in generate(list(range(1, size + 1)),
+                                         lambda: next(counter))]
+    literals = np.fromiter(it.chain.from_iterable(clauses), dtype=np.int64)
+    ends = np.cumsum([len(c) for c in clauses], dtype=np.int64)
+    return (literals, ends, next(counter) - size - 1)
+
+def _block(key, size, generate):
+    # a selection function may decide differently per call
+    selection = constraint.selection()
+    if callable(selection): return _generate(size, generate)
+
+    key = key + (selection or "auto", )
+    block = _blocks.get(key)
+    if block is None and _directory is not None and os.path.exists(_path(key)):
+        with np.load(_path(key)) as data:
+            block = (data["literals"], data["ends"], int(data["auxiliaries"]))
+    if block is None:
+        block = _generate(size, generate)
+        if _directory is not None:
+            (literals, ends, auxiliaries) = block
+            np.savez(_path(key), literals=literals, ends=ends,
+                     auxiliaries=auxiliaries)
+    _blocks[key] = block
+    return block
+
+def buffer(solver, key, interface, generate):
+    """
+    The clauses of the block `key` for the `interface` variables of `solver`
+    as a flat buffer of 0 terminated clauses. On a miss the block is built
+    by `generate(slots, next_aux)`, which yields integer clauses over the
+    interface slots and `next_aux()`.
+    """
+    (literals, ends, auxiliaries) = _block(tuple(key), len(interface), generate)
+    table = np.array([0] + list(interface) + solver.new_variables(auxiliaries))
+    mapped = np.sign(literals) * table[np.abs(literals)]
+    return np.insert(mapped, ends, 0).astype(np.intc)
+
+def clauses(solver, key, interface, generate):
+    """
+    Yields the clauses of `buffer()` as lists.
+    """
+    yield from split_literals(buffer(solver, key, interface, generate))
@@ -6,7 +6,12 @@ import itertools as it
 import pyeda.boolalg.expr as expr
 
 import synth.constraint as constraint
+import synth.constraint.lex as lex
+import synth.constraint.tseitin as tseitin
+import synth.base.shape_cache as shape_cache
+import synth.base.cnf_cache as cnf_cache
 from synth.util import assert_cnf
+from synth.util import ConstantPropagation
 
 class Synth:
     def __init__(self, function):
@@ -20,18 +25,39 @@ class Synth:
 
 
 class BaseSynth(Synth):
-    _counter = it.count()
+    ENCODING = ("pyeda", "integer")
+    TSEITIN_THRESHOLD = 64
 
     def __init__(self, function, m, n, solver=None, no_decode=False,
-                 dump_dimacs=False):
+                 dump_dimacs=False, encoding="pyeda",
+                 tseitin_threshold=TSEITIN_THRESHOLD,
+                 propagate_constants=True, symmetry_breaking=False,
+                 reduce_domain=False, preprocess=False, portfolio=None,
+                 limits=None):
         super().__init__(function)
         assert 1 <= m, "1 must be smaller or equal to m = {}".format(m)
         assert 1 <= n, "1 must be smaller or equal to n = {}".format(n)
+        if encoding not in self.ENCODING:
+            raise ValueError("Unknown encoding {}".format(encoding))
         self.m = m
         self.n = n
+        self.preprocess = preprocess
+        self.portfolio = portfolio
+        # `synth.sat.Limits` of each solver call
+        self.limits = limits
         self.solver = self._parse_solver(solver)
         self.no_decode = no_decode
         self.dump_dimacs = dump_dimacs
+        self.encoding = encoding
+        self.tseitin_threshold = tseitin_threshold
+        self.propagate_constants = propagate_constants
+        self.propagation = ConstantPropagation()
+        self.symmetry_breaking = symmetry_breaking
+        self.reduce_domain = reduce_domain
+        # names of the pyeda auxiliaries, reused by the next synthesis
+        self._aux_counter = it.count(1)
+        self._literal_values = None
+        self._cnf_cached = None
 
     @staticmethod
     def _select_solver(arguments):
@@ -41,24 +67,36 @@ class BaseSynth(Synth):
         raise NotImplementedError()
 
     @classmethod
-    def with_solver(cls, solver=None, no_decode=False, dump_dimacs=False):
+    def with_solver(cls, solver=None, no_decode=False, dump_dimacs=False,
+                    **options):
         def factory(function, m, n):
-            return cls(function, m, n, solver, no_decode, dump_dimacs)
+            return cls(function, m, n, solver, no_decode, dump_dimacs,
+                       **options)
         factory.solver = solver
         return factory
 
+    @staticmethod
+    def _options_from_arguments(arguments):
+        return {"encoding": arguments.encoding,
+                "tseitin_threshold": arguments.tseitin_threshold,
+                "propagate_constants": not arguments.no_constant_propagation,
+                "symmetry_breaking": arguments.symmetry_breaking,
+                "reduce_domain": arguments.reduce_domain,
+                "preprocess": arguments.preprocess,
+                "portfolio": arguments.portfolio,
+                "limits": arguments.limits}
+
     @classmethod
     def from_arguments(cls, arguments):
         solver = cls._select_solver(arguments)
-        return cls.with_solver(solver, arguments.no_decode, arguments.dump_dimacs)
+        return cls.with_solver(solver, arguments.no_decode, arguments.dump_dimacs,
+                               **cls._options_from_arguments(arguments))
 
-    @staticmethod
-    def _increment_counter():
-        return next(BaseSynth._counter)
+    def _increment_counter(self):
+        return next(self._aux_counter)
 
-    @staticmethod
-    def _next_aux(name=None, index=None):
-        count = BaseSynth._increment_counter()
+    def _next_aux(self, name=None, index=None):
+        count = self._increment_counter()
         names = ("synth", name) if name else "synth"
         indices = (index, count) if index else count
         return expr.exprvar(names, indices)
@@ -72,7 +110,12 @@ class BaseSynth(Synth):
         return result
 
     def _build_result(self, solution, **kwargs):
+        # the synthesis is finished, its auxiliaries are not needed anymore
+        self._aux_counter = it.count(1)
         result = dict(kwargs)
+        result["eliminated_clauses"] = self.propagation.eliminated_clauses
+        result["eliminated_variables"] = self.propagation.eliminated_variables
+        if self._cnf_cached is not None: result["cnf_cached"] = self._cnf_cached
         if solution is not None:
             result["solution_height"] = self.m
             result["solution_width"] = self.n
@@ -80,14 +123,74 @@ class BaseSynth(Synth):
                                  if not self.no_decode else True
         return result
 
+    def _add_clauses(self, solver, clauses, first):
+        """
+        Adds the integer `clauses` to `solver`, partially evaluated unless
+        disabled. Variables from `first` on must not occur outside `clauses`.
+        """
+        if self.propagate_constants:
+            clauses = self.propagation.simplify(clauses, first)
+        solver.add_clauses(clauses)
+
+    def _encoding_options(self):
+        """
+        The options the encoded formula depends on besides the function and
+        the lattice size.
+        """
+        return (("encoding", self.encoding),
+                ("tseitin_threshold", self.tseitin_threshold),
+                ("propagate_constants", self.propagate_constants),
+                ("symmetry_breaking", self.symmetry_breaking),
+                ("reduce_domain", self.reduce_domain))
+
+    def _cnf_cache_key(self):
+        return cnf_cache.key(type(self).__module__, type(self).__name__,
+                             self.function_container.canonical_form(),
+                             self.m, self.n, self._encoding_options())
+
+    def _encode_cached(self, solver, encode):
+        """
+        Restores the formula of the new `solver` from the CNF cache or adds
+        it by `encode(solver)` and stores it.
+        """
+        key = self._cnf_cache_key()
+        if key is None or not cnf_cache.supports(solver):
+            encode(solver)
+            return
+        self._cnf_cached = cnf_cache.load(solver, key)
+        if not self._cnf_cached:
+            encode(solver)
+            cnf_cache.store(solver, key)
+
     def _inputs_plus(self):
-        yield from self.function.support
+        yield from self.function_container.sorted_inputs()
         yield expr.exprvar("constant")
 
     def _input_literals(self):
+        """
+        The literals a position may choose. If the domain is reduced, only
+        the constants and the admissible literals of the function remain.
+        """
+        admissible = self.function_container.admissible_literals() \
+                     if self.reduce_domain else None
+        for inp in self._inputs_plus():
+            for literal in (inp, ~inp):
+                if admissible is None or literal in admissible \
+                        or inp not in self.function.support:
+                    yield literal
+
+    def _position_gadget_literals(self, i, j):
+        """
+        Yields `(input, positive, negative)` for the gadgets in
+        `synth.constraint.gadget`, a literal variable is `None` if the
+        position may not choose it.
+        """
+        literals = set(self._input_literals())
         for inp in self._inputs_plus():
-            yield inp
-            yield ~inp
+            (positive, negative) = (
+                self._literal_at_position_is(i, j, l) if l in literals else None
+                for l in (inp, ~inp))
+            yield (inp, positive, negative)
 
     def _literal_at_position_is(self, i, j, input_variable):
         negated = isinstance(input_variable, expr.Complement)
@@ -115,18 +218,63 @@ class BaseSynth(Synth):
                 for inp in self._input_literals():
                     yield self._literal_at_position_is(i, j, inp)
 
+    def _truth_values(self, assignment):
+        """
+        Returns the function value and the `(ones, zeros)` rows of the literal
+        values (ordered as `_input_literals()`) for `assignment`.
+        """
+        table = self.function_container.truth_table()
+        if self._literal_values is None:
+            literals = list(self._input_literals())
+            self._literal_values = table.literal_values(literals)
+        (ones, zeros) = self._literal_values
+        row = table.index(assignment)
+        return (table.function[row], ones[row], zeros[row])
+
+    def _encode_literals_at_position(self, solver):
+        return {(i, j): [solver.encode(self._literal_at_position_is(i, j, inp))
+                         for inp in self._input_literals()]
+                for i in range(1, self.m + 1) for j in range(1, self.n + 1)}
+
+    @staticmethod
+    def _fresh_variables(solver):
+        variables = dict()
+        def variable(*key):
+            integer = variables.get(key)
+            if integer is None:
+                integer = variables[key] = solver.new_variable()
+            return integer
+        return variable
+
+    @staticmethod
+    def _implies_any(head, conjunctions):
+        """
+        Integer clauses of `head -> Or(*(And(*c) for c in conjunctions))`,
+        expanded the same way `to_cnf()` does. `head` may be `None`.
+        """
+        prefix = [] if head is None else [-head]
+        for clause in it.product(*conjunctions):
+            yield prefix + list(clause)
+
     def _adjacent_4(self, i, j):
-        for i_ in range(1, self.m + 1):
-            for j_ in range(1, self.n + 1):
-                if abs(i - i_) + abs(j - j_) == 1:
-                    yield (i_, j_)
+        for (i_, j_) in ((i - 1, j), (i, j - 1), (i, j + 1), (i + 1, j)):
+            if 1 <= i_ <= self.m and 1 <= j_ <= self.n:
+                yield (i_, j_)
 
     def _adjacent_8(self, i, j):
-        for i_ in (i_ for i_ in range(1, self.m + 1) if abs(i - i_) <= 1):
-            for j_ in (j_ for j_ in range(1, self.n + 1) if abs(j - j_) <= 1):
+        for i_ in range(max(i - 1, 1), min(i + 1, self.m) + 1):
+            for j_ in range(max(j - 1, 1), min(j + 1, self.n) + 1):
                 if (i, j) != (i_, j_):
                     yield (i_, j_)
 
+    @assert_cnf
+    def _assert_implies(self, antecedent, consequent):
+        formula = expr.Implies(antecedent, consequent)
+        if tseitin.cnf_size(formula) > self.tseitin_threshold:
+            yield from tseitin.encode(formula, self._next_aux)
+        else:
+            yield formula.to_cnf()
+
     @assert_cnf
     def _assert_variables_set(self):
         yield expr.exprvar("constant")
@@ -137,7 +285,76 @@ class BaseSynth(Synth):
             for j in range(1, self.n + 1):
                 elements = [self._literal_at_position_is(i, j, inp)
                             for inp in self._input_literals()]
-                yield from constraint.equals(elements, 1)
+                yield from constraint.equals(elements, 1,
+                                             new_variable=self._next_aux)
+
+    def _add_one_literal_used(self, solver):
+        """
+        Adds `_assert_one_literal_used()` to `solver` from the shape cache.
+        """
+        count = sum(1 for _ in self._input_literals())
+        literals = [solver.encode(x) for x in self._all_literals_at_position()]
+
+        def generate(slots, next_aux):
+            for index in range(0, len(slots), count):
+                yield from constraint.equals_clauses(slots[index:index + count],
+                                                     1, next_aux)
+
+        key = ("one_literal_used", self.m, self.n, count)
+        solver.add_clauses(shape_cache.buffer(solver, key, literals, generate))
+
+    def _lattice_symmetries(self):
+        """
+        Mirror images of the lattice as position mappings, they preserve the
+        top-bottom and the left-right paths and thus the function.
+        """
+        if self.n > 1: yield lambda i, j: (i, self.n + 1 - j)
+        if self.m > 1: yield lambda i, j: (self.m + 1 - i, j)
+        if self.m > 1 and self.n > 1:
+            yield lambda i, j: (self.m + 1 - i, self.n + 1 - j)
+
+    def _input_symmetries(self):
+        """
+        Input literal mappings preserving the function, from the symmetric
+        input pairs of the function.
+        """
+        for (a, b, skew) in self.function_container.symmetric_pairs():
+            (c, nc) = (~b, b) if skew else (b, ~b)
+            yield {a: c, c: a, ~a: nc, nc: ~a}
+
+    def _assert_lex_leader(self, image):
+        """
+        The literal choices (row-major) must not be lexicographically greater
+        than their `image(i, j, literal)` under a symmetry. The symmetries are
+        involutions, so only variables preceding their image are compared.
+        """
+        xs = [self._literal_at_position_is(i, j, inp)
+              for i in range(1, self.m + 1) for j in range(1, self.n + 1)
+              for inp in self._input_literals()]
+        ys = [image(i, j, inp)
+              for i in range(1, self.m + 1) for j in range(1, self.n + 1)
+              for inp in self._input_literals()]
+        order = {x: index for (index, x) in enumerate(xs)}
+        pairs = [(x, y) for (index, (x, y)) in enumerate(zip(xs, ys))
+                 if index < order[y]]
+        yield from lex.less_equal([x for (x, _) in pairs],
+                                  [y for (_, y) in pairs], self._next_aux)
+
+    @assert_cnf
+    def _assert_symmetry_breaking(self):
+        """
+        Lex-leader constraints ruling out the mirror images of the lattice and
+        lattices with symmetric inputs swapped.
+        """
+        if not self.symmetry_breaking: return
+        for mirror in self._lattice_symmetries():
+            yield from self._assert_lex_leader(
+                lambda i, j, inp: self._literal_at_position_is(*mirror(i, j),
+                                                               inp))
+        for swap in self._input_symmetries():
+            yield from self._assert_lex_leader(
+                lambda i, j, inp: self._literal_at_position_is(
+                    i, j, swap.get(inp, inp)))
 
     def print_dimacs(self, solver, infix):
         if self.dump_dimacs and hasattr(solver, "print_dimacs"):
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pyeda.boolalg.expr as expr
+
+
+class TruthTable:
+    """
+    Boolean matrix of the input values over the whole domain. Row `r` holds
+    the assignment where input `b` is set iff bit `b` of `r` is set.
+    """
+    def __init__(self, inputs, products):
+        self.inputs = tuple(inputs)
+        self._positions = {x: b for (b, x) in enumerate(self.inputs)}
+        rows = np.arange(1 << len(self.inputs))
+        bits = np.arange(len(self.inputs))
+        self._points = (rows[:, np.newaxis] >> bits) & 1 == 1
+        self.function = self._evaluate(products)
+
+    def __len__(self):
+        return self._points.shape[0]
+
+    def _evaluate(self, products):
+        result = np.zeros(len(self), dtype=bool)
+        for product in products:
+            term = np.ones(len(self), dtype=bool)
+            for literal in product:
+                if literal.is_one(): continue
+                term &= self.column(literal)
+            result |= term
+        return result
+
+    def column(self, literal):
+        negated = isinstance(literal, expr.Complement)
+        var = ~literal if negated else literal
+        values = self._points[:, self._positions[var]]
+        return ~values if negated else values
+
+    def index(self, assignment):
+        return sum(1 << b for (b, x) in enumerate(self.inputs) if assignment[x])
+
+    def literal_values(self, literals):
+        """
+        Returns the matrices `(ones, zeros)` with a column per literal, which
+        tell whether the literal evaluates to one (zero) for the row. Literals
+        over variables not in `inputs` are neither.
+        """
+        ones = np.zeros((len(self), len(literals)), dtype=bool)
+        zeros = np.zeros((len(self), len(literals)), dtype=bool)
+        for (index, literal) in enumerate(literals):
+            negated = isinstance(literal, expr.Complement)
+            if (~literal if negated else literal) in self._positions:
+                ones[:, index] = self.column(literal)
+                zeros[:, index] = ~ones[:, index]
+        return (ones, zeros)
+
+    def symmetric(self, a, b, skew=False):
+        """
+        Whether the function is invariant under swapping the inputs `a` and
+        `b`, complementing both if `skew`.
+        """
+        (pa, pb) = (self._positions[a], self._positions[b])
+        rows = np.arange(len(self))
+        (va, vb) = ((rows >> pa) & 1, (rows >> pb) & 1)
+        if skew: (va, vb) = (1 - va, 1 - vb)
+        swapped = rows & ~((1 << pa) | (1 << pb)) | (vb << pa) | (va << pb)
+        return bool(np.array_equal(self.function, self.function[swapped]))
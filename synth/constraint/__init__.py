@@ -1,18 +1,149 @@
+import functools
+import collections
+import itertools as it
+
 from synth.constraint import cardnet
+from synth.constraint import pairwise
+from synth.constraint import totalizer
 
 from synth.constraint.sequential_counter import at_most_one
 from synth.constraint.sequential_counter import at_least_one
 from synth.constraint.sequential_counter import equals_one
 
+from synth.constraint.sequential_counter import at_most_one_clauses
+from synth.constraint.sequential_counter import at_least_one_clauses
+from synth.constraint.sequential_counter import equals_one_clauses
+
+# Cardinality constraints are dispatched to the encoding that produces the
+# fewest clauses (then auxiliaries) for the kind of constraint, its arity
+# and bound. The sizes are measured once per shape by generating the
+# encoding and are cached; the binomial `pairwise` encoding is only
+# considered up to `PAIRWISE_MAX_ARITY` inputs.
+
+ENCODINGS = ("pairwise", "sequential", "cardnet", "totalizer")
+PAIRWISE_MAX_ARITY = 8
+SIZE_CACHE_SIZE = 1024
+
+def _sequential(generate):
+    def clauses(inputs, p, *args, **kwargs):
+        return generate(inputs, *args, **kwargs)
+    return clauses
+
+_GENERATORS = {
+    "pairwise": {
+        "at_most": (pairwise.at_most, pairwise.at_most_clauses),
+        "at_least": (pairwise.at_least, pairwise.at_least_clauses),
+        "equals": (pairwise.equals, pairwise.equals_clauses)},
+    "sequential": {
+        "at_most": (_sequential(at_most_one),
+                    _sequential(at_most_one_clauses)),
+        "at_least": (_sequential(at_least_one),
+                     _sequential(at_least_one_clauses)),
+        "equals": (_sequential(equals_one), _sequential(equals_one_clauses))},
+    "cardnet": {
+        "at_most": (cardnet.at_most, cardnet.at_most_clauses),
+        "at_least": (cardnet.at_least, cardnet.at_least_clauses),
+        "equals": (cardnet.equals, cardnet.equals_clauses)},
+    "totalizer": {
+        "at_most": (totalizer.at_most, totalizer.at_most_clauses),
+        "at_least": (totalizer.at_least, totalizer.at_least_clauses),
+        "equals": (totalizer.equals, totalizer.equals_clauses)},
+}
+
+_override = None
+_clause_counts = collections.Counter()
+
+def override(selector):
+    """
+    Replaces the automatic selection: `selector` is the name of an encoding
+    or a function `(kind, arity, p)` returning one, `None` (as selector or
+    returned) restores the automatic selection. An encoding that does not
+    support the bound (`sequential` for `p != 1`) falls back to it as well.
+    """
+    global _override
+    if selector is not None and not callable(selector) \
+            and selector not in ENCODINGS:
+        raise ValueError("Unknown cardinality encoding {}".format(selector))
+    _override = selector
+
+
+def selection():
+    """
+    The current replacement of the automatic selection, see `override()`.
+    """
+    return _override
+
+
+def clause_counts():
+    """
+    Number of clauses emitted per encoding since the last reset.
+    """
+    return dict(_clause_counts)
+
+def reset_clause_counts():
+    _clause_counts.clear()
+
+
+def _supports(name, arity, p):
+    if name == "sequential": return p == 1
+    if name == "pairwise": return arity <= PAIRWISE_MAX_ARITY
+    return True
+
+@functools.lru_cache(maxsize=SIZE_CACHE_SIZE)
+def encoding_size(name, kind, arity, p, reified=False, half_reified=False):
+    """
+    Number of clauses and auxiliaries of encoding `name` for a `kind`
+    constraint (`"at_most"`, `"at_least"` or `"equals"`).
+    """
+    counter = it.count(arity + 2)
+    (_, generate) = _GENERATORS[name][kind]
+    equivalent = arity + 1 if reified else None
+    kwargs = {"half_reified": True} if half_reified else {}
+    clauses = generate(list(range(1, arity + 1)), p, lambda: next(counter),
+                       equivalent, **kwargs)
+    return (sum(1 for _ in clauses), next(counter) - arity - 2)
+
+def select_encoding(kind, arity, p, reified=False, half_reified=False):
+    selected = _override(kind, arity, p) if callable(_override) else _override
+    if selected is not None and _supports(selected, arity, p):
+        return selected
+    candidates = (n for n in ENCODINGS if _supports(n, arity, p))
+    return min(candidates, key=lambda n: encoding_size(n, kind, arity, p,
+                                                       reified, half_reified))
+
+
+def _dispatch(kind, integer, inputs, p, *args, equivalent=None, **kwargs):
+    inputs = list(inputs)
+    half_reified = kwargs.get("half_reified", False)
+    name = select_encoding(kind, len(inputs), p, equivalent is not None,
+                           half_reified)
+    generate = _GENERATORS[name][kind][integer]
+    for clause in generate(inputs, p, *args, equivalent, **kwargs):
+        _clause_counts[name] += 1
+        yield clause
+
+
+def at_most(inputs, p, equivalent=None, new_variable=None):
+    yield from _dispatch("at_most", False, inputs, p, equivalent=equivalent,
+                         new_variable=new_variable)
+
+def at_least(inputs, p, equivalent=None, new_variable=None):
+    yield from _dispatch("at_least", False, inputs, p, equivalent=equivalent,
+                         new_variable=new_variable)
+
+def equals(inputs, p, equivalent=None, new_variable=None, half_reified=False):
+    yield from _dispatch("equals", False, inputs, p, equivalent=equivalent,
+                         new_variable=new_variable, half_reified=half_reified)
+
 
-def at_most(inputs, p, equivalent=None):
-    if p == 1: yield from at_most_one(inputs, equivalent)
-    else: yield from cardnet.at_most(inputs, p, equivalent)
+def at_most_clauses(inputs, p, next_aux, equivalent=None):
+    yield from _dispatch("at_most", True, inputs, p, next_aux,
+                         equivalent=equivalent)
 
-def at_least(inputs, p, equivalent=None):
-    if p == 1: yield from at_least_one(inputs, equivalent)
-    else: yield from cardnet.at_least(inputs, p, equivalent)
+def at_least_clauses(inputs, p, next_aux, equivalent=None):
+    yield from _dispatch("at_least", True, inputs, p, next_aux,
+                         equivalent=equivalent)
 
-def equals(inputs, p, equivalent=None):
-    if p == 1: yield from equals_one(inputs, equivalent)
-    else: yield from cardnet.equals(inputs, p, equivalent)
+def equals_clauses(inputs, p, next_aux, equivalent=None, half_reified=False):
+    yield from _dispatch("equals", True, inputs, p, next_aux,
+                         equivalent=equivalent, half_reified=half_reified)
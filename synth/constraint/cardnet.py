@@ -1,33 +1,46 @@
 #!/usr/bin/env python3
 
+import functools
 import itertools as it
-import pyeda.boolalg.expr as expr
+
+import numpy as np
 
 from synth.util import assert_cnf
+from synth.util import expr_clauses
 
-class Cardnet:
-    _counter = it.count()
+SKELETON_CACHE_SIZE = 64
 
-    @staticmethod
-    def _next_aux(name=None, index=None):
-        count = next(Cardnet._counter)
-        names = ("cardnet", name) if name else "cardnet"
-        indices = (index, count) if index else count
-        return expr.exprvar(names, indices)
+class Cardnet:
+    """
+    Cardinality network, the outputs are the sorted inputs. By default only
+    the upward direction (enough true inputs set the output) is encoded,
+    which suffices for upper bounds. A `bidirectional` network additionally
+    encodes the downward direction, so its outputs are exact and one network
+    serves both bounds.
+    """
+    def __init__(self, next_aux, bidirectional=False):
+        self._next_aux = next_aux
+        self._bidirectional = bidirectional
 
-    @assert_cnf
     def _merger_basic_clauses(self, c1, c2, sequence_a, sequence_b):
         (a, b) = sequence_a + sequence_b
-        yield expr.Or(~a, ~b, c2)
-        yield expr.Or(~a, c1)
-        yield expr.Or(~b, c1)
+        yield [-a, -b, c2]
+        yield [-a, c1]
+        yield [-b, c1]
+        if self._bidirectional:
+            yield [-c1, a, b]
+            yield [-c2, a]
+            yield [-c2, b]
 
-    @assert_cnf
     def _merger_recursive_clauses(self, d, e, c, sequence_length):
         for i in range(1, sequence_length + 1):
-            yield expr.Or(~d[i], ~e[i - 1], c[2 * i])
-            yield expr.Or(~d[i], c[2 * i - 1])
-            yield expr.Or(~e[i - 1], c[2 * i - 1])
+            yield [-d[i], -e[i - 1], c[2 * i]]
+            yield [-d[i], c[2 * i - 1]]
+            yield [-e[i - 1], c[2 * i - 1]]
+            if self._bidirectional:
+                yield [-c[2 * i - 1], d[i], e[i - 1]]
+                yield [-c[2 * i], d[i]]
+                yield [-c[2 * i], e[i - 1]]
 
     def _h_merger(self, sequence_a, sequence_b):
         assert len(sequence_a) == len(sequence_b), "unequal lengths"
@@ -36,14 +49,14 @@ class Cardnet:
 
         seq_length = len(sequence_a)
         if seq_length == 1:
-            (c1, c2) = (self._next_aux("hm_c", 1), self._next_aux("hm_c", 2))
+            (c1, c2) = (self._next_aux(), self._next_aux())
             clauses = self._merger_basic_clauses(c1, c2, sequence_a, sequence_b)
             return ((c1, c2), clauses)
 
         (fst_vars, fst_cls) = self._h_merger(sequence_a[0::2], sequence_b[0::2])
         (snd_vars, snd_cls) = self._h_merger(sequence_a[1::2], sequence_b[1::2])
         (d, e) = (tuple(fst_vars), tuple(snd_vars))
-        c = tuple(self._next_aux("hm_c", i + 1) for i in range(2 * seq_length + 1))
+        c = tuple(self._next_aux() for i in range(2 * seq_length + 1))
 
         mrg_vars = (d[0],) + c[1:2 * seq_length - 1] + (e[-1],)
         mrg_cls = self._merger_recursive_clauses(d, e, c, seq_length - 1)
@@ -79,14 +92,14 @@ class Cardnet:
 
         seq_length = len(sequence_a)
         if seq_length == 1:
-            (c1, c2) = (self._next_aux("sm_c", 1), self._next_aux("sm_c", 1))
+            (c1, c2) = (self._next_aux(), self._next_aux())
             clauses = self._merger_basic_clauses(c1, c2, sequence_a, sequence_b)
             return ((c1, c2), clauses)
 
         (fst_vars, fst_cls) = self._s_merger(sequence_a[0::2], sequence_b[0::2])
         (snd_vars, snd_cls) = self._s_merger(sequence_a[1::2], sequence_b[1::2])
         (d, e) = (tuple(fst_vars), tuple(snd_vars))
-        c = tuple(self._next_aux("sm_c", i + 1) for i in range(seq_length + 1))
+        c = tuple(self._next_aux() for i in range(seq_length + 1))
 
         mrg_vars = (d[0],) + c[1:]
         mrg_cls = self._merger_recursive_clauses(d, e, c, seq_length // 2)
@@ -121,31 +134,102 @@ class Cardnet:
         num_variables = len(variables)
         if num_variables % k == 0: add_var = 0
         else: add_var = k * (num_variables // k + 1) - num_variables
-        additional_vars = [self._next_aux("a", i) for i in range(1, add_var + 1)]
+        additional_vars = [self._next_aux() for i in range(1, add_var + 1)]
+
+        (outputs, clauses) = self._cardnet(list(variables) + additional_vars, k)
+        if self._bidirectional:
+            padding = ([-x] for x in additional_vars)
+            return (outputs, it.chain(padding, clauses))
+        return (outputs, clauses)
+
+
+@functools.lru_cache(maxsize=SKELETON_CACHE_SIZE)
+def _skeleton(arity, p, bidirectional=False):
+    """
+    The network of `arity` inputs for bound `p` as integer clause template:
+    inputs are `1..arity`, auxiliaries follow. Returns the outputs, the
+    clauses grouped by width and the number of auxiliaries.
+    """
+    counter = it.count(arity + 1)
+    inputs = list(range(1, arity + 1))
+    network = Cardnet(lambda: next(counter), bidirectional)
+    (variables, clauses) = network.cardnet(inputs, p)
+
+    groups = dict()
+    for clause in clauses:
+        groups.setdefault(len(clause), list()).append(clause)
+    templates = tuple(np.array(c) for c in groups.values())
+    return (tuple(variables), templates, next(counter) - arity - 1)
+
+
+def _network_clauses(inputs, p, next_aux, bidirectional=False):
+    """
+    Instantiates the skeleton for `inputs`, returns the outputs and clauses.
+    """
+    (variables, templates, num_aux) = _skeleton(len(inputs), p, bidirectional)
+    auxiliaries = [next_aux() for _ in range(num_aux)]
+    table = np.array([0] + list(inputs) + auxiliaries)
+    clauses = [(np.sign(template) * table[np.abs(template)]).tolist()
+               for template in templates]
+    return (table[list(variables)].tolist(), it.chain.from_iterable(clauses))
+
+
+def at_most_clauses(inputs, p, next_aux, equivalent=None):
+    """
+    Integer version of `at_most()`: `inputs` and `equivalent` are integer
+    literals, `next_aux()` must return a fresh variable. A reified bound
+    needs exact outputs and uses the bidirectional network.
+    """
+    assert inputs, "inputs must not be empty"
+    (variables, clauses) = _network_clauses(inputs, p, next_aux,
+                                            equivalent is not None)
+    yield from clauses
 
-        return self._cardnet(list(variables) + additional_vars, k)
+    condition = -variables[p]
+    if equivalent is None:
+        yield [condition]
+    else:
+        yield [-equivalent, condition]
+        yield [-condition, equivalent]
 
-@assert_cnf
-def at_most(inputs, p, equivalent=None):
+def at_least_clauses(inputs, p, next_aux, equivalent=None):
+    assert inputs, "inputs must not be empty"
+    yield from at_most_clauses([-i for i in inputs], len(inputs) - p,
+                               next_aux, equivalent)
+
+def equals_clauses(inputs, p, next_aux, equivalent=None, half_reified=False):
+    """
+    Both bounds are read off a single bidirectional network. With
+    `half_reified` only `equivalent -> constraint` is encoded.
+    """
     assert inputs, "inputs must not be empty"
-    (variables, clauses) = Cardnet().cardnet(inputs, p)
-    condition = ~variables[p]
+    (variables, clauses) = _network_clauses(inputs, p, next_aux, True)
     yield from clauses
+
+    conditions = [-variables[p]] + ([variables[p - 1]] if p > 0 else [])
     if equivalent is None:
-        yield condition
+        yield from ([c] for c in conditions)
     else:
-        yield expr.Implies(equivalent, condition).to_cnf()
-        yield expr.Implies(condition, equivalent).to_cnf()
+        yield from ([-equivalent, c] for c in conditions)
+        if not half_reified:
+            yield [-c for c in conditions] + [equivalent]
+
+
+@assert_cnf
+def at_most(inputs, p, equivalent=None, new_variable=None):
+    assert inputs, "inputs must not be empty"
+    yield from expr_clauses(at_most_clauses, inputs, p, equivalent=equivalent,
+                            new_variable=new_variable, prefix="cardnet")
 
 @assert_cnf
-def at_least(inputs, p, equivalent=None):
+def at_least(inputs, p, equivalent=None, new_variable=None):
     assert inputs, "inputs must not be empty"
-    yield from at_most([~i for i in inputs],
-                       len(inputs) - p,
-                       equivalent)
+    yield from expr_clauses(at_least_clauses, inputs, p, equivalent=equivalent,
+                            new_variable=new_variable, prefix="cardnet")
 
 @assert_cnf
-def equals(inputs, p, equivalent=None):
+def equals(inputs, p, equivalent=None, new_variable=None, half_reified=False):
     assert inputs, "inputs must not be empty"
-    yield from at_most(inputs, p, equivalent)
-    yield from at_least(inputs, p, equivalent)
+    yield from expr_clauses(equals_clauses, inputs, p, equivalent=equivalent,
+                            new_variable=new_variable, prefix="cardnet",
+                            half_reified=half_reified)
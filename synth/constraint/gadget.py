@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+import pyeda.boolalg.expr as expr
+
+from synth.util import assert_cnf
+
+# Both gadgets relate a lattice position (`condition`) to the value of the
+# literal chosen there. `positive` (`negative`) selects `variable`
+# (`~variable`) and at most one literal may be selected per position, as
+# `_assert_one_literal_used()` ensures. This makes an auxiliary per input
+# unnecessary: two ternary clauses per input suffice for either path. A
+# literal the position may not choose is `None` and needs no clause.
+
+@assert_cnf
+def selected_true(condition, positive, negative, variable):
+    if positive is not None: yield expr.Or(~condition, ~positive, variable)
+    if negative is not None: yield expr.Or(~condition, ~negative, ~variable)
+
+@assert_cnf
+def selected_false(condition, positive, negative, variable):
+    if positive is not None: yield expr.Or(~condition, ~positive, ~variable)
+    if negative is not None: yield expr.Or(~condition, ~negative, variable)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+
+from synth.util import assert_cnf
+from synth.util import expr_clauses
+
+def less_equal_clauses(xs, ys, next_aux):
+    """
+    Integer clauses of `xs <= ys` in lexicographic order (false < true). An
+    auxiliary `e` per position holds if the prefixes up to it are equal;
+    pairs of identical variables are skipped.
+    """
+    pairs = [(x, y) for (x, y) in zip(xs, ys) if x != y]
+    equal = None
+    for (index, (x, y)) in enumerate(pairs):
+        prefix = [] if equal is None else [-equal]
+        yield prefix + [-x, y]
+        if index == len(pairs) - 1: break
+
+        (previous, equal) = (prefix, next_aux())
+        yield previous + [-x, equal]
+        yield previous + [y, equal]
+
+
+@assert_cnf
+def less_equal(xs, ys, new_variable=None):
+    xs = list(xs)
+    def generate(literals, next_aux, _equivalent):
+        yield from less_equal_clauses(literals[:len(xs)], literals[len(xs):],
+                                      next_aux)
+    yield from expr_clauses(generate, xs + list(ys), new_variable=new_variable,
+                            prefix="lex")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import itertools as it
+
+from synth.util import assert_cnf
+from synth.util import expr_clauses
+
+# The binomial encoding forbids every set of `p + 1` true inputs resp. every
+# set of `len(inputs) - p + 1` false inputs. It needs no auxiliaries and can
+# be reified without any, but grows with the binomial coefficient, so it is
+# only competitive for few inputs.
+
+def _forbidden(inputs, size, positive):
+    for subset in it.combinations(inputs, max(size, 0)):
+        yield [x if positive else -x for x in subset]
+
+
+def at_most_clauses(inputs, p, next_aux, equivalent=None):
+    """
+    Integer version of `at_most()`: `inputs` and `equivalent` are integer
+    literals, `next_aux()` is not needed.
+    """
+    assert inputs, "inputs must not be empty"
+    inputs = list(inputs)
+    if equivalent is None:
+        yield from _forbidden(inputs, p + 1, False)
+    else:
+        yield from ([-equivalent] + c for c in _forbidden(inputs, p + 1, False))
+        yield from ([equivalent] + c
+                    for c in _forbidden(inputs, len(inputs) - p, True))
+
+def at_least_clauses(inputs, p, next_aux, equivalent=None):
+    assert inputs, "inputs must not be empty"
+    yield from at_most_clauses([-i for i in inputs], len(inputs) - p,
+                               next_aux, equivalent)
+
+def equals_clauses(inputs, p, next_aux, equivalent=None, half_reified=False):
+    """
+    `~equivalent` excludes each assignment with exactly `p` true inputs.
+    """
+    assert inputs, "inputs must not be empty"
+    inputs = list(inputs)
+    bounds = it.chain(_forbidden(inputs, p + 1, False),
+                      _forbidden(inputs, len(inputs) - p + 1, True))
+    if equivalent is None:
+        yield from bounds
+        return
+
+    yield from ([-equivalent] + c for c in bounds)
+    if half_reified or p > len(inputs): return
+    for subset in it.combinations(range(len(inputs)), p):
+        yield [equivalent] + [-x if i in subset else x
+                              for (i, x) in enumerate(inputs)]
+
+
+@assert_cnf
+def at_most(inputs, p, equivalent=None, new_variable=None):
+    assert inputs, "inputs must not be empty"
+    yield from expr_clauses(at_most_clauses, inputs, p, equivalent=equivalent,
+                            new_variable=new_variable, prefix="pairwise")
+
+@assert_cnf
+def at_least(inputs, p, equivalent=None, new_variable=None):
+    assert inputs, "inputs must not be empty"
+    yield from expr_clauses(at_least_clauses, inputs, p, equivalent=equivalent,
+                            new_variable=new_variable, prefix="pairwise")
+
+@assert_cnf
+def equals(inputs, p, equivalent=None, new_variable=None, half_reified=False):
+    assert inputs, "inputs must not be empty"
+    yield from expr_clauses(equals_clauses, inputs, p, equivalent=equivalent,
+                            new_variable=new_variable, prefix="pairwise",
+                            half_reified=half_reified)
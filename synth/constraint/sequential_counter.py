@@ -1,59 +1,115 @@
 #!/usr/bin/env python3
 
-import itertools as it
 import pyeda.boolalg.expr as expr
 
 from synth.util import assert_cnf
+from synth.util import expr_clauses
 
-_counter = it.count()
+def _reified(inputs, next_aux, equivalent, at_least):
+    """
+    `equivalent <-> constraint` over an exact prefix disjunction `s`. A
+    conflict `c` is set iff its input and the disjunction of the preceding
+    inputs are set, at most one input holds iff no conflict does.
+    """
+    (prefix, conditions) = (inputs[0], list())
+    for (index, x) in enumerate(inputs[1:], 2):
+        conflict = next_aux()
+        yield [-conflict, x]
+        yield [-conflict, prefix]
+        yield [-x, -prefix, conflict]
+        conditions.append(-conflict)
 
-@assert_cnf
-def at_most_one(inputs, equivalent=None):
+        if index < len(inputs) or at_least:
+            (previous, prefix) = (prefix, next_aux())
+            yield [-prefix, previous, x]
+            yield [-previous, prefix]
+            yield [-x, prefix]
+
+    if at_least: conditions.append(prefix)
+    yield from ([-equivalent, c] for c in conditions)
+    yield [-c for c in conditions] + [equivalent]
+
+
+def at_most_one_clauses(inputs, next_aux, equivalent=None, half_reified=False):
+    """
+    Integer version of `at_most_one()`: `inputs` and `equivalent` are integer
+    literals, `next_aux()` must return a fresh variable. With `half_reified`
+    only `equivalent -> constraint` is encoded by adding `~equivalent` to
+    the counter clauses.
+    """
     assert inputs, "inputs must not be empty"
-    count = next(_counter)
+    auxiliaries = dict()
 
     def a(i):
-        return expr.exprvar("sinz", (i, count))
+        if i not in auxiliaries: auxiliaries[i] = next_aux()
+        return auxiliaries[i]
 
     def clauses(variables):
         length = len(variables)
         (first, rest, last) = (variables[0], variables[1:-1], variables[-1])
 
-        yield expr.Or(~first, a(1))
-        yield expr.Or(~last, ~a(length - 1))
+        yield [-first, a(1)]
+        yield [-last, -a(length - 1)]
 
         for (i, x) in zip(range(2, length), rest):
-            yield expr.Or(~x, a(i))
-            yield expr.Or(~a(i - 1), a(i))
-            yield expr.Or(~x, ~a(i - 1))
+            yield [-x, a(i)]
+            yield [-a(i - 1), a(i)]
+            yield [-x, -a(i - 1)]
 
     if equivalent is None:
         yield from clauses(tuple(inputs))
+    elif half_reified:
+        yield from ([-equivalent] + c for c in clauses(tuple(inputs)))
     else:
-        auxiliaries = list()
-        for clause in clauses(tuple(inputs)):
-            aux = expr.exprvar(("sinz", "eq"), next(_counter))
-            yield expr.Implies(aux, clause).to_cnf()
-            yield expr.Implies(clause, aux).to_cnf()
-            auxiliaries.append(aux)
-        constraint = expr.And(*auxiliaries)
-        yield expr.Implies(constraint, equivalent).to_cnf()
-        yield expr.Implies(equivalent, constraint).to_cnf()
+        yield from _reified(tuple(inputs), next_aux, equivalent, False)
+
+
+def at_least_one_clauses(inputs, next_aux, equivalent=None, half_reified=False):
+    assert inputs, "inputs must not be empty"
+    if equivalent is None:
+        yield list(inputs)
+    else:
+        yield [-equivalent] + list(inputs)
+        if not half_reified:
+            yield from ([-x, equivalent] for x in inputs)
+
+
+def equals_one_clauses(inputs, next_aux, equivalent=None, half_reified=False):
+    assert inputs, "inputs must not be empty"
+    if equivalent is not None and not half_reified:
+        yield from _reified(tuple(inputs), next_aux, equivalent, True)
+    else:
+        yield from at_most_one_clauses(inputs, next_aux, equivalent,
+                                       half_reified)
+        yield from at_least_one_clauses(inputs, next_aux, equivalent,
+                                        half_reified)
+
+
+@assert_cnf
+def at_most_one(inputs, equivalent=None, new_variable=None,
+                half_reified=False):
+    assert inputs, "inputs must not be empty"
+    yield from expr_clauses(at_most_one_clauses, inputs, equivalent=equivalent,
+                            new_variable=new_variable, prefix="sinz",
+                            half_reified=half_reified)
 
 
 @assert_cnf
-def at_least_one(inputs, equivalent=None):
+def at_least_one(inputs, equivalent=None, new_variable=None,
+                 half_reified=False):
     assert inputs, "inputs must not be empty"
     constraint = expr.Or(*inputs)
     if equivalent is None:
         yield constraint
     else:
         yield expr.Implies(equivalent, constraint).to_cnf()
-        yield expr.Implies(constraint, equivalent).to_cnf()
+        if not half_reified:
+            yield expr.Implies(constraint, equivalent).to_cnf()
 
 
 @assert_cnf
-def equals_one(inputs, equivalent=None):
+def equals_one(inputs, equivalent=None, new_variable=None, half_reified=False):
     assert inputs, "inputs must not be empty"
-    yield from at_most_one(inputs, equivalent)
-    yield from at_least_one(inputs, equivalent)
+    yield from expr_clauses(equals_one_clauses, inputs, equivalent=equivalent,
+                            new_variable=new_variable, prefix="sinz",
+                            half_reified=half_reified)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+from synth.util import assert_cnf
+from synth.util import expr_clauses
+
+class Totalizer:
+    """
+    Totalizer (Bailleux and Boufkhad) counting up to `k`: a binary tree of
+    unary adders whose root output `i` is set if at least `i + 1` inputs are.
+    Like `Cardnet`, only the upward direction is encoded unless the
+    totalizer is `bidirectional`.
+    """
+    def __init__(self, next_aux, k, bidirectional=False):
+        self._next_aux = next_aux
+        self._k = k
+        self._bidirectional = bidirectional
+
+    def _adder(self, a, b):
+        length = min(len(a) + len(b), self._k)
+        r = [self._next_aux() for _ in range(length)]
+        clauses = list()
+        for i in range(len(a) + 1):
+            for j in range(len(b) + 1):
+                if 0 < i + j <= length:
+                    clause = [r[i + j - 1]]
+                    if i: clause.append(-a[i - 1])
+                    if j: clause.append(-b[j - 1])
+                    clauses.append(clause)
+                if self._bidirectional and i + j < length:
+                    clause = [-r[i + j]]
+                    if i < len(a): clause.append(a[i])
+                    if j < len(b): clause.append(b[j])
+                    clauses.append(clause)
+        return (r, clauses)
+
+    def totalizer(self, variables):
+        variables = list(variables)
+        if len(variables) == 1: return (variables, [])
+
+        middle = len(variables) // 2
+        (fst_vars, fst_cls) = self.totalizer(variables[:middle])
+        (snd_vars, snd_cls) = self.totalizer(variables[middle:])
+        (vars_, cls) = self._adder(fst_vars, snd_vars)
+        return (vars_, fst_cls + snd_cls + cls)
+
+
+def _conditions(outputs, p, lower):
+    """
+    Literals that jointly hold iff at most `p` (and, if `lower`, at least
+    `p`) of the counted inputs are set, `None` if that is impossible.
+    """
+    if lower and p > len(outputs): return None
+    conditions = [-outputs[p]] if p < len(outputs) else []
+    if lower and p > 0: conditions.append(outputs[p - 1])
+    return conditions
+
+
+def _reified_clauses(conditions, equivalent, half_reified=False):
+    if conditions is None:
+        yield [-equivalent] if equivalent is not None else []
+        return
+    if equivalent is None:
+        yield from ([c] for c in conditions)
+        return
+    yield from ([-equivalent, c] for c in conditions)
+    if not half_reified:
+        yield [-c for c in conditions] + [equivalent]
+
+
+def at_most_clauses(inputs, p, next_aux, equivalent=None):
+    """
+    Integer version of `at_most()`: `inputs` and `equivalent` are integer
+    literals, `next_aux()` must return a fresh variable. A reified bound
+    needs exact outputs and uses the bidirectional totalizer.
+    """
+    assert inputs, "inputs must not be empty"
+    assert 0 <= p, "p must not be negative ({})".format(p)
+    totalizer = Totalizer(next_aux, p + 1, equivalent is not None)
+    (outputs, clauses) = totalizer.totalizer(inputs)
+    yield from clauses
+    yield from _reified_clauses(_conditions(outputs, p, False), equivalent)
+
+def at_least_clauses(inputs, p, next_aux, equivalent=None):
+    assert inputs, "inputs must not be empty"
+    yield from at_most_clauses([-i for i in inputs], len(inputs) - p,
+                               next_aux, equivalent)
+
+def equals_clauses(inputs, p, next_aux, equivalent=None, half_reified=False):
+    """
+    Both bounds are read off a single bidirectional totalizer. With
+    `half_reified` only `equivalent -> constraint` is encoded.
+    """
+    assert inputs, "inputs must not be empty"
+    assert 0 <= p, "p must not be negative ({})".format(p)
+    totalizer = Totalizer(next_aux, p + 1, True)
+    (outputs, clauses) = totalizer.totalizer(inputs)
+    yield from clauses
+    yield from _reified_clauses(_conditions(outputs, p, True), equivalent,
+                                half_reified)
+
+
+@assert_cnf
+def at_most(inputs, p, equivalent=None, new_variable=None):
+    assert inputs, "inputs must not be empty"
+    yield from expr_clauses(at_most_clauses, inputs, p, equivalent=equivalent,
+                            new_variable=new_variable, prefix="totalizer")
+
+@assert_cnf
+def at_least(inputs, p, equivalent=None, new_variable=None):
+    assert inputs, "inputs must not be empty"
+    yield from expr_clauses(at_least_clauses, inputs, p, equivalent=equivalent,
+                            new_variable=new_variable, prefix="totalizer")
+
+@assert_cnf
+def equals(inputs, p, equivalent=None, new_variable=None, half_reified=False):
+    assert inputs, "inputs must not be empty"
+    yield from expr_clauses(equals_clauses, inputs, p, equivalent=equivalent,
+                            new_variable=new_variable, prefix="totalizer",
+                            half_reified=half_reified)
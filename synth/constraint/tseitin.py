@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+import math
+import operator
+import functools
+import pyeda.boolalg.expr as expr
+
+from synth.util import assert_cnf
+from synth.util import expr_clauses
+from synth.util import literal_key
+
+class Tseitin:
+    """
+    Structural (Plaisted-Greenbaum) CNF encoding of pyeda expressions. Every
+    subexpression gets an auxiliary that is only constrained in the direction
+    required by its polarity, so the encoding stays linear in the size of the
+    expression. The operands of commutative operators are visited in a
+    canonical order, so the auxiliaries do not depend on pyeda's order.
+    """
+    COMMUTATIVE = ("and", "or", "xor", "eq")
+
+    def __init__(self, literal, next_aux):
+        self._literal = literal
+        self._next_aux = next_aux
+        self._cache = dict()
+        self._tails = dict()
+        self._keys = dict()
+        self.clauses = list()
+
+    def _key(self, expression):
+        if expression.is_one() or expression.is_zero():
+            return ("const", expression.is_one())
+        op = expression.ASTOP
+        if op == "lit": return (op, literal_key(expression))
+        if op == "not": return (op, self._key(expression.x))
+        if expression not in self._keys:
+            self._keys[expression] = (op, tuple(self._key(x) for x
+                                                in self._operands(expression)))
+        return self._keys[expression]
+
+    def _operands(self, expression):
+        if expression.ASTOP not in self.COMMUTATIVE: return expression.xs
+        return sorted(expression.xs, key=self._key)
+
+    def _constant(self, value):
+        aux = self._next_aux()
+        self.clauses.append([aux if value else -aux])
+        return aux
+
+    def encode(self, expression, positive):
+        """
+        Returns an integer literal `t` with `t -> expression` if `positive`,
+        else `expression -> t`.
+        """
+        if expression.is_one() or expression.is_zero():
+            return self._constant(expression.is_one())
+        if expression.ASTOP == "lit":
+            return self._literal(expression)
+        if expression.ASTOP == "not":
+            return -self.encode(expression.x, not positive)
+
+        key = (expression, positive)
+        if key not in self._cache:
+            aux = self._next_aux()
+            head = -aux if positive else aux
+            for clause in self._definition(expression, positive):
+                self.clauses.append([head] + clause)
+            self._cache[key] = aux
+        return self._cache[key]
+
+    def _definition(self, expression, positive):
+        """
+        Clauses `C` such that `aux -> And(*C)` (`positive`) resp.
+        `Not(And(*C)) -> ~aux` establishes the polarity of `expression`.
+        """
+        pos = functools.partial(self.encode, positive=True)
+        neg = functools.partial(self.encode, positive=False)
+        op = expression.ASTOP
+        xs = self._operands(expression)
+
+        if op == "and" and positive:
+            yield from ([pos(x)] for x in xs)
+        elif op == "and":
+            yield [-neg(x) for x in xs]
+        elif op == "or" and positive:
+            yield [pos(x) for x in xs]
+        elif op == "or":
+            yield from ([-neg(x)] for x in xs)
+        elif op == "impl" and positive:
+            (p, q) = xs
+            yield [-neg(p), pos(q)]
+        elif op == "impl":
+            (p, q) = xs
+            yield [pos(p)]
+            yield [-neg(q)]
+        elif op == "ite" and positive:
+            (s, d1, d0) = xs
+            yield [-neg(s), pos(d1)]
+            yield [pos(s), pos(d0)]
+        elif op == "ite":
+            (s, d1, d0) = xs
+            yield [-neg(s), -neg(d1)]
+            yield [pos(s), -neg(d0)]
+        elif op == "eq" and positive:
+            for (a, b) in zip(xs, xs[1:]):
+                yield [-neg(a), pos(b)]
+                yield [-neg(b), pos(a)]
+        elif op == "eq":
+            yield [-neg(x) for x in xs]
+            yield [pos(x) for x in xs]
+        elif op == "xor":
+            (a, b) = (xs[0], self._xor_tail(expression))
+            if positive:
+                yield [pos(a), pos(b)]
+                yield [-neg(a), -neg(b)]
+            else:
+                yield [-neg(a), pos(b)]
+                yield [pos(a), -neg(b)]
+        else: raise NotImplementedError(str(expression))
+
+    def _xor_tail(self, expression):
+        (_a, *rest) = self._operands(expression)
+        if len(rest) == 1: return rest[0]
+        if expression not in self._tails:
+            self._tails[expression] = expr.Xor(*rest, simplify=False)
+        return self._tails[expression]
+
+    def assert_true(self, expression):
+        if expression.ASTOP == "and":
+            for x in self._operands(expression): self.assert_true(x)
+        elif expression.ASTOP == "or":
+            self.clauses.append([self.encode(x, True)
+                                 for x in self._operands(expression)])
+        elif expression.ASTOP == "impl":
+            (p, q) = expression.xs
+            self.clauses.append([-self.encode(p, False), self.encode(q, True)])
+        else:
+            self.clauses.append([self.encode(expression, True)])
+
+
+def cnf_size(expression, positive=True):
+    """
+    Number of clauses `to_cnf()` produces for `expression` by distribution
+    (an upper bound). Operators other than and/or/not/implies count as
+    unbounded.
+    """
+    if expression.is_one() or expression.is_zero(): return 1
+    op = expression.ASTOP
+    if op == "lit": return 1
+    if op == "not": return cnf_size(expression.x, not positive)
+
+    if op == "impl":
+        (p, q) = expression.xs
+        if positive: return cnf_size(p, False) * cnf_size(q, True)
+        return cnf_size(p, True) + cnf_size(q, False)
+
+    sizes = [cnf_size(x, positive) for x in expression.xs]
+    product = functools.reduce(operator.mul, sizes, 1)
+    if op == "and": return sum(sizes) if positive else product
+    if op == "or": return product if positive else sum(sizes)
+    return math.inf
+
+
+def clauses(expression, literal, next_aux):
+    """
+    Integer clauses asserting `expression`. `literal()` must translate pyeda
+    literals and `next_aux()` must return a fresh variable.
+    """
+    encoder = Tseitin(literal, next_aux)
+    encoder.assert_true(expression)
+    yield from encoder.clauses
+
+@assert_cnf
+def encode(expression, new_variable=None):
+    support = list(expression.support)
+    def generate(variables, next_aux, _equivalent):
+        integers = dict(zip(support, variables))
+        literal = lambda x: (-integers[~x] if isinstance(x, expr.Complement)
+                             else integers[x])
+        yield from clauses(expression, literal, next_aux)
+    yield from expr_clauses(generate, support, new_variable=new_variable,
+                            prefix="tseitin")
@@ -1,3 +1,4 @@
 from synth.irredundant.qbf_synth import QBFSynth
 from synth.irredundant.qbfu_synth import QBFUnfolded
 from synth.irredundant.cegar_synth import CegarSynth
+from synth.irredundant.hybrid_synth import HybridSynth
@@ -10,24 +10,23 @@ class CegarSynth(QBFUnfolded):
     @assert_cnf
     def _assert_negative_path_exists_if_function_true(self):
         elements = (self._negative_path_var(i, self.n) for i in range(1, self.m + 1))
-        yield expr.Implies(self.function, expr.Or(*elements)).to_cnf()
+        yield from self._assert_implies(self.function, expr.Or(*elements))
 
     @assert_cnf
     def _assert_path_exists_if_function_false(self):
         elements = (self._path_var(self.m, j) for j in range(1, self.n + 1))
-        yield expr.Implies(~self.function, expr.Or(*elements)).to_cnf()
+        yield from self._assert_implies(~self.function, expr.Or(*elements))
 
     @assert_cnf
     def _all_counterexample_assertions(self):
+        # the shape only blocks are added by `_add_one_literal_used()` and
+        # `_add_paths_connected()`
         yield from self._assert_variables_set()
-        yield from self._assert_one_literal_used()
 
         yield from super(QBFUnfolded, self)._assert_lattice_on_path()
-        yield from self._assert_some_path_connected()
         yield from self._assert_negative_path_exists_if_function_true()
 
         yield from super(QBFUnfolded, self)._assert_lattice_on_negative_path()
-        yield from self._assert_some_negative_path_connected()
         yield from self._assert_path_exists_if_function_false()
 
     def synth(self, timer=None):
@@ -36,14 +35,18 @@ class CegarSynth(QBFUnfolded):
 
         for clause in self._assert_variables_set():
             refining_solver.add(clause)
-        for clause in self._assert_one_literal_used():
+        self._add_one_literal_used(refining_solver)
+        for clause in self._assert_symmetry_breaking():
             refining_solver.add(clause)
 
         for clause in self._all_counterexample_assertions():
             cexample_solver.add(clause)
+        self._add_one_literal_used(cexample_solver)
+        self._add_paths_connected(cexample_solver)
 
-        inputs = list(self.function.support)
+        inputs = list(self.function_container.sorted_inputs())
         elements = list(self._all_literals_at_position())
+        literals = self._encode_literals_at_position(refining_solver)
         unfolding_steps = 0
 
         while True:
@@ -58,12 +61,14 @@ class CegarSynth(QBFUnfolded):
             counterexample = cexample_solver.solve(of_interest=inputs,
                                                    assumptions=solution,
                                                    timer=timer)
-            if not counterexample:
+            if counterexample is None:
                 (num_clauses, num_variables) = refining_solver.num_clauses_variables()
                 return self._build_result(solution, unfolding_steps=unfolding_steps,
                                           num_clauses=num_clauses,
                                           num_variables=num_variables)
 
-            for clause in self._all_assertions_per_assignment(counterexample):
-                refining_solver.add(clause)
+            # inputs outside of the (reduced) encoding do not matter
+            counterexample = {x: counterexample.get(x, False) for x in inputs}
+            self._add_assertions_per_assignment(refining_solver, counterexample,
+                                                literals)
             unfolding_steps += 1
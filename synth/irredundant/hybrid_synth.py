@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+
+import synth
+from synth.util import assert_cnf
+from synth.irredundant import QBFSynth
+
+class HybridSynth(synth.base.HybridSynthBase, QBFSynth):
+    DIMACS_NAME = "hybrid_irredundant"
+
+    @assert_cnf
+    def _expanded_assertions(self):
+        yield from self._assert_lattice_on_path()
+        yield from self._assert_some_path_connected()
+        yield from self._assert_path_exists_if_function_true()
+        yield from self._assert_lattice_on_negative_path()
+        yield from self._assert_some_negative_path_connected()
+        yield from self._assert_negative_path_exists_if_function_false()
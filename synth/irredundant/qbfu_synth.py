@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import numpy as np
 import pyeda.boolalg.expr as expr
 
 import synth
@@ -14,19 +15,17 @@ class QBFUnfolded(QBFSynth):
         return arguments.sat_solver
 
     def _parse_solver(self, solver):
-        if solver is None or solver == "libminisat":
-            return synth.sat.Minisat
-        elif solver == "libcryptominisat":
-            return synth.sat.Cryptominisat
-        return synth.sat.Dimacs.from_known(solver)
+        return synth.sat.backend(solver, preprocess=self.preprocess,
+                                 backends=self.portfolio, limits=self.limits)
 
     @assert_cnf
     def _assert_lattice_on_path(self, assignment, path_var):
+        values = self._truth_values(assignment)[1]
+        inputs = [inp for (inp, v) in zip(self._input_literals(), values) if v]
         for i in range(1, self.m + 1):
             for j in range(1, self.n + 1):
-                elements = list(self._literal_at_position_is(i, j, inp)
-                            for inp in self._input_literals()
-                            if inp.compose(assignment).simplify().is_one())
+                elements = [self._literal_at_position_is(i, j, inp)
+                            for inp in inputs]
                 assert elements, "list of literal variables must not be empty"
                 yield expr.Implies(path_var(i, j),
                                    expr.Or(*elements)).to_cnf()
@@ -38,11 +37,12 @@ class QBFUnfolded(QBFSynth):
 
     @assert_cnf
     def _assert_lattice_on_negative_path(self, assignment, path_var):
+        values = self._truth_values(assignment)[2]
+        inputs = [inp for (inp, v) in zip(self._input_literals(), values) if v]
         for i in range(1, self.m + 1):
             for j in range(1, self.n + 1):
-                elements = list(self._literal_at_position_is(i, j, inp)
-                            for inp in self._input_literals()
-                            if inp.compose(assignment).simplify().is_zero())
+                elements = [self._literal_at_position_is(i, j, inp)
+                            for inp in inputs]
                 assert elements, "list of literal variables must not be empty"
                 yield expr.Implies(path_var(i, j),
                                    expr.Or(*elements)).to_cnf()
@@ -62,7 +62,7 @@ class QBFUnfolded(QBFSynth):
             assert 1 <= j <= self.n
             return expr.exprvar("path", (i, j, count))
 
-        evaluated = self.function.compose(assignment).simplify().is_one()
+        evaluated = self._truth_values(assignment)[0]
         if evaluated:
             yield from self._assert_lattice_on_path(assignment, path_var)
             yield from self._assert_some_path_connected(path_var)
@@ -72,19 +72,67 @@ class QBFUnfolded(QBFSynth):
             yield from self._assert_some_negative_path_connected(path_var)
             yield from self._assert_negative_path_exists_if_function_false(path_var)
 
+    def _clauses_lattice_on_path(self, selected, literals, path_var):
+        for i in range(1, self.m + 1):
+            for j in range(1, self.n + 1):
+                elements = [literals[(i, j)][x] for x in selected]
+                assert elements, "list of literal variables must not be empty"
+                yield [-path_var(i, j)] + elements
+
+    def _clauses_per_assignment(self, solver, assignment, literals):
+        """
+        Integer version of `_all_assertions_per_assignment()`, `literals` are
+        the encoded position variables of `solver`.
+        """
+        path = solver.new_variables(self.m * self.n)
+
+        def path_var(i, j):
+            assert 1 <= i <= self.m
+            assert 1 <= j <= self.n
+            return path[(i - 1) * self.n + j - 1]
+
+        (evaluated, ones, zeros) = self._truth_values(assignment)
+        selected = np.flatnonzero(ones if evaluated else zeros)
+        yield from self._clauses_lattice_on_path(selected, literals, path_var)
+        yield from self._clauses_connected(solver, path, not evaluated)
+        if evaluated:
+            yield [path_var(self.m, j) for j in range(1, self.n + 1)]
+        else:
+            yield [path_var(i, self.n) for i in range(1, self.m + 1)]
+
+    def _add_assertions_per_assignment(self, solver, assignment, literals):
+        first = solver.num_variables() + 1
+        if self.encoding == "integer":
+            clauses = self._clauses_per_assignment(solver, assignment, literals)
+        else:
+            cnfs = self._all_assertions_per_assignment(assignment)
+            clauses = (c for cnf in cnfs for c in solver.encode_cnf(cnf))
+        self._add_clauses(solver, clauses, first)
+
     @assert_cnf
     def _all_assertions(self):
         yield from self._assert_variables_set()
         yield from self._assert_one_literal_used()
+        yield from self._assert_symmetry_breaking()
 
-        for assignment in self.function.iter_domain():
+        for assignment in self.function_container.iter_domain():
             yield from self._all_assertions_per_assignment(assignment)
 
+    def _add_formula(self, solver):
+        for clause in self._assert_variables_set():
+            solver.add(clause)
+        self._add_one_literal_used(solver)
+        for clause in self._assert_symmetry_breaking():
+            solver.add(clause)
+
+        literals = self._encode_literals_at_position(solver)
+        for assignment in self.function_container.iter_domain():
+            self._add_assertions_per_assignment(solver, assignment, literals)
+
     def synth(self, timer=None):
         elements = list(self._all_literals_at_position())
         solver = self.solver()
-        for clause in self._all_assertions():
-            solver.add(clause)
+        self._encode_cached(solver, self._add_formula)
 
         self.print_dimacs(solver, "irredundant")
         solution = solver.solve(of_interest=elements, no_decode=self.no_decode,
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import sys
+import resource
+
+import minisolvers
+
+# A small incremental SAT solver on top of the `PyMiniSolvers` binding, a
+# stand-in for solvers speaking the session protocol of
+# `synth.sat.IncrementalDimacs` (the iCNF format). It reads from stdin
+#
+#   p inccnf            the header
+#   1 -2 0              a clause, one per line
+#   a 2 0               solve under the assumptions, here `2`
+#
+# and answers each query with a line `c time <seconds>` (the CPU time of the
+# query), followed by `s SATISFIABLE` and a line `v <model> 0` or by
+# `s UNSATISFIABLE`. The clauses, and what the solver learnt from them, are
+# kept until stdin is closed.
+
+def _literals(fields):
+    assert fields and fields[-1] == "0", "unterminated line"
+    return [int(x) for x in fields[:-1]]
+
+def _new_vars(solver, literals):
+    for _ in range(max((abs(x) for x in literals), default=0)
+                   - solver.nvars()):
+        solver.new_var()
+
+def _solve(solver, assumptions, output):
+    _new_vars(solver, assumptions)
+    start = resource.getrusage(resource.RUSAGE_SELF).ru_utime
+    sat = solver.solve(assumptions=assumptions)
+    elapsed = resource.getrusage(resource.RUSAGE_SELF).ru_utime - start
+    print("c time {:f}".format(elapsed), file=output)
+    if not sat:
+        print("s UNSATISFIABLE", file=output)
+    else:
+        model = solver.get_model()
+        print("s SATISFIABLE", file=output)
+        print("v", *(i if x else -i for (i, x) in enumerate(model, 1)), 0,
+              file=output)
+    output.flush()
+
+
+def main(input=sys.stdin, output=sys.stdout):
+    solver = minisolvers.MinisatSolver()
+    for line in input:
+        fields = line.split()
+        if not fields or fields[0] in ("c", "p"): continue
+        elif fields[0] == "a":
+            _solve(solver, _literals(fields[1:]), output)
+        else:
+            clause = _literals(fields)
+            _new_vars(solver, clause)
+            solver.add_clause(clause)
+
+
+if __name__ == "__main__":
+    main()
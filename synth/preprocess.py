@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+import itertools as it
+import collections
+
+
+class Preprocessor:
+    """
+    Simplification of integer clauses before they are written for an
+    external solver: unit propagation, removal of subsumed clauses,
+    substitution of equivalent literals and bounded variable elimination.
+
+    Only the `eliminable` variables (all if `None`) are fixed, substituted or
+    eliminated, the clauses of the others are merely shortened or dropped.
+    For a QBF these are the variables of the innermost existential block.
+    `extend()` maps a model of the simplified clauses back onto the removed
+    variables.
+    """
+    OCCURRENCE_LIMIT = 16
+    ROUNDS = 4
+
+    def __init__(self, eliminable=None, occurrence_limit=OCCURRENCE_LIMIT):
+        self._eliminable = eliminable
+        self._occurrence_limit = occurrence_limit
+        self._clauses = dict()
+        self._occurrences = collections.defaultdict(set)
+        self._counter = it.count()
+        self._units = list()
+        self._values = dict()
+        self._stack = list()
+
+    def _is_eliminable(self, variable):
+        return self._eliminable is None or variable in self._eliminable
+
+    def _add(self, clause):
+        clause = frozenset(clause)
+        if any(-x in clause for x in clause): return
+        index = next(self._counter)
+        self._clauses[index] = clause
+        for x in clause: self._occurrences[x].add(index)
+        if len(clause) == 1: self._units.append(next(iter(clause)))
+
+    def _remove(self, index):
+        clause = self._clauses.pop(index)
+        for x in clause: self._occurrences[x].discard(index)
+        return clause
+
+    def _propagate(self):
+        """
+        Fixes the eliminable variables of unit clauses, returns `False` on a
+        conflict.
+        """
+        while self._units:
+            literal = self._units.pop()
+            variable = abs(literal)
+            if not self._is_eliminable(variable): continue
+            # the unit clause may have been removed since
+            if not any(len(self._clauses[i]) == 1
+                       for i in self._occurrences[literal]):
+                continue
+            value = self._values.get(variable)
+            if value is not None:
+                if value != (literal > 0): return False
+                continue
+
+            self._values[variable] = literal > 0
+            for index in list(self._occurrences[literal]):
+                self._remove(index)
+            for index in list(self._occurrences[-literal]):
+                clause = self._remove(index) - {-literal}
+                if not clause: return False
+                self._add(clause)
+        return True
+
+    def _components(self):
+        """
+        Strongly connected components of the binary implication graph
+        (iterative Tarjan).
+        """
+        graph = collections.defaultdict(list)
+        for clause in self._clauses.values():
+            if len(clause) == 2:
+                (a, b) = clause
+                graph[-a].append(b)
+                graph[-b].append(a)
+
+        (index, lowlink, stack, on_stack) = (dict(), dict(), list(), set())
+        counter = it.count()
+        for root in list(graph):
+            if root in index: continue
+            work = [(root, iter(graph[root]))]
+            index[root] = lowlink[root] = next(counter)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                (node, successors) = work[-1]
+                successor = next(successors, None)
+                if successor is not None:
+                    if successor not in index:
+                        index[successor] = lowlink[successor] = next(counter)
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(graph[successor])))
+                    elif successor in on_stack:
+                        lowlink[node] = min(lowlink[node], index[successor])
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = list()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node: break
+                    yield component
+
+    def _substitute_equivalences(self):
+        """
+        Replaces eliminable variables by a representative of their class of
+        equivalent literals, preferring variables that must be kept. Returns
+        `False` if a literal is equivalent to its complement.
+        """
+        mapping = dict()
+        for component in self._components():
+            if len(component) < 2: continue
+            if any(-x in component for x in component): return False
+            representative = min(component, key=lambda x: (
+                self._is_eliminable(abs(x)), abs(x)))
+            for literal in component:
+                if literal != representative \
+                        and self._is_eliminable(abs(literal)):
+                    mapping[literal] = representative
+                    mapping[-literal] = -representative
+
+        for (literal, representative) in mapping.items():
+            if literal < 0: continue
+            self._stack.append(("substitute", literal, representative))
+            for index in list(self._occurrences[literal]
+                              | self._occurrences[-literal]):
+                clause = self._remove(index)
+                self._add(mapping.get(x, x) for x in clause)
+        return True
+
+    def _subsume(self):
+        for index in sorted(self._clauses, key=lambda i: len(self._clauses[i])):
+            clause = self._clauses.get(index)
+            if clause is None: continue
+            literal = min(clause, key=lambda x: len(self._occurrences[x]))
+            for other in list(self._occurrences[literal]):
+                if other != index and clause <= self._clauses[other]:
+                    self._remove(other)
+
+    def _resolvents(self, variable, positive, negative):
+        limit = len(positive) + len(negative)
+        resolvents = list()
+        for (p, n) in it.product(positive, negative):
+            resolvent = (p - {variable}) | (n - {-variable})
+            if any(-x in resolvent for x in resolvent): continue
+            resolvents.append(resolvent)
+            if len(resolvents) > limit: return None
+        return resolvents
+
+    def _eliminate_variables(self):
+        """
+        Eliminates variables by resolution if that does not add clauses,
+        returns `False` on a conflict.
+        """
+        variables = {abs(x) for (x, o) in self._occurrences.items() if o}
+        candidates = sorted((v for v in variables if self._is_eliminable(v)),
+                            key=lambda v: len(self._occurrences[v])
+                                          + len(self._occurrences[-v]))
+        for variable in candidates:
+            (positive, negative) = (self._occurrences[variable],
+                                    self._occurrences[-variable])
+            # fixed or gone by an earlier elimination
+            if not (positive or negative): continue
+            if len(positive) + len(negative) > self._occurrence_limit:
+                continue
+            clauses = [[self._clauses[i] for i in sorted(o)]
+                       for o in (positive, negative)]
+            resolvents = self._resolvents(variable, *clauses)
+            if resolvents is None: continue
+
+            self._stack.append(("eliminate", variable, clauses[0]))
+            for index in list(positive | negative):
+                self._remove(index)
+            for resolvent in resolvents:
+                if not resolvent: return False
+                self._add(resolvent)
+            if not self._propagate(): return False
+        return True
+
+    def simplify(self, clauses):
+        """
+        Returns the simplified `clauses`, `[[]]` if they are unsatisfiable.
+        """
+        for clause in clauses: self._add(clause)
+        for _ in range(self.ROUNDS):
+            size = (len(self._clauses), len(self._values), len(self._stack))
+            if not (self._propagate() and self._substitute_equivalences()
+                    and self._propagate()):
+                return [[]]
+            self._subsume()
+            if not self._eliminate_variables(): return [[]]
+            if size == (len(self._clauses), len(self._values),
+                        len(self._stack)):
+                break
+        return [sorted(c, key=abs) for c in self._clauses.values()]
+
+    def extend(self, model):
+        """
+        Extends a model (integer literals) of the simplified clauses to the
+        removed variables.
+        """
+        values = {abs(x): x > 0 for x in model if x != 0}
+        values.update(self._values)
+        holds = lambda x: values.get(abs(x), False) == (x > 0)
+        for (kind, variable, data) in reversed(self._stack):
+            if kind == "substitute":
+                values[variable] = holds(data)
+            else:
+                # the clauses with the positive literal are kept in `data`
+                values[variable] = not all(any(holds(x) for x in c
+                                               if x != variable)
+                                           for c in data)
+        return [v if value else -v for (v, value) in sorted(values.items())]
@@ -1,3 +1,4 @@
 from synth.reachability.qbf_synth import QBFSynth
 from synth.reachability.qbfu_synth import QBFUnfolded
 from synth.reachability.cegar_synth import CegarSynth
+from synth.reachability.hybrid_synth import HybridSynth
@@ -12,26 +12,25 @@ class CegarSynth(QBFUnfolded):
         elements = (self._inactive_switch(i, self.n) & \
                     self._position_unreachable(i, self.n, self._upper_path_bound())
                     for i in range(1, self.m + 1))
-        yield expr.Implies(self.function, expr.Or(*elements)).to_cnf()
+        yield from self._assert_implies(self.function, expr.Or(*elements))
 
     @assert_cnf
     def _assert_path_exists_if_function_false(self):
         elements = (self._active_switch(self.m, j) & \
                     self._position_reachable(self.m, j, self._upper_path_bound())
                     for j in range(1, self.n + 1))
-        yield expr.Implies(~self.function, expr.Or(*elements)).to_cnf()
+        yield from self._assert_implies(~self.function, expr.Or(*elements))
 
     @assert_cnf
     def _all_counterexample_assertions(self):
+        # the rounds of the paths are added by `_clauses_paths()`, the shape
+        # only block by `_add_one_literal_used()`
         yield from self._assert_variables_set()
-        yield from self._assert_one_literal_used()
 
         yield from super(QBFUnfolded, self)._assert_switch_active()
-        yield from self._assert_positive_path()
         yield from self._assert_negative_path_exists_if_function_true()
 
         yield from super(QBFUnfolded, self)._assert_switch_inactive()
-        yield from self._assert_negative_path()
         yield from self._assert_path_exists_if_function_false()
 
     def synth(self, timer=None):
@@ -40,19 +39,23 @@ class CegarSynth(QBFUnfolded):
 
         for clause in self._assert_variables_set():
             refining_solver.add(clause)
-        for clause in self._assert_one_literal_used():
+        self._add_one_literal_used(refining_solver)
+        for clause in self._assert_symmetry_breaking():
             refining_solver.add(clause)
 
         for clause in self._all_counterexample_assertions():
             cexample_solver.add(clause)
+        self._add_one_literal_used(cexample_solver)
+        cexample_solver.add_clauses(self._clauses_paths(cexample_solver))
 
-        inputs = list(self.function.support)
+        inputs = list(self.function_container.sorted_inputs())
         elements = list(self._all_literals_at_position())
+        literals = self._encode_literals_at_position(refining_solver)
         unfolding_steps = 0
 
         while True:
-            solution = refining_solver.solve(of_interest=elements, timer=timer,
-                                             simplify=True)
+            solution = self._solve(refining_solver, of_interest=elements,
+                                   timer=timer, simplify=True)
             if not solution:
                 (num_clauses, num_variables) = refining_solver.num_clauses_variables()
                 return self._build_result(None, unfolding_steps=unfolding_steps,
@@ -63,12 +66,14 @@ class CegarSynth(QBFUnfolded):
                                                    assumptions=solution,
                                                    timer=timer)
 
-            if not counterexample:
+            if counterexample is None:
                 (num_clauses, num_variables) = refining_solver.num_clauses_variables()
                 return self._build_result(solution, unfolding_steps=unfolding_steps,
                                           num_clauses=num_clauses,
                                           num_variables=num_variables)
 
-            for clause in self._all_assertions_per_assignment(counterexample):
-                refining_solver.add(clause)
+            # inputs outside of the (reduced) encoding do not matter
+            counterexample = {x: counterexample.get(x, False) for x in inputs}
+            self._add_assertions_per_assignment(refining_solver, counterexample,
+                                                literals)
             unfolding_steps += 1
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+
+import synth
+from synth.util import assert_cnf
+from synth.reachability import QBFSynth
+
+class HybridSynth(synth.base.HybridSynthBase, QBFSynth):
+    DIMACS_NAME = "hybrid_reachability"
+
+    @assert_cnf
+    def _expanded_assertions(self):
+        yield from self._assert_switch_active()
+        yield from self._assert_positive_path()
+        yield from self._assert_path_exists_if_function_true()
+        yield from self._assert_switch_inactive()
+        yield from self._assert_negative_path()
+        yield from self._assert_negative_path_exists_if_function_false()
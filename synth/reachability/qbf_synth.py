@@ -1,19 +1,29 @@
 #!/usr/bin/env python3
 
+import functools
+
+import numpy as np
 import pyeda.boolalg.expr as expr
 
 import synth
 import synth.sat
+import synth.constraint.gadget as gadget
 from synth.util import assert_cnf
+from synth.reachability.unrolling import Unrolling
 
 class QBFSynth(synth.base.BaseSynth):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._unrollings = dict()
+
     @staticmethod
     def _select_solver(arguments):
         return arguments.qbf_solver
 
     def _parse_solver(self, solver):
-        if solver is None: return synth.sat.QDimacs.from_known("depqbf")
-        return synth.sat.QDimacs.from_known(solver)
+        return synth.sat.QDimacs.from_known(solver or "depqbf",
+                                            preprocess=self.preprocess,
+                                            limits=self.limits)
 
     def _upper_path_bound(self):
         return (self.m * self.n) // 2
@@ -40,21 +50,13 @@ class QBFSynth(synth.base.BaseSynth):
 
     @assert_cnf
     def _assert_switch_active(self):
-        def _set(i, j, inp):
-            return self._literal_at_position_is(i, j, inp) & inp
-        def _negated(i, j, inp):
-            return self._literal_at_position_is(i, j, ~inp)  & ~inp
-
         for i in range(1, self.m + 1):
             for j in range(1, self.n + 1):
-                auxiliaries = list()
-                for inp in self._inputs_plus():
-                    aux = self._next_aux("switch_active")
-                    on_path = _set(i, j, inp) | _negated(i, j, inp)
-                    auxiliaries.append(aux)
-                    yield expr.Implies(aux, on_path).to_cnf()
-                yield expr.Implies(self._active_switch(i, j),
-                                   expr.Or(*auxiliaries)).to_cnf()
+                condition = self._active_switch(i, j)
+                for (inp, positive, negative) in \
+                        self._position_gadget_literals(i, j):
+                    yield from gadget.selected_true(condition, positive,
+                                                    negative, inp)
 
     @assert_cnf
     def _assert_positive_path(self, switch_var=None, position_var=None):
@@ -94,25 +96,17 @@ class QBFSynth(synth.base.BaseSynth):
         elements = (self._active_switch(self.m, j) & \
                     self._position_reachable(self.m, j, self._upper_path_bound())
                     for j in range(1, self.n + 1))
-        yield expr.Implies(self.function, expr.Or(*elements)).to_cnf()
+        yield from self._assert_implies(self.function, expr.Or(*elements))
 
     @assert_cnf
     def _assert_switch_inactive(self):
-        def _set(i, j, inp):
-            return self._literal_at_position_is(i, j, inp) & ~inp
-        def _negated(i, j, inp):
-            return self._literal_at_position_is(i, j, ~inp) & inp
-
         for i in range(1, self.m + 1):
             for j in range(1, self.n + 1):
-                auxiliaries = list()
-                for inp in self._inputs_plus():
-                    aux = self._next_aux("switch_inactive")
-                    on_neg_path = _set(i, j, inp) | _negated(i, j, inp)
-                    auxiliaries.append(aux)
-                    yield expr.Implies(aux, on_neg_path).to_cnf()
-                yield expr.Implies(self._inactive_switch(i, j),
-                                   expr.Or(*auxiliaries)).to_cnf()
+                condition = self._inactive_switch(i, j)
+                for (inp, positive, negative) in \
+                        self._position_gadget_literals(i, j):
+                    yield from gadget.selected_false(condition, positive,
+                                                     negative, inp)
 
     @assert_cnf
     def _assert_negative_path(self, switch_var=None, position_var=None):
@@ -152,30 +146,82 @@ class QBFSynth(synth.base.BaseSynth):
         elements = (self._inactive_switch(i, self.n) & \
                     self._position_unreachable(i, self.n, self._upper_path_bound())
                     for i in range(1, self.m + 1))
-        yield expr.Implies(~self.function, expr.Or(*elements)).to_cnf()
+        yield from self._assert_implies(~self.function, expr.Or(*elements))
+
+    def _unrolling(self, diagonal, rounds):
+        if (diagonal, rounds) not in self._unrollings:
+            self._unrollings[(diagonal, rounds)] = Unrolling(self.m, self.n,
+                                                             diagonal, rounds)
+        return self._unrollings[(diagonal, rounds)]
+
+    def _lattice_variables(self, solver, variable, *args):
+        return np.array([solver.encode(variable(i, j, *args))
+                         for i in range(1, self.m + 1)
+                         for j in range(1, self.n + 1)])
+
+    def _clauses_path(self, solver, switch, last, diagonal, rounds=None,
+                      previous=None):
+        """
+        Integer version of `_assert_positive_path()` (`_assert_negative_path()`
+        if `diagonal`). `switch` and `last` hold the switch and the final round
+        variables per position (row-major), the variables of the other rounds
+        are fresh. `rounds` defaults to `_upper_path_bound()`, the rounds
+        continue from the round variables `previous` if given.
+        """
+        if self.m == 1 or self.n == 1:
+            yield from ([-r, s] for (r, s) in zip(last.tolist(), switch.tolist()))
+            if self.m == 1 if diagonal else self.n == 1:
+                yield from ([-b, a] for (a, b) in zip(last[:-1].tolist(),
+                                                      last[1:].tolist()))
+        else:
+            rounds = self._upper_path_bound() if rounds is None else rounds
+            unrolling = self._unrolling(diagonal, rounds)
+            size = unrolling.size * unrolling.rounds
+            if previous is None:
+                reachable = solver.new_variables(size) + last.tolist()
+            else:
+                reachable = previous.tolist() \
+                            + solver.new_variables(size - unrolling.size) \
+                            + last.tolist()
+            step = solver.new_variables(size)
+            yield from unrolling.clauses(switch, reachable, step,
+                                         initial=previous is None)
+
+    def _clauses_paths(self, solver):
+        upper = self._upper_path_bound()
+        variables = functools.partial(self._lattice_variables, solver)
+        yield from self._clauses_path(
+            solver, variables(self._active_switch),
+            variables(self._position_reachable, upper), False)
+        yield from self._clauses_path(
+            solver, variables(self._inactive_switch),
+            variables(self._position_unreachable, upper), True)
 
     @assert_cnf
     def _all_assertions(self):
+        # the rounds of the paths are added by `_clauses_paths()`, the shape
+        # only block by `_add_one_literal_used()`
         yield from self._assert_variables_set()
-        yield from self._assert_one_literal_used()
+        yield from self._assert_symmetry_breaking()
 
         yield from self._assert_switch_active()
-        yield from self._assert_positive_path()
         yield from self._assert_path_exists_if_function_true()
 
         yield from self._assert_switch_inactive()
-        yield from self._assert_negative_path()
         yield from self._assert_negative_path_exists_if_function_false()
 
+    def _add_formula(self, solver):
+        solver.exists(list(self._all_literals_at_position()))
+        solver.forall(list(self.function_container.sorted_inputs()))
+        for clause in self._all_assertions():
+            solver.add(clause)
+        self._add_one_literal_used(solver)
+        solver.add_clauses(self._clauses_paths(solver))
+
     def synth(self, timer=None):
-        inputs = list(self.function.support)
         elements = list(self._all_literals_at_position())
-
         solver = self.solver()
-        solver.exists(elements)
-        solver.forall(inputs)
-        for clause in self._all_assertions():
-            solver.add(clause)
+        self._encode_cached(solver, self._add_formula)
 
         self.print_dimacs(solver, "reachability")
         solution = solver.solve(of_interest=elements, no_decode=self.no_decode,
@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
 
+import collections
+import itertools as it
+
+import numpy as np
 import pyeda.boolalg.expr as expr
 
 import synth
@@ -8,25 +12,49 @@ from synth.util import assert_cnf
 
 from synth.reachability import QBFSynth
 
+# The integer variables of a path of an assignment: switch and final round per
+# position, whether it is a negative path and the slice of its end positions.
+_Path = collections.namedtuple("_Path", ("switch", "last", "diagonal", "ends"))
+
 class QBFUnfolded(QBFSynth):
+    """
+    With `path_deepening` the paths of all assignments are first unrolled for
+    `max(m, n) - 1` rounds, enough for straight paths. If that is
+    unsatisfiable, the number of rounds is doubled (up to the exhaustive
+    `_upper_path_bound()`) by appending rounds to the paths in the same
+    solver. The goal of each bound is guarded by a variable, so the goals of
+    the shorter bounds are dropped by no longer assuming it. The deepened
+    paths are always encoded as integer clauses.
+    """
+    def __init__(self, *args, path_deepening=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.path_deepening = path_deepening
+        self._rounds = None
+        self._goal = None
+        self._paths = list()
+
     @staticmethod
     def _select_solver(arguments):
         return arguments.sat_solver
 
+    @classmethod
+    def _options_from_arguments(cls, arguments):
+        options = super()._options_from_arguments(arguments)
+        options["path_deepening"] = arguments.path_deepening
+        return options
+
     def _parse_solver(self, solver):
-        if solver is None or solver == "libminisat":
-            return synth.sat.Minisat
-        elif solver == "libcryptominisat":
-            return synth.sat.Cryptominisat
-        return synth.sat.Dimacs.from_known(solver)
+        return synth.sat.backend(solver, preprocess=self.preprocess,
+                                 backends=self.portfolio, limits=self.limits)
 
     @assert_cnf
     def _assert_switch_active(self, assignment, switch_var):
+        values = self._truth_values(assignment)[1]
+        inputs = [inp for (inp, v) in zip(self._input_literals(), values) if v]
         for i in range(1, self.m + 1):
             for j in range(1, self.n + 1):
-                elements = list(self._literal_at_position_is(i, j, inp)
-                            for inp in self._input_literals()
-                            if inp.compose(assignment).simplify().is_one())
+                elements = [self._literal_at_position_is(i, j, inp)
+                            for inp in inputs]
                 assert elements, "list of literal variables must not be empty"
                 yield expr.Implies(switch_var(i, j),
                                    expr.Or(*elements)).to_cnf()
@@ -40,11 +68,12 @@ class QBFUnfolded(QBFSynth):
 
     @assert_cnf
     def _assert_switch_inactive(self, assignment, switch_var):
+        values = self._truth_values(assignment)[2]
+        inputs = [inp for (inp, v) in zip(self._input_literals(), values) if v]
         for i in range(1, self.m + 1):
             for j in range(1, self.n + 1):
-                elements = list(self._literal_at_position_is(i, j, inp)
-                            for inp in self._input_literals()
-                            if inp.compose(assignment).simplify().is_zero())
+                elements = [self._literal_at_position_is(i, j, inp)
+                            for inp in inputs]
                 assert elements, "list of literal variables must not be empty"
                 yield expr.Implies(switch_var(i, j),
                                    expr.Or(*elements)).to_cnf()
@@ -72,7 +101,7 @@ class QBFUnfolded(QBFSynth):
             assert 1 <= j <= self.n
             return expr.exprvar("switch", (i, j, count))
 
-        evaluated = self.function.compose(assignment).simplify().is_one()
+        evaluated = self._truth_values(assignment)[0]
         if evaluated:
             yield from self._assert_switch_active(assignment, switch_var)
             yield from self._assert_positive_path(switch_var, position_var)
@@ -83,23 +112,144 @@ class QBFUnfolded(QBFSynth):
             yield from self._assert_negative_path(switch_var, position_var)
             yield from self._assert_negative_path_exists_if_function_false(switch_var, position_var)
 
+    def _clauses_switch(self, selected, literals, switch):
+        positions = ((i, j) for i in range(1, self.m + 1)
+                     for j in range(1, self.n + 1))
+        for ((i, j), switch_var) in zip(positions, switch.tolist()):
+            elements = [literals[(i, j)][x] for x in selected]
+            assert elements, "list of literal variables must not be empty"
+            yield [-switch_var] + elements
+
+    def _new_path(self, solver, evaluated):
+        size = self.m * self.n
+        # bottom row for positive, right column for negative paths
+        ends = slice(size - self.n, size) if evaluated \
+               else slice(self.n - 1, size, self.n)
+        return _Path(np.array(solver.new_variables(size)),
+                     np.array(solver.new_variables(size)), not evaluated, ends)
+
+    def _clauses_goal(self, solver, path):
+        goal = None if self._goal is None else solver.encode(self._goal)
+        elements = list(zip(path.switch[path.ends].tolist(),
+                            path.last[path.ends].tolist()))
+        yield from self._implies_any(goal, elements)
+
+    def _clauses_per_assignment(self, solver, assignment, literals, path=None):
+        """
+        Integer version of `_all_assertions_per_assignment()`, `literals` are
+        the encoded position variables of `solver`. The variables of `path`
+        are fresh unless given.
+        """
+        (evaluated, ones, zeros) = self._truth_values(assignment)
+        path = path or self._new_path(solver, evaluated)
+
+        selected = np.flatnonzero(ones if evaluated else zeros)
+        yield from self._clauses_switch(selected, literals, path.switch)
+        yield from self._clauses_path(solver, path.switch, path.last,
+                                      path.diagonal, self._rounds)
+        yield from self._clauses_goal(solver, path)
+
+    def _path_deepening(self):
+        return self.path_deepening and self.m > 1 and self.n > 1
+
+    def _cnf_cache_key(self):
+        # the paths are deepened in the solver after the first solve
+        if self._path_deepening(): return None
+        return super()._cnf_cache_key()
+
+    def _goal_variable(self, solver):
+        goal = expr.exprvar(("reachability", "goal"), self._rounds)
+        solver.encode(goal)
+        return goal
+
+    def _deepen(self, solver):
+        """
+        Appends the rounds up to the next bound to all paths, returns `False`
+        if the paths are exhaustive already.
+        """
+        upper = self._upper_path_bound()
+        if self._rounds is None or self._rounds == upper: return False
+
+        previous = self._rounds
+        self._rounds = min(2 * previous, upper)
+        self._goal = self._goal_variable(solver)
+        for (index, path) in enumerate(self._paths):
+            deepened = path._replace(
+                last=np.array(solver.new_variables(self.m * self.n)))
+            first = solver.num_variables() + 1
+            clauses = it.chain(
+                self._clauses_path(solver, path.switch, deepened.last,
+                                   path.diagonal, self._rounds - previous,
+                                   path.last),
+                self._clauses_goal(solver, deepened))
+            self._add_clauses(solver, clauses, first)
+            self._paths[index] = deepened
+        return True
+
+    def _solve(self, solver, **kwargs):
+        """
+        Solves with the current bound of the paths and deepens them as long
+        as that is unsatisfiable.
+        """
+        while True:
+            assumptions = None if self._goal is None else {self._goal: True}
+            solution = solver.solve(assumptions=assumptions, **kwargs)
+            if solution is not None or not self._deepen(solver):
+                return solution
+
+    def _build_result(self, solution, **kwargs):
+        if self._rounds is not None: kwargs["path_rounds"] = self._rounds
+        return super()._build_result(solution, **kwargs)
+
+    def _add_assertions_per_assignment(self, solver, assignment, literals):
+        path = None
+        if self._path_deepening():
+            if self._rounds is None:
+                self._rounds = min(max(self.m, self.n) - 1,
+                                   self._upper_path_bound())
+                self._goal = self._goal_variable(solver)
+            # the path is deepened later on, so its variables are not local
+            path = self._new_path(solver, self._truth_values(assignment)[0])
+            self._paths.append(path)
+
+        first = solver.num_variables() + 1
+        if self.encoding == "integer" or path is not None:
+            clauses = self._clauses_per_assignment(solver, assignment, literals,
+                                                   path)
+        else:
+            cnfs = self._all_assertions_per_assignment(assignment)
+            clauses = (c for cnf in cnfs for c in solver.encode_cnf(cnf))
+        self._add_clauses(solver, clauses, first)
+
     @assert_cnf
     def _all_assertions(self):
         yield from self._assert_variables_set()
         yield from self._assert_one_literal_used()
+        yield from self._assert_symmetry_breaking()
 
-        for assignment in self.function.iter_domain():
+        for assignment in self.function_container.iter_domain():
             yield from self._all_assertions_per_assignment(assignment)
 
+    def _add_formula(self, solver):
+        for clause in self._assert_variables_set():
+            solver.add(clause)
+        self._add_one_literal_used(solver)
+        for clause in self._assert_symmetry_breaking():
+            solver.add(clause)
+
+        literals = self._encode_literals_at_position(solver)
+        for assignment in self.function_container.iter_domain():
+            self._add_assertions_per_assignment(solver, assignment, literals)
+
     def synth(self, timer=None):
         elements = list(self._all_literals_at_position())
         solver = self.solver()
-        for clause in self._all_assertions():
-            solver.add(clause)
+        self._encode_cached(solver, self._add_formula)
 
         self.print_dimacs(solver, "reachability")
-        solution = solver.solve(of_interest=elements, no_decode=self.no_decode,
-                                timer=timer, simplify=True)
+        solution = self._solve(solver, of_interest=elements,
+                               no_decode=self.no_decode, timer=timer,
+                               simplify=True)
 
         (num_clauses, num_variables) = solver.num_clauses_variables()
         return self._build_result(solution, num_clauses=num_clauses,
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+_OFFSETS_4 = ((-1, 0), (0, -1), (0, 1), (1, 0))
+_OFFSETS_8 = tuple((di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                   if (di, dj) != (0, 0))
+
+
+class Unrolling:
+    """
+    Integer clauses of the reachability rounds on an `m x n` lattice. Positive
+    paths start in the top row and move through the 4-neighbourhood, negative
+    paths (`diagonal`) start in the left column and move through the
+    8-neighbourhood.
+
+    All rounds share the same clauses up to the round index, so the clauses of
+    the first round are computed once as a template of slots into a variable
+    table. Round `r` is obtained by shifting the round dependent slots by `r`
+    rows of the lattice. The table holds, each as row-major lattice, the
+    switch variables, the `reachable` variables of rounds `0..rounds` and a
+    `step` variable per round `0..rounds - 1` implying `reachable & switch`.
+    """
+    def __init__(self, m, n, diagonal, rounds):
+        self.m = m
+        self.n = n
+        self.size = m * n
+        self.rounds = rounds
+
+        (rows, columns) = np.divmod(np.arange(self.size), n)
+        self.start = columns == 0 if diagonal else rows == 0
+        self.neighbours = self._neighbours(rows, columns,
+                                           _OFFSETS_8 if diagonal else _OFFSETS_4)
+        self._template = list(self._round_template())
+
+    def _neighbours(self, rows, columns, offsets):
+        """
+        Matrix with the neighbours of every position in ascending order, left
+        padded with `-1`.
+        """
+        result = np.full((self.size, len(offsets)), -1)
+        for (index, (di, dj)) in enumerate(offsets):
+            (i, j) = (rows + di, columns + dj)
+            valid = (0 <= i) & (i < self.m) & (0 <= j) & (j < self.n)
+            result[valid, index] = i[valid] * self.n + j[valid]
+        return np.sort(result, axis=1)
+
+    def _round_template(self):
+        """
+        Yields `(slots, signs, shifts)` per clause width for the first round.
+        """
+        cells = np.arange(self.size)
+        reachable = self.size
+        step = self.size * (self.rounds + 2)
+
+        # step(c, r - 1) -> reachable(c, r - 1) & switch(c)
+        slots = np.stack((step + cells, reachable + cells), axis=1)
+        yield (slots, np.array([-1, 1]), np.full(slots.shape, self.size))
+        slots = np.stack((step + cells, cells), axis=1)
+        yield (slots, np.array([-1, 1]), np.array([self.size, 0]))
+
+        # reachable(c, r) -> reachable(c, r - 1) | Or(step(c', r - 1))
+        degrees = np.count_nonzero(self.neighbours >= 0, axis=1)
+        for degree in np.unique(degrees):
+            selected = cells[degrees == degree]
+            adjacent = self.neighbours[selected][:, self.neighbours.shape[1] - degree:]
+            slots = np.column_stack((reachable + self.size + selected,
+                                     reachable + selected, step + adjacent))
+            signs = np.ones(slots.shape[1], dtype=int)
+            signs[0] = -1
+            yield (slots, signs, np.full(slots.shape, self.size))
+
+    def clauses(self, switch, reachable, step, initial=True):
+        """
+        Yields the clauses of all rounds, `switch` holds a variable per
+        position, `reachable` (`step`) one per round and position. Without
+        `initial` the first round of `reachable` is the last round of an
+        earlier unrolling and is left unconstrained.
+        """
+        switch = np.asarray(switch)
+        reachable = np.asarray(reachable).reshape(self.rounds + 1, self.size)
+        step = np.asarray(step).reshape(self.rounds, self.size)
+        table = np.concatenate((switch, reachable.ravel(), step.ravel()))
+
+        if initial:
+            start = np.where(self.start, reachable[0], -reachable[0])
+            yield from start[:, np.newaxis].tolist()
+        for rnd in range(self.rounds):
+            for (slots, signs, shifts) in self._template:
+                yield from (signs * table[slots + rnd * shifts]).tolist()
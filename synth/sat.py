@@ -1,21 +1,328 @@
 #!/usr/bin/env python3
 
+import os
 import sys
+import math
+import time
+import signal
+import functools
+import asyncio
+import resource
+import weakref
 import tempfile
+import threading
+import contextlib
 import subprocess
+import collections
+import multiprocessing
+import multiprocessing.connection
 import itertools as it
+import numpy as np
 import pyeda.boolalg.expr as expr
 
 import minisolvers
 import cryptominisat
 
 import synth
+from synth.util import VariablePool
+from synth.util import ClauseBuffer
+from synth.util import flat_literals
+from synth.util import split_literals
+from synth.util import clause_key
+from synth.util import clause_literals
+from synth.preprocess import Preprocessor
+
+SHARED_MEMORY = "/dev/shm"
+ISOLVER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       "isolver.py")
+
+# Limits of a single solver call: wall clock and CPU seconds and the address
+# space in MiB, `None` for no limit. A call that reaches one raises `Unknown`.
+Limits = collections.namedtuple("Limits", ("wall", "cpu", "memory"))
+Limits.__new__.__defaults__ = (None, None, None)
+
+
+class Unknown(Exception):
+    """
+    The solver gave no answer, neither satisfiable nor unsatisfiable: it
+    reached a limit or ended without one.
+    """
+
+
+def _cpu_time(pid):
+    with open("/proc/{}/stat".format(pid)) as fob:
+        fields = fob.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def _rlimits(limits, current=resource.getrlimit, used=0):
+    """
+    The rlimits `(resource, (soft, hard))` of the CPU and memory `limits` of
+    a call, below the hard limits `current(resource)` of the process. The
+    CPU time counts from the `used` seconds.
+    """
+    capped = lambda value, hard: (value if hard == resource.RLIM_INFINITY
+                                  else min(value, hard))
+    rlimits = list()
+    if limits.cpu is not None:
+        (_, hard) = current(resource.RLIMIT_CPU)
+        seconds = capped(math.ceil(used + limits.cpu), hard)
+        rlimits.append((resource.RLIMIT_CPU, (seconds, hard)))
+    if limits.memory is not None:
+        (_, hard) = current(resource.RLIMIT_AS)
+        size = capped(limits.memory * 1024 * 1024, hard)
+        rlimits.append((resource.RLIMIT_AS, (size, size)))
+    return rlimits
+
+def _preexec(limits):
+    """
+    A `preexec_fn` applying the CPU and memory `limits` of a call to the new
+    process before it runs the solver, `None` if there are none.
+    """
+    rlimits = _rlimits(limits)
+    if not rlimits: return None
+    def apply():
+        for (kind, values) in rlimits: resource.setrlimit(kind, values)
+    return apply
+
+def _limit_process(pid, limits):
+    """
+    Applies the CPU and memory `limits` of a call to the running process
+    `pid`, a solver session or worker: the CPU time counts from the time it
+    has used so far.
+    """
+    try:
+        used = _cpu_time(pid) if limits.cpu is not None else 0
+        current = lambda kind: resource.prlimit(pid, kind)
+        for (kind, values) in _rlimits(limits, current, used):
+            resource.prlimit(pid, kind, values)
+    # it has ended already
+    except (ProcessLookupError, FileNotFoundError): pass
+
+
+# processes start in a session of their own to be killed with their
+# children, in a portfolio worker they stay in its process group instead
+_own_session = True
+
+def _kill(process):
+    """
+    Kills `process` started in a session of its own, with its children.
+    """
+    try: os.killpg(process.pid, signal.SIGKILL)
+    except OSError: process.kill()
+
+
+class _Alarm:
+    """
+    Kills `process` once the wall clock limit of `limits` has passed, on the
+    event `loop` if given.
+    """
+    def __init__(self, process, limits, loop=None):
+        (self.expired, self._limit) = (False, limits.wall)
+        self._timer = None
+        if limits.wall is None: return
+        if loop is not None:
+            self._timer = loop.call_later(limits.wall, self._expire, process)
+            return
+        self._timer = threading.Timer(limits.wall, self._expire, (process, ))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _expire(self, process):
+        self.expired = True
+        _kill(process)
+
+    def cancel(self):
+        if self._timer is not None: self._timer.cancel()
+
+    def unknown(self):
+        return Unknown("Wall clock limit of {} s reached".format(self._limit))
+
+def _instance_file():
+    """
+    A temporary file for an instance, in memory if `SHARED_MEMORY` exists.
+    """
+    directory = SHARED_MEMORY if os.path.isdir(SHARED_MEMORY) else None
+    return tempfile.NamedTemporaryFile(mode="w+", dir=directory)
+
+def _write_lines(fob, lines):
+    fob.writelines(line + "\n" for line in lines)
+    fob.flush()
+
+@contextlib.contextmanager
+def _process(command, input, stdout=subprocess.PIPE, limits=Limits()):
+    """
+    Runs `command` with `input` as stdin: `None`, a file or lines, which a
+    thread writes while the output is read. Raises `Unknown` if the process
+    reaches one of the `limits` or is killed.
+    """
+    streamed = input is not None and not hasattr(input, "fileno")
+    process = subprocess.Popen(command,
+                               stdin=subprocess.PIPE if streamed else input,
+                               stdout=stdout, stderr=subprocess.DEVNULL,
+                               universal_newlines=True,
+                               start_new_session=_own_session,
+                               preexec_fn=_preexec(limits))
+    alarm = _Alarm(process, limits)
+    errors = list()
+    def write():
+        try: _write_lines(process.stdin, input)
+        # the process stopped reading, its output tells why
+        except BrokenPipeError: pass
+        except Exception as error: errors.append(error)
+        finally:
+            try: process.stdin.close()
+            except BrokenPipeError: pass
+
+    writer = threading.Thread(target=write, daemon=True) if streamed else None
+    if writer is not None: writer.start()
+    try:
+        yield process
+    except BaseException:
+        _kill(process)
+        if alarm.expired: raise alarm.unknown()
+        raise
+    finally:
+        alarm.cancel()
+        if stdout == subprocess.PIPE: process.stdout.close()
+        process.wait()
+        if writer is not None: writer.join()
+    if errors: raise errors[0]
+    if alarm.expired: raise alarm.unknown()
+    if process.returncode < 0:
+        raise Unknown("{} ended by signal {}".format(command[0],
+                                                     -process.returncode))
+
+# The asynchronous counterpart of `_process()` drives the pipes with the
+# event loop and waits for the exit of the process on a pidfd, so one thread
+# can run many solvers at once. It reaps the process itself with `wait4()`
+# to account for its CPU time: `Timer.measure()` counts all children, which
+# is wrong for processes running side by side.
+
+PIPE_BATCH = 4096
+
+async def _ready(fd, write=False):
+    """
+    Waits until `fd` can be read (written if `write`).
+    """
+    loop = asyncio.get_event_loop()
+    (add, remove) = ((loop.add_writer, loop.remove_writer) if write
+                     else (loop.add_reader, loop.remove_reader))
+    ready = loop.create_future()
+    add(fd, lambda: ready.done() or ready.set_result(None))
+    try: await ready
+    finally: remove(fd)
+
+async def _write_pipe(fob, lines):
+    fd = fob.fileno()
+    os.set_blocking(fd, False)
+    try:
+        batches = iter(lambda: list(it.islice(lines, PIPE_BATCH)), [])
+        for batch in batches:
+            data = memoryview("".join(l + "\n" for l in batch).encode())
+            while data:
+                try: data = data[os.write(fd, data):]
+                except BlockingIOError: await _ready(fd, write=True)
+    # the process stopped reading, its output tells why
+    except BrokenPipeError: pass
+    finally: fob.close()
+
+async def _read_pipe(fob):
+    fd = fob.fileno()
+    os.set_blocking(fd, False)
+    chunks = list()
+    try:
+        while True:
+            try: chunk = os.read(fd, 1 << 16)
+            except BlockingIOError:
+                await _ready(fd)
+                continue
+            if not chunk: return b"".join(chunks).decode()
+            chunks.append(chunk)
+    finally: fob.close()
+
+async def _wait(process):
+    """
+    Reaps `process`, returns its exit code and resource usage.
+    """
+    try: fd = os.pidfd_open(process.pid)
+    # no pidfd (before Linux 5.3), poll
+    except (AttributeError, OSError): fd = None
+    try:
+        while True:
+            (pid, status, usage) = os.wait4(process.pid, os.WNOHANG)
+            if pid != 0: break
+            if fd is None: await asyncio.sleep(0.01)
+            else: await _ready(fd)
+    finally:
+        if fd is not None: os.close(fd)
+    process.returncode = (-os.WTERMSIG(status) if os.WIFSIGNALED(status)
+                          else os.WEXITSTATUS(status))
+    return (process.returncode, usage)
+
+async def _run(command, input, stdout=subprocess.PIPE, limits=Limits(),
+               timer=None):
+    """
+    Runs `command` like `_process()` without blocking the event loop and
+    returns its output once it has ended, `None` unless `stdout` is a pipe.
+    The CPU time of the process is added to `timer`. Cancelling the call
+    kills the process.
+    """
+    loop = asyncio.get_event_loop()
+    streamed = input is not None and not hasattr(input, "fileno")
+    process = subprocess.Popen(command,
+                               stdin=subprocess.PIPE if streamed else input,
+                               stdout=stdout, stderr=subprocess.DEVNULL,
+                               start_new_session=_own_session,
+                               preexec_fn=_preexec(limits))
+    alarm = _Alarm(process, limits, loop)
+    exited = loop.create_task(_wait(process))
+    writer = (loop.create_task(_write_pipe(process.stdin, input))
+              if streamed else None)
+    reader = (loop.create_task(_read_pipe(process.stdout))
+              if stdout == subprocess.PIPE else None)
+    pipes = [p for p in (writer, reader) if p is not None]
+    try:
+        await asyncio.gather(*pipes)
+        (returncode, _) = await asyncio.shield(exited)
+    except BaseException:
+        if not exited.done(): _kill(process)
+        for pipe in pipes: pipe.cancel()
+        # the task reaps it even if this is cancelled once more
+        await asyncio.wait(pipes + [exited])
+        # a pipe task cancelled before it ran has not closed its pipe
+        for fob in (process.stdin, process.stdout):
+            if fob is not None: fob.close()
+        if alarm.expired: raise alarm.unknown()
+        raise
+    finally:
+        alarm.cancel()
+        # a killed process has used its time as well
+        if timer is not None and exited.done() and not exited.cancelled() \
+                and exited.exception() is None:
+            timer.add(exited.result()[1].ru_utime)
+    if alarm.expired: raise alarm.unknown()
+    if returncode < 0:
+        raise Unknown("{} ended by signal {}".format(command[0], -returncode))
+    return None if reader is None else reader.result()
+
+def _stop(process):
+    """
+    Ends a solver session by closing its input, kills it if that does not.
+    """
+    try: process.stdin.close()
+    except BrokenPipeError: pass
+    try: process.wait(timeout=1)
+    except subprocess.TimeoutExpired:
+        _kill(process)
+        process.wait()
+    process.stdout.close()
+
 
 class Solver:
-    def __init__(self):
-        self._next_literal = 1
-        self._var_to_literal_map = dict()
-        self._literal_to_var_map = list()
+    def __init__(self, limits=None):
+        self._pool = VariablePool()
+        self._interest = None
+        self.limits = limits or Limits()
 
     def _add_clause(self, clause):
         raise NotImplementedError()
@@ -23,148 +330,382 @@ class Solver:
     def _solve(self, assumptions=None, no_decode=False, timer=None, **kwargs):
         raise NotImplementedError()
 
+    async def _solve_async(self, assumptions=None, no_decode=False, timer=None,
+                           **kwargs):
+        # in a thread, which a cancellation does not stop
+        solve = functools.partial(self._solve, assumptions=assumptions,
+                                  no_decode=no_decode, timer=timer, **kwargs)
+        return await asyncio.get_event_loop().run_in_executor(None, solve)
+
     def _encode_literal(self, literal):
         assert isinstance(literal, expr.Literal), "input is not a literal ({})".format(literal)
         negated = isinstance(literal, expr.Complement)
         var = ~literal if negated else literal
 
-        integer = self._var_to_literal_map.setdefault(var, self._next_literal)
-        if integer == self._next_literal:
-            self._literal_to_var_map.append(var)
-            self._next_literal += 1
-
+        integer = self._pool.variable(var)
         if negated: return -integer
         return integer
 
     def _encode_clause(self, clause):
         assert isinstance(clause, (expr.OrOp, expr.Literal)), "clause must be disjunction/literal ({})".format(clause)
-
-        if isinstance(clause, expr.OrOp):
-            return [self._encode_literal(l) for l in clause.xs]
-        return [self._encode_literal(clause)]
+        return [self._encode_literal(l) for l in clause_literals(clause)]
 
     def _encode_cnf(self, cnf):
         assert cnf.is_cnf(), "input {} is not in CNF".format(cnf)
 
+        # in a canonical order, the variables are numbered as they occur
         if isinstance(cnf, expr.AndOp):
-            yield from (self._encode_clause(c) for c in cnf.xs)
+            clauses = sorted(cnf.xs, key=clause_key)
+            yield from (self._encode_clause(c) for c in clauses)
         else:
             yield self._encode_clause(cnf)
 
     def _encode_assumptions(self, assumptions=None):
-        if assumptions is not None:
-            for (var, value) in assumptions.items():
-                if value: yield [self._encode_literal(var)]
-                else: yield [self._encode_literal(~var)]
+        """
+        The integer literals of the `assumptions` (a mapping of variables to
+        values), which `_solve()` gets.
+        """
+        if assumptions is None: return []
+        return [self._encode_literal(var if value else ~var)
+                for (var, value) in assumptions.items()]
+
+    def encode(self, literal):
+        return self._encode_literal(literal)
+
+    def encode_cnf(self, cnf):
+        return list(self._encode_cnf(cnf))
+
+    def num_variables(self):
+        return len(self._pool)
+
+    def new_variable(self):
+        return self._pool.fresh()
+
+    def new_variables(self, count):
+        return [self.new_variable() for _ in range(count)]
+
+    def variables(self):
+        """
+        The keys of the integer variables from 1 on, `None` for the fresh
+        ones.
+        """
+        return list(self._pool)
+
+    def restore_variables(self, keys):
+        assert not len(self._pool), "variables must be restored before use"
+        for key in keys:
+            if key is None: self._pool.fresh()
+            else: self._pool.variable(key)
 
     def add(self, cnf):
         for clause in self._encode_cnf(cnf):
             self._add_clause(clause)
 
-    def solve(self, of_interest=None, assumptions=None, no_decode=False,
-              timer=None, simplify=False):
-        sat = self._solve(assumptions=assumptions, no_decode=no_decode,
-                          timer=timer, simplify=simplify)
+    def _add_literals(self, literals):
+        for clause in split_literals(literals):
+            self._add_clause(clause)
+
+    def add_clauses(self, clauses):
+        """
+        Adds integer clauses, an iterable of clauses or a flat buffer of 0
+        terminated clauses (`array('i')`, NumPy array or `ClauseBuffer`).
+        """
+        literals = flat_literals(clauses)
+        if literals is not None:
+            self._add_literals(literals)
+            return
+        for clause in clauses:
+            self._add_clause(list(clause))
+
+    def solve_model(self, assumptions=None, no_decode=False, timer=None,
+                    simplify=False):
+        """
+        Returns the model as integer literals (see `encode()`), `True` with
+        `no_decode` and `None` if unsatisfiable.
+        """
+        return self._solve(assumptions=self._encode_assumptions(assumptions),
+                           no_decode=no_decode, timer=timer, simplify=simplify)
+
+    def _integers(self, of_interest):
+        """
+        The variables of interest that have an integer and their integers.
+        Once all have one, they are kept for the list `of_interest`, which a
+        CEGAR loop passes again on every iteration.
+        """
+        cached = self._interest
+        if cached is not None and cached[0] is of_interest \
+                and len(cached[1]) == len(of_interest):
+            return cached[1:]
+        pairs = ((v, self._pool.find(v)) for v in of_interest)
+        pairs = [(v, i) for (v, i) in pairs if i is not None]
+        result = ([v for (v, _) in pairs],
+                  np.array([i for (_, i) in pairs], dtype=np.int64))
+        if len(pairs) == len(of_interest):
+            self._interest = (of_interest, ) + result
+        return result
+
+    def decode(self, model, of_interest=None):
+        """
+        Maps the variables in `model` (integer literals) to their values,
+        only those in the list `of_interest` unless it is `None`.
+        """
+        if of_interest is None:
+            variables = self._pool
+            return {variables.decode(abs(s)): s > 0 for s in model
+                    if variables.decode(abs(s)) is not None}
+
+        (variables, integers) = self._integers(of_interest)
+        model = np.asarray(model, dtype=np.int64)
+        largest = int(np.abs(model).max()) if len(model) else 0
+        size = max(len(self._pool), largest) + 1
+        values = np.zeros(size, dtype=np.int8)
+        values[np.abs(model)] = np.sign(model)
+        selected = values[integers].tolist()
+        return {v: x > 0 for (v, x) in zip(variables, selected) if x != 0}
+
+    def _decode_result(self, sat, of_interest=None, no_decode=False):
         if sat is None: return None
         elif no_decode: return True
+        if of_interest is not None and not isinstance(of_interest, list):
+            of_interest = list(of_interest)
+        return self.decode(sat, of_interest)
 
-        solution = {self._literal_to_var_map[abs(s) - 1]: s > 0 for s in sat}
-        if of_interest is None: return solution
+    def solve(self, of_interest=None, assumptions=None, no_decode=False,
+              timer=None, simplify=False):
+        sat = self.solve_model(assumptions=assumptions, no_decode=no_decode,
+                               timer=timer, simplify=simplify)
+        return self._decode_result(sat, of_interest, no_decode)
 
-        return {v: b for (v, b) in solution.items() if v in of_interest}
+    async def solve_model_async(self, assumptions=None, no_decode=False,
+                                timer=None, simplify=False):
+        """
+        `solve_model()` as a coroutine, the external solvers (`Dimacs` and
+        `QDimacs`) run without blocking the event loop and are killed if it
+        is cancelled. A solver must not be used by two calls at once.
+        """
+        return await self._solve_async(
+            assumptions=self._encode_assumptions(assumptions),
+            no_decode=no_decode, timer=timer, simplify=simplify)
+
+    async def solve_async(self, of_interest=None, assumptions=None,
+                          no_decode=False, timer=None, simplify=False):
+        sat = await self.solve_model_async(assumptions=assumptions,
+                                           no_decode=no_decode, timer=timer,
+                                           simplify=simplify)
+        return self._decode_result(sat, of_interest, no_decode)
 
 
 class Dimacs(Solver):
     SOLVER = {"cryptominisat5": {},
-              "minisat": {"mode": "file"}}
+              "minisat": {"mode": "file"},
+              "isolver": {"executable": sys.executable, "args": (ISOLVER, ),
+                          "incremental": True}}
     PREPROCESSOR = {}
 
     def __init__(self, executable, args=(), mode="stdin", preprocessor=None,
-                 **kwargs):
-        super().__init__()
-        self._clauses = list()
+                 preprocess=False, limits=None, **kwargs):
+        super().__init__(limits)
+        self._clauses = ClauseBuffer()
         self._executable = executable
         self._options = list(args)
         self._mode = mode
         self._preprocessor = preprocessor
+        self._preprocess = preprocess
 
     @classmethod
     def from_known(cls, name, **kwargs):
         def factory():
             chained = dict(it.chain(Dimacs.SOLVER.get(name).items(),
                                     kwargs.items()))
+            executable = chained.pop("executable", name)
+            if chained.pop("incremental", False):
+                return IncrementalDimacs(executable, **chained)
             if name == "minisat":
-                return DimacsMinisat(name, **chained)
-            return cls(name, **chained)
+                return DimacsMinisat(executable, **chained)
+            return cls(executable, **chained)
         if name in Dimacs.SOLVER:
             return factory
         raise ValueError("Unknown solver {}".format(name))
 
     def num_clauses_variables(self):
-        return (len(self._clauses), len(self._literal_to_var_map))
+        return (len(self._clauses), len(self._pool))
 
-    def _generate_input(self, assumptions=None):
-        assumption_clauses = list(self._encode_assumptions(assumptions))
+    def encoded(self):
+        """
+        The formula as `(variables, clauses, quantifiers)` for `restore()`,
+        `clauses` is a `ClauseBuffer` and `quantifiers` are the `(kind,
+        variables)` blocks of the prefix.
+        """
+        return (self.variables(), self._clauses, [])
 
-        yield "p cnf {} {}".format(len(self._literal_to_var_map),
-                                   len(self._clauses) + len(assumption_clauses))
-        for clause in self._clauses:
-            yield " ".join(str(x) for x in clause) + " 0"
-        for clause in assumption_clauses:
+    def restore(self, variables, clauses, quantifiers=()):
+        """
+        Sets the formula of a new solver to an `encoded()` one.
+        """
+        assert not quantifiers, "a CNF has no quantifiers"
+        self.restore_variables(variables)
+        self._clauses = ClauseBuffer(clauses)
+
+    def _eliminable(self):
+        """
+        Variables the in-process preprocessing may remove, `None` for all.
+        """
+        return None
+
+    def _simplified(self, assumptions=None):
+        """
+        Returns the clauses to write, the unit clauses of the assumptions to
+        write after them and the preprocessor to extend the model with,
+        `None` if not preprocessing.
+        """
+        units = [[x] for x in assumptions or ()]
+        if not self._preprocess: return (self._clauses, units, None)
+        preprocessor = Preprocessor(self._eliminable())
+        clauses = preprocessor.simplify(it.chain(self._clauses, units))
+        return (clauses, [], preprocessor)
+
+    def _generate_input(self, assumptions=None, clauses=None, units=None):
+        if clauses is None: clauses = self._clauses
+        if units is None: units = [[x] for x in assumptions or ()]
+
+        yield "p cnf {} {}".format(len(self._pool), len(clauses) + len(units))
+        for clause in it.chain(clauses, units):
             yield " ".join(str(x) for x in clause) + " 0"
 
-    def _parse_output(self, output, no_decode=False):
-        result = (l for l in output.splitlines() if not l.startswith("c"))
-        answer = (line.split()[1:] for line in result if line.startswith("v"))
-        solution = list(it.chain.from_iterable(answer))
-        if not solution: return None
+    def _parse_output(self, lines, no_decode=False):
+        (status, solution) = (None, list())
+        for line in lines:
+            if line.startswith("s"):
+                status = line.split()[1]
+            elif line.startswith("v"):
+                solution.extend(int(x) for x in line.split()[1:])
+        if status == "UNSATISFIABLE": return None
+        # a model is complete with the terminating 0
+        if status != "SATISFIABLE" or not solution or solution[-1] != 0:
+            raise Unknown("{} gave no answer".format(self._executable))
         elif no_decode: return True
-        return [int(x) for x in solution[:-1]]
+        return [x for x in solution if x != 0]
 
     def _add_clause(self, clause):
         self._clauses.append(clause)
 
+    def _add_literals(self, literals):
+        self._clauses.extend(literals)
+
     def _solve(self, assumptions=None, no_decode=False, timer=None, **kwargs):
+        (clauses, units, preprocessor) = self._simplified(assumptions)
+        if preprocessor is not None and [] in clauses: return None
+        sat = self._solve_clauses(clauses, units, no_decode=no_decode,
+                                  timer=timer)
+        if preprocessor is None or sat is None or no_decode: return sat
+        return preprocessor.extend(sat)
+
+    async def _solve_async(self, assumptions=None, no_decode=False, timer=None,
+                           **kwargs):
+        (clauses, units, preprocessor) = self._simplified(assumptions)
+        if preprocessor is not None and [] in clauses: return None
+        sat = await self._solve_clauses_async(clauses, units,
+                                              no_decode=no_decode, timer=timer)
+        if preprocessor is None or sat is None or no_decode: return sat
+        return preprocessor.extend(sat)
+
+    def _solve_clauses(self, clauses, units=(), no_decode=False, timer=None):
+        """
+        Streams the instance to the solver: through a pipe into its stdin
+        or, if it reads a file, into a file in memory (`/dev/shm`).
+        """
         command = [self._executable] + self._options
-        dimacs = "\n".join(self._generate_input(assumptions))
-        if self._mode == "stdin":
-            if self._preprocessor:
-                dimacs = self._run_preprocessor(dimacs, timer=timer)
-            return self._run_solver(command, dimacs, no_decode=no_decode,
-                                    timer=timer)
-        else:
-            with tempfile.NamedTemporaryFile(mode="w") as fob:
-                if self._preprocessor:
-                    dimacs = self._run_preprocessor(dimacs, timer=timer)
-                print(dimacs, end="", file=fob, flush=True)
+        generate = lambda: self._generate_input(clauses=clauses, units=units)
+        if self._preprocessor:
+            with self._run_preprocessor(generate, timer=timer) as fob:
+                if self._mode == "stdin":
+                    return self._run_solver(command, fob, no_decode=no_decode,
+                                            timer=timer)
                 command.append(fob.name)
                 return self._run_solver(command, None, no_decode=no_decode,
                                         timer=timer)
+        if self._mode == "stdin":
+            return self._run_solver(command, generate(), no_decode=no_decode,
+                                    timer=timer)
+        with _instance_file() as fob:
+            _write_lines(fob, generate())
+            command.append(fob.name)
+            return self._run_solver(command, None, no_decode=no_decode,
+                                    timer=timer)
+
+    async def _solve_clauses_async(self, clauses, units=(), no_decode=False,
+                                   timer=None):
+        command = [self._executable] + self._options
+        generate = lambda: self._generate_input(clauses=clauses, units=units)
+        if self._preprocessor:
+            with _instance_file() as fob:
+                await _run(self._preprocessor_command(), generate(),
+                           stdout=fob, limits=self.limits, timer=timer)
+                self._preprocessed(fob, generate)
+                if self._mode == "stdin":
+                    return await self._run_solver_async(
+                        command, fob, no_decode=no_decode, timer=timer)
+                command.append(fob.name)
+                return await self._run_solver_async(
+                    command, None, no_decode=no_decode, timer=timer)
+        if self._mode == "stdin":
+            return await self._run_solver_async(command, generate(),
+                                                no_decode=no_decode,
+                                                timer=timer)
+        # into memory, see `_instance_file()`
+        with _instance_file() as fob:
+            _write_lines(fob, generate())
+            command.append(fob.name)
+            return await self._run_solver_async(command, None,
+                                                no_decode=no_decode,
+                                                timer=timer)
 
     def _run_solver(self, command, input, no_decode=False, timer=None):
         timer = timer or synth.timer.Timer()
         with timer.measure(process=True):
-            completed = subprocess.run(command, input=input,
-                                       stdout=subprocess.PIPE,
-                                       stderr=subprocess.PIPE,
-                                       universal_newlines=True)
+            with _process(command, input, limits=self.limits) as process:
+                return self._parse_output(process.stdout, no_decode=no_decode)
 
-        return self._parse_output(completed.stdout, no_decode=no_decode)
+    async def _run_solver_async(self, command, input, no_decode=False,
+                                timer=None):
+        output = await _run(command, input, limits=self.limits, timer=timer)
+        return self._parse_output(output.splitlines(), no_decode=no_decode)
 
-    def _run_preprocessor(self, input, timer=None):
-        timer = timer or synth.timer.Timer()
+    def _preprocessor_command(self):
         preprocessor = self.PREPROCESSOR.get(self._preprocessor, {})
-        command = [self._preprocessor] + list(preprocessor.get("args", ()))
-        with timer.measure(process=True):
-            completed = subprocess.run(command, input=input,
-                                       stdout=subprocess.PIPE,
-                                       stderr=subprocess.PIPE,
-                                       universal_newlines=True)
-        if len(completed.stdout.splitlines()) == 1: return input
-        return completed.stdout
+        return [self._preprocessor] + list(preprocessor.get("args", ()))
+
+    @staticmethod
+    def _preprocessed(fob, generate):
+        """
+        Rewinds `fob` written by the preprocessor, replaces its content by
+        the original instance if the preprocessor left at most one line.
+        """
+        fob.seek(0)
+        if sum(1 for _ in it.islice(fob, 2)) <= 1:
+            fob.seek(0)
+            fob.truncate()
+            _write_lines(fob, generate())
+        fob.seek(0)
+        return fob
+
+    @contextlib.contextmanager
+    def _run_preprocessor(self, generate, timer=None):
+        """
+        Yields a file with the preprocessed instance, the original instance
+        (`generate()` yields its lines) if the preprocessor leaves at most
+        one line.
+        """
+        timer = timer or synth.timer.Timer()
+        with _instance_file() as fob:
+            with timer.measure(process=True):
+                with _process(self._preprocessor_command(), generate(),
+                              stdout=fob, limits=self.limits):
+                    pass
+            yield self._preprocessed(fob, generate)
 
     def print_dimacs(self, file=sys.stdout):
-        literal_to_var = list(enumerate(self._literal_to_var_map, 1))
+        literal_to_var = list(enumerate(self._pool, 1))
         for index in range(0, len(literal_to_var), 3):
             print("c", literal_to_var[index:index + 3], file=file)
         for line in self._generate_input():
@@ -172,32 +713,125 @@ class Dimacs(Solver):
 
 
 class DimacsMinisat(Dimacs):
-    def _parse_output(self, output, no_decode=False):
-        (sat, *model) = output.splitlines()
-        if sat != "SAT": return None
+    def _parse_output(self, lines, no_decode=False):
+        lines = iter(lines)
+        status = next(lines, "").strip()
+        if status == "UNSAT": return None
+        # `INDET` if interrupted, nothing if killed
+        elif status != "SAT":
+            raise Unknown("{} gave no answer".format(self._executable))
         elif no_decode: return True
-        return [int(x) for line in model for x in line.split()]
+        return [int(x) for line in lines for x in line.split() if x != "0"]
 
     def _run_solver(self, command, input, no_decode=False, timer=None):
         timer = timer or synth.timer.Timer()
-        with tempfile.NamedTemporaryFile() as fob:
+        with tempfile.NamedTemporaryFile(mode="r") as fob:
             command.append(fob.name)
             with timer.measure(process=True):
-                completed = subprocess.run(command, input=input,
-                                           stdout=subprocess.PIPE,
-                                           stderr=subprocess.PIPE,
-                                           universal_newlines=True)
-            fob.seek(0)
-            return self._parse_output(fob.read().decode(), no_decode=no_decode)
+                with _process(command, input, stdout=subprocess.DEVNULL,
+                              limits=self.limits):
+                    pass
+            return self._parse_output(fob, no_decode=no_decode)
+
+    async def _run_solver_async(self, command, input, no_decode=False,
+                                timer=None):
+        with tempfile.NamedTemporaryFile(mode="r") as fob:
+            command.append(fob.name)
+            await _run(command, input, stdout=subprocess.DEVNULL,
+                       limits=self.limits, timer=timer)
+            return self._parse_output(fob, no_decode=no_decode)
 
     def print_dimacs(self, file=sys.stdout):
-        literal_to_var = list(enumerate(self._literal_to_var_map, 1))
+        literal_to_var = list(enumerate(self._pool, 1))
         for index in range(0, len(literal_to_var), 3):
             print("c", literal_to_var[index:index + 3], file=file)
         for line in self._generate_input():
             print(line, file=file)
 
 
+class IncrementalDimacs(Dimacs):
+    """
+    A long-lived solver process that keeps its clauses, and what it learnt
+    from them, between calls like `Minisat`. It reads the iCNF format: the
+    header `p inccnf`, clauses and queries `a <assumptions> 0`, each
+    answered by `s SATISFIABLE` and a `v` line with the model or by
+    `s UNSATISFIABLE` (see `synth.isolver`). Only the clauses added since
+    the last call are sent. The preprocessing does not apply, it would
+    remove variables of later clauses.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session = None
+        # the literals of `_clauses` the session has got
+        self._sent = 0
+
+    # the session answers in order, a thread waits for it
+    _solve_async = Solver._solve_async
+
+    def _start(self):
+        command = [self._executable] + self._options
+        self._session = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE,
+                                         stderr=subprocess.DEVNULL,
+                                         universal_newlines=True,
+                                         start_new_session=_own_session)
+        weakref.finalize(self, _stop, self._session)
+        _write_lines(self._session.stdin, ["p inccnf"])
+
+    def close(self):
+        """
+        Ends the solver process, the next call starts a new one.
+        """
+        if self._session is not None: _stop(self._session)
+        (self._session, self._sent) = (None, 0)
+
+    def _generate_delta(self, assumptions=None):
+        literals = self._clauses.literals[self._sent:]
+        self._sent = len(self._clauses.literals)
+        for clause in split_literals(literals):
+            yield " ".join(str(x) for x in clause) + " 0"
+        yield " ".join(["a"] + [str(x) for x in assumptions or ()] + ["0"])
+
+    def _parse_output(self, lines, no_decode=False, timer=None):
+        (sat, solution) = (None, list())
+        for line in lines:
+            if line.startswith("c time") and timer is not None:
+                timer.add(float(line.split()[2]))
+            elif line.startswith("s"):
+                sat = "UNSAT" not in line
+                if not sat: break
+            elif line.startswith("v"):
+                literals = [int(x) for x in line.split()[1:]]
+                solution.extend(literals)
+                if literals and literals[-1] == 0: break
+        if sat is None: raise BrokenPipeError()
+        if not sat: return None
+        elif no_decode: return True
+        return [x for x in solution if x != 0]
+
+    def _solve(self, assumptions=None, no_decode=False, timer=None, **kwargs):
+        if self._session is None: self._start()
+        session = self._session
+        _limit_process(session.pid, self.limits)
+        alarm = _Alarm(session, self.limits)
+        try:
+            _write_lines(session.stdin, self._generate_delta(assumptions))
+            return self._parse_output(session.stdout, no_decode=no_decode,
+                                      timer=timer)
+        except BaseException as error:
+            # a half answered query leaves the session out of step
+            self.close()
+            if alarm.expired: raise alarm.unknown()
+            if not isinstance(error, BrokenPipeError): raise
+            command = " ".join([self._executable] + self._options)
+            if session.returncode < 0:
+                raise Unknown("Solver session {} ended by signal {}".format(
+                    command, -session.returncode))
+            raise RuntimeError("Solver session {} ended".format(command))
+        finally:
+            alarm.cancel()
+
+
 class QDimacs(Dimacs):
     SOLVER = {"depqbf": {"args": ("--qdo",)},
               "rareqs": {"preprocessor": "bloqqer"}}
@@ -217,41 +851,60 @@ class QDimacs(Dimacs):
             return factory
         raise ValueError("Unknown solver {}".format(name))
 
-    def _generate_input(self, assumptions=None):
-        assumption_clauses = list(self._encode_assumptions(assumptions))
+    def _eliminable(self):
+        # only the innermost existential variables, the others are decoded
+        # or universal
+        if not self._quant_sets: return None
+        (kind, literals) = self._quant_sets[-1]
+        if kind == "e": return set(literals)
+        variables = set(range(1, len(self._pool) + 1))
+        for (_kind, literals) in self._quant_sets:
+            variables.difference_update(literals)
+        return variables
+
+    def encoded(self):
+        (variables, clauses, _) = super().encoded()
+        return (variables, clauses, list(self._quant_sets))
+
+    def restore(self, variables, clauses, quantifiers=()):
+        super().restore(variables, clauses)
+        self._quant_sets = [(kind, list(literals))
+                            for (kind, literals) in quantifiers]
 
-        yield "p cnf {} {}".format(len(self._literal_to_var_map),
-                                   len(self._clauses) + len(assumption_clauses))
+    def _generate_input(self, assumptions=None, clauses=None, units=None):
+        if clauses is None: clauses = self._clauses
+        if units is None: units = [[x] for x in assumptions or ()]
 
-        not_quantified = set(self._literal_to_var_map)
+        yield "p cnf {} {}".format(len(self._pool), len(clauses) + len(units))
+
+        not_quantified = set(range(1, len(self._pool) + 1))
 
         for (kind, literals) in self._quant_sets:
-            quantified = set(self._literal_to_var_map[abs(x) - 1] for x in literals)
-            not_quantified.difference_update(quantified)
+            not_quantified.difference_update(abs(x) for x in literals)
             yield kind + " " + " ".join(str(x) for x in literals) + " 0"
 
         if not_quantified and self._quant_sets and self._quant_sets[-1][0] != "e":
-            literals = [self._encode_literal(x) for x in not_quantified]
+            literals = sorted(not_quantified)
             yield "e " + " ".join(str(x) for x in literals) + " 0"
 
-        for clause in self._clauses:
-            yield " ".join(str(x) for x in clause) + " 0"
-        for clause in assumption_clauses:
+        for clause in it.chain(clauses, units):
             yield " ".join(str(x) for x in clause) + " 0"
 
-    def _parse_output(self, output, no_decode=False):
-        result = [l for l in output.splitlines() if not l.startswith("c")]
-        try: solution = next(line for line in result if line.startswith("s"))
-        except StopIteration: return None
-
-        (_s, _cnf, sat) = solution.split()[:3]
-        if sat != "1": return None
-
-        answer = [x for line in result if line.startswith("V")
-                  for x in line.split()]
-        if not answer: return None
+    def _parse_output(self, lines, no_decode=False):
+        (sat, answered, answer) = (None, False, list())
+        for line in lines:
+            if line.startswith("s") and sat is None:
+                (_s, _cnf, value) = line.split()[:3]
+                # -1 if the solver gave up
+                sat = {"1": True, "0": False}.get(value)
+            elif line.startswith("V"):
+                answered = True
+                answer.extend(int(x) for x in line.split()[1:] if x != "0")
+        if sat is None:
+            raise Unknown("{} gave no answer".format(self._executable))
+        if not (sat and answered): return None
         elif no_decode: return True
-        return [int(x) for x in answer if x not in ("V", "0")]
+        return answer
 
     def exists(self, variables):
         assert not self._quant_sets or self._quant_sets[-1][0] != "e"
@@ -272,18 +925,25 @@ class Minisat(Solver):
     def num_clauses_variables(self):
         return (self._solver.nclauses(), self._solver.nvars())
 
+    def _new_vars(self, max_var):
+        for _ in range(max_var - self._solver.nvars()):
+            self._solver.new_var()
+
     def _add_clause(self, clause):
-        max_var = max(abs(x) for x in clause)
-        if max_var > self._solver.nvars():
-            for _ in range(max_var - self._solver.nvars()):
-                self._solver.new_var()
+        self._new_vars(max((abs(x) for x in clause), default=0))
         self._solver.add_clause(clause)
 
+    def _add_literals(self, literals):
+        # the binding adds single clauses, but the variables are allocated
+        # once for the whole buffer
+        self._new_vars(max(max(literals, default=0), -min(literals, default=0)))
+        for clause in split_literals(literals):
+            self._solver.add_clause(clause)
+
     def _solve(self, assumptions=None, no_decode=False, timer=None,
                simplify=False, **kwargs):
         timer = timer or synth.timer.Timer()
-        assumption_clauses = self._encode_assumptions(assumptions)
-        assumptions_flat = list(it.chain.from_iterable(assumption_clauses))
+        assumptions_flat = list(assumptions or ())
         with timer.measure():
             if simplify: self._solver.simplify()
             sat = self._solver.solve(assumptions=assumptions_flat)
@@ -297,6 +957,8 @@ class Cryptominisat(Solver):
     def __init__(self):
         super().__init__()
         self._solver = cryptominisat.Solver(no_simplify_at_startup=True)
+        # whether `add_clauses()` of the binding takes the flat buffer
+        self._flat = True
 
     def num_clauses_variables(self):
         return (0, 0)
@@ -304,14 +966,231 @@ class Cryptominisat(Solver):
     def _add_clause(self, clause):
         self._solver.add_clause(clause)
 
+    def _add_literals(self, literals):
+        if self._flat:
+            try:
+                self._solver.add_clauses(literals)
+                return
+            # a binding taking a list of clauses fails on the first literal
+            except (TypeError, ValueError): self._flat = False
+        self._solver.add_clauses(list(split_literals(literals)))
+
     def _solve(self, assumptions=None, no_decode=False, timer=None, simplify=False,
                **kwargs):
         timer = timer or synth.timer.Timer()
-        assumption_clauses = self._encode_assumptions(assumptions)
-        assumptions_flat = list(it.chain.from_iterable(assumption_clauses))
+        assumptions_flat = list(assumptions or ())
         with timer.measure():
             if simplify: self._solver.simplify(assumptions=assumptions_flat)
             (sat, solution) = self._solver.solve(assumptions=assumptions_flat)
         if not sat: return None
         elif no_decode: return True
         return [i if x else -i for (i, x) in enumerate(solution[1:], 1)]
+
+
+def backend(name, **kwargs):
+    """
+    The solver factory for the SAT solver `name`: a binding (`libminisat`,
+    `libcryptominisat`), a known DIMACS solver (passed `kwargs`) or
+    `portfolio` racing the `backends` in `kwargs` (default
+    `Portfolio.BACKENDS`). The bindings cannot be interrupted, with `limits`
+    they run in the worker process of a portfolio of their own.
+    """
+    if name in (None, "libminisat", "libcryptominisat"):
+        limits = kwargs.get("limits") or Limits()
+        if any(limit is not None for limit in limits):
+            return Portfolio.from_known((name or "libminisat", ),
+                                        limits=limits)
+        return Cryptominisat if name == "libcryptominisat" else Minisat
+    elif name == "portfolio": return Portfolio.from_known(**kwargs)
+    kwargs.pop("backends", None)
+    return Dimacs.from_known(name, **kwargs)
+
+
+_wins = collections.Counter()
+
+def portfolio_wins():
+    """
+    Number of answers per backend of the portfolios since the last reset.
+    """
+    return dict(_wins)
+
+def reset_portfolio_wins():
+    _wins.clear()
+
+
+def _portfolio_worker(name, options, connection):
+    """
+    Runs the backend `name` in a worker process of a `Portfolio`: receives
+    the new clauses with each query and answers it.
+    """
+    # a cancelled worker is killed with the solver processes it started
+    global _own_session
+    os.setpgrp()
+    _own_session = False
+    solver = None
+    while True:
+        try: message = connection.recv()
+        except EOFError: return
+        (literals, variables, assumptions, no_decode, simplify) = message
+        try:
+            if solver is None: solver = backend(name, **options)()
+            solver.new_variables(variables - solver.num_variables())
+            solver._add_literals(literals)
+            timer = synth.timer.Timer()
+            sat = solver._solve(assumptions=assumptions, no_decode=no_decode,
+                                timer=timer, simplify=simplify)
+            connection.send(("answer", sat, timer.elapsed()))
+        except Unknown as error:
+            connection.send(("unknown", "{}: {}".format(name, error), 0))
+        except MemoryError:
+            connection.send(("unknown", "{}: out of memory".format(name), 0))
+            return
+        except Exception as error:
+            connection.send(("error", "{}: {}".format(name, error), 0))
+            return
+
+def _cancel(worker):
+    (process, connection, _sent) = worker
+    # the group may outlive a worker that has ended, e.g. at the CPU limit
+    try: os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        if process.exitcode is None:
+            try: os.kill(process.pid, signal.SIGKILL)
+            except ProcessLookupError: pass
+    process.join()
+    connection.close()
+
+def _cancel_all(workers):
+    for (index, worker) in enumerate(workers):
+        if worker is not None: _cancel(worker)
+        workers[index] = None
+
+
+class Portfolio(Solver):
+    """
+    Races several backends (names as for `backend()`) on the same clauses,
+    each in a worker process that keeps its solver between calls. The first
+    answer is returned and recorded in `winner` and `portfolio_wins()`, the
+    other workers are cancelled and start over with all clauses on the next
+    call. A backend that fails drops out of the race. The CPU and memory
+    `limits` apply to each worker and the solvers it starts.
+    """
+    BACKENDS = ("libminisat", "libcryptominisat")
+
+    def __init__(self, backends=BACKENDS, limits=None, **kwargs):
+        super().__init__(limits)
+        assert backends, "a portfolio needs backends"
+        self._backends = list(backends)
+        self._options = kwargs
+        self._clauses = ClauseBuffer()
+        # per backend `(process, connection, sent literals)` or `None`
+        self._workers = [None] * len(self._backends)
+        self._failed = set()
+        weakref.finalize(self, _cancel_all, self._workers)
+        self.winner = None
+
+    @classmethod
+    def from_known(cls, backends=None, **kwargs):
+        backends = tuple(backends or cls.BACKENDS)
+        for name in backends:
+            if name == "portfolio":
+                raise ValueError("A portfolio cannot race a portfolio")
+            backend(name)
+        def factory():
+            return cls(backends, **kwargs)
+        return factory
+
+    def num_clauses_variables(self):
+        return (len(self._clauses), len(self._pool))
+
+    def _add_clause(self, clause):
+        self._clauses.append(clause)
+
+    def _add_literals(self, literals):
+        self._clauses.extend(literals)
+
+    def close(self):
+        """
+        Ends the worker processes, the next call starts new ones.
+        """
+        _cancel_all(self._workers)
+
+    def _start(self, index):
+        (connection, child) = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_portfolio_worker, daemon=True,
+            args=(self._backends[index], self._options, child))
+        process.start()
+        child.close()
+        return (process, connection, 0)
+
+    def _send(self, index, *query):
+        if self._workers[index] is None:
+            self._workers[index] = self._start(index)
+        (process, connection, sent) = self._workers[index]
+        _limit_process(process.pid, self.limits)
+        connection.send((self._clauses.literals[sent:], len(self._pool))
+                        + query)
+        self._workers[index] = (process, connection,
+                                len(self._clauses.literals))
+
+    def _drop(self, index):
+        self._failed.add(index)
+        _cancel(self._workers[index])
+        self._workers[index] = None
+
+    def _solve(self, assumptions=None, no_decode=False, timer=None,
+               simplify=False, **kwargs):
+        timer = timer or synth.timer.Timer()
+        deadline = None if self.limits.wall is None \
+                   else time.monotonic() + self.limits.wall
+        (racing, errors, unknown) = (list(), list(), list())
+        for index in range(len(self._backends)):
+            if index in self._failed: continue
+            try:
+                self._send(index, list(assumptions or ()), no_decode, simplify)
+                racing.append(index)
+            except OSError as error:
+                self._drop(index)
+                errors.append("{}: {}".format(self._backends[index], error))
+
+        answer = None
+        while racing and answer is None:
+            timeout = None if deadline is None \
+                      else max(0, deadline - time.monotonic())
+            connections = [self._workers[i][1] for i in racing]
+            ready = multiprocessing.connection.wait(connections, timeout)
+            if not ready:
+                unknown.append("wall clock limit of {} s reached".format(
+                    self.limits.wall))
+                break
+            index = racing.pop(connections.index(ready[0]))
+            try: (kind, sat, elapsed) = ready[0].recv()
+            except (EOFError, OSError):
+                # killed by a signal, e.g. at the CPU limit
+                process = self._workers[index][0]
+                process.join()
+                kind = "unknown" if process.exitcode < 0 else "error"
+                (sat, elapsed) = ("{}: worker ended".format(
+                    self._backends[index]), 0)
+            if kind == "answer": answer = (index, sat, elapsed)
+            elif kind == "unknown":
+                unknown.append(sat)
+                _cancel(self._workers[index])
+                self._workers[index] = None
+            else:
+                errors.append(sat)
+                self._drop(index)
+
+        for other in racing:
+            _cancel(self._workers[other])
+            self._workers[other] = None
+        if answer is None and unknown: raise Unknown(", ".join(unknown))
+        elif answer is None:
+            raise RuntimeError("No backend answered ({})".format(
+                ", ".join(errors)))
+        (index, sat, elapsed) = answer
+        self.winner = self._backends[index]
+        if len(self._backends) > 1: _wins[self.winner] += 1
+        timer.add(elapsed)
+        return sat
@@ -1,63 +1,114 @@
 #!/usr/bin/env python3
 
+import math
 import time
 import itertools as it
 
 import synth
+import synth.sat
 
 class SearchBase(synth.base.Synth):
-    def __init__(self, function, synthesizer, *args):
+    SYNTHESIZER = {"qbf": "QBFSynth", "qbfu": "QBFUnfolded",
+                   "cegar": "CegarSynth", "hybrid": "HybridSynth"}
+
+    def __init__(self, function, synthesizer, *args, retry=None):
         super().__init__(function)
         self.synthesizer = synthesizer
+        # tried for a probe the synthesizer gives no answer for
+        self.retry = retry
         self.synthesizer_counter = 0
+        self.unknown_counter = 0
+        # sizes proven unsolvable and without answer since the last result
+        self._failed_probes = set()
+        self._unknown_probes = set()
         self.lower_bound = self.function_container.lower_bound()
         self.upper_bound = self.function_container.naive_lattice_bounds()
 
     @classmethod
-    def with_qbf(cls, module, arguments):
-        synthesizer = module.QBFSynth.from_arguments(arguments)
+    def _with_synthesizer(cls, module, name, arguments):
+        synthesizer = getattr(module, cls.SYNTHESIZER[name]) \
+                          .from_arguments(arguments)
+        retry = arguments.retry_synthesizer
+        if retry is not None:
+            retry = getattr(module, cls.SYNTHESIZER[retry]) \
+                        .from_arguments(arguments)
         def factory(function):
-            return cls(function, synthesizer, arguments.upper_bound)
+            return cls(function, synthesizer, arguments.upper_bound,
+                       retry=retry)
         factory.solver = synthesizer.solver
         return factory
 
+    @classmethod
+    def with_qbf(cls, module, arguments):
+        return cls._with_synthesizer(module, "qbf", arguments)
+
     @classmethod
     def with_qbf_unfolded(cls, module, arguments):
-        synthesizer = module.QBFUnfolded.from_arguments(arguments)
-        def factory(function):
-            return cls(function, synthesizer, arguments.upper_bound)
-        factory.solver = synthesizer.solver
-        return factory
+        return cls._with_synthesizer(module, "qbfu", arguments)
 
     @classmethod
     def with_cegar(cls, module, arguments):
-        synthesizer = module.CegarSynth.from_arguments(arguments)
-        def factory(function):
-            return cls(function, synthesizer, arguments.upper_bound)
-        factory.solver = synthesizer.solver
-        return factory
+        return cls._with_synthesizer(module, "cegar", arguments)
+
+    @classmethod
+    def with_hybrid(cls, module, arguments):
+        return cls._with_synthesizer(module, "hybrid", arguments)
 
     def _synthesize(self, timer, m, n):
+        """
+        Synthesizes a lattice of size `m` x `n`, again with the `retry`
+        synthesizer if a solver reaches its limits. If that gives no answer
+        either the result is unknown (`"unknown"` is set): there may well be
+        a lattice of this size, the probe proves nothing.
+        """
         self.synthesizer_counter += 1
-        return self.synthesizer(self.function_container, m, n,).synth(timer)
-
-    def _build_result(self, solution, elapsed, steps):
-        result = {"time": elapsed, "steps": steps}
+        limits = list()
+        for synthesizer in (self.synthesizer, self.retry):
+            if synthesizer is None: continue
+            try: result = synthesizer(self.function_container, m, n).synth(timer)
+            except synth.sat.Unknown as error:
+                limits.append(str(error))
+                continue
+            if result.get("solution") is None: self._failed_probes.add((m, n))
+            return result
+        self.unknown_counter += 1
+        self._unknown_probes.add((m, n))
+        return {"solution": None, "unknown": True, "limit": "; ".join(limits)}
+
+    def _proven_minimal(self, solution):
+        """
+        Whether no probe without answer may hide a smaller lattice than
+        `solution`: each is at least as large or within a size proven
+        unsolvable.
+        """
+        area = math.inf
+        if solution.get("solution") is not None:
+            area = solution["solution_height"] * solution["solution_width"]
+        return all(m * n >= area or any(m <= m_ and n <= n_
+                                        for (m_, n_) in self._failed_probes)
+                   for (m, n) in self._unknown_probes)
+
+    def _build_result(self, solution, elapsed, steps, unknown=0):
+        result = {"time": elapsed, "steps": steps, "unknown_probes": unknown}
         result.update(solution)
+        if unknown: result["minimal"] = self._proven_minimal(solution)
+        self._failed_probes.clear()
+        self._unknown_probes.clear()
         return result
 
 
 class Simple(SearchBase):
-    def __init__(self, function, synthesizer, upper_bound=None):
-        super().__init__(function, synthesizer)
+    def __init__(self, function, synthesizer, upper_bound=None, retry=None):
+        super().__init__(function, synthesizer, retry=retry)
         if upper_bound: self.upper_bound = upper_bound
 
     def synth(self):
         timer = synth.timer.Timer()
-        old_counter = self.synthesizer_counter
+        old_unknown = self.unknown_counter
         (m, n) = self.upper_bound
         solution = self._synthesize(timer, m, n)
-        return self._build_result(solution, timer.elapsed(), 1)
+        return self._build_result(solution, timer.elapsed(), 1,
+                                  self.unknown_counter - old_unknown)
 
 
 class MinimizedSplit(SearchBase):
@@ -70,6 +121,7 @@ class MinimizedSplit(SearchBase):
     def synth(self):
         timer = synth.timer.Timer()
         old_counter = self.synthesizer_counter
+        old_unknown = self.unknown_counter
 
         lower_bound = self.lower_bound
         upper_bound = self.function_container.upper_bound()
@@ -87,6 +139,8 @@ class MinimizedSplit(SearchBase):
 
             for (m, n) in configurations:
                 result = self._synthesize(timer, m, n)
+                # skipped, it does not rule out the smaller configurations
+                if result.get("unknown"): continue
                 if result.get("solution") is None:
                     failed.add((m, n))
                 else:
@@ -99,16 +153,19 @@ class MinimizedSplit(SearchBase):
                 lower_bound = mid + 1
 
         return self._build_result(best_solution, timer.elapsed(),
-                                  self.synthesizer_counter - old_counter)
+                                  self.synthesizer_counter - old_counter,
+                                  self.unknown_counter - old_unknown)
 
 
 class BinaryPartition(SearchBase):
     def synth(self):
         timer = synth.timer.Timer()
         old_counter = self.synthesizer_counter
+        old_unknown = self.unknown_counter
         solution = self._binary_partition(timer, (1, 1), self.upper_bound)
         return self._build_result(solution, timer.elapsed(),
-                                  self.synthesizer_counter - old_counter)
+                                  self.synthesizer_counter - old_counter,
+                                  self.unknown_counter - old_unknown)
 
     def _binary_partition(self, timer, lower, upper):
         (lower_m, lower_n) = lower
@@ -130,14 +187,15 @@ class BinaryPartition(SearchBase):
     def _partition_vertical(self, timer, lower_m, lower_n, upper_m, upper_n):
         mid_column = lower_n + (upper_n - lower_n) // 2
         row_values = [(m, mid_column) for m in range(lower_m, upper_m + 1)]
-        minimum = self._binary_minimum(timer, row_values)
-        parting_row = minimum.get("solution_height")
+        (minimum, first, solved) = self._binary_minimum(timer, row_values)
+        rows = list(range(lower_m, upper_m + 2))
 
-        left_lower = (parting_row, lower_n)
+        # the rows between both are undecided, they stay in both parts
+        left_lower = (rows[first], lower_n)
         left_upper = (upper_m, mid_column - 1)
 
         right_lower = (lower_m, mid_column + 1)
-        right_upper = (parting_row - 1, upper_n)
+        right_upper = (rows[solved] - 1, upper_n)
 
         results = (minimum,
                    self._binary_partition(timer, left_lower, left_upper),
@@ -148,13 +206,14 @@ class BinaryPartition(SearchBase):
     def _partition_horizontal(self, timer, lower_m, lower_n, upper_m, upper_n):
         mid_row = lower_m + (upper_m - lower_m) // 2
         column_values = [(mid_row, n) for n in range(lower_n, upper_n + 1)]
-        minimum = self._binary_minimum(timer, column_values)
-        parting_column = minimum.get("solution_width")
+        (minimum, first, solved) = self._binary_minimum(timer, column_values)
+        columns = list(range(lower_n, upper_n + 2))
 
+        # the columns between both are undecided, they stay in both parts
         left_lower = (mid_row + 1, lower_n)
-        left_upper = (upper_m, parting_column - 1)
+        left_upper = (upper_m, columns[solved] - 1)
 
-        right_lower = (lower_m, parting_column)
+        right_lower = (lower_m, columns[first])
         right_upper = (mid_row - 1, upper_n)
 
         results = (minimum,
@@ -165,38 +224,33 @@ class BinaryPartition(SearchBase):
 
     def _binary_minimum(self, timer, values):
         """
-        Returns the minimal value in `values` for which a solution is possible.
+        Searches the minimal value in `values` for which a solution is
+        possible. Returns its result (empty if there is none), the index of
+        the first value not proven unsolvable and the index of the minimal
+        solved value (`len(values)` if none). An unknown probe narrows
+        nothing, the values between both indices may stay undecided.
         """
-        def recurse(lower, upper, cache):
-            mid = (lower + upper) // 2
+        (lower, upper) = (0, len(values))
+        (minimum, unknown) = (dict(), set())
+        while True:
+            candidates = [i for i in range(lower, upper) if i not in unknown]
+            if not candidates: return (minimum, lower, upper)
+            mid = candidates[(len(candidates) - 1) // 2]
             result = self._synthesize(timer, *values[mid])
-            cache[mid] = result
-
-            if result.get("solution") is None:
-                (new_lower, new_upper) = (mid + 1, upper)
-            else: (new_lower, new_upper) = (lower, mid - 1)
-
-            if new_upper < new_lower:
-                if result.get("solution") is None:
-                    if new_upper == len(values) - 1:
-                        (upper_m, upper_n) = values[-1]
-                        return {"solution_width": upper_n + 1,
-                                "solution_height": upper_m + 1,
-                                "solution": None}
-                    return cache.get(mid + 1)
-                else: return result
-            return recurse(new_lower, new_upper, cache)
-
-        return recurse(0, len(values) - 1, dict())
+            if result.get("unknown"): unknown.add(mid)
+            elif result.get("solution") is None: lower = mid + 1
+            else: (minimum, upper) = (result, mid)
 
 
 class Saddleback(SearchBase):
     def synth(self):
         timer = synth.timer.Timer()
         old_counter = self.synthesizer_counter
+        old_unknown = self.unknown_counter
         solution = self._saddle_back(timer, (1, 1), self.upper_bound)
         return self._build_result(solution, timer.elapsed(),
-                                  self.synthesizer_counter - old_counter)
+                                  self.synthesizer_counter - old_counter,
+                                  self.unknown_counter - old_unknown)
 
     def _saddle_back(self, timer, lower, upper):
         (lower_m, lower_n) = lower
@@ -204,13 +258,19 @@ class Saddleback(SearchBase):
 
         best_solution = dict()
         best_dimensions = upper
+        # the probes without answer, below them their column is undecided
+        unknown = list()
         (row, column) = (lower_m, upper_n)
         while row <= upper_m and column >= lower_n:
             if row * column < self.lower_bound:
                 row += 1
             else:
                 result = self._synthesize(timer, row, column)
-                if result.get("solution") is None:
+                if result.get("unknown"):
+                    # the smaller columns of the row as after a solution
+                    unknown.append((row, column))
+                    column -= 1
+                elif result.get("solution") is None:
                     row += 1
                 else:
                     (best_m, best_n) = best_dimensions
@@ -218,4 +278,17 @@ class Saddleback(SearchBase):
                         best_solution = result
                         best_dimensions = (row, column)
                     column -= 1
+
+        for (row, column) in unknown:
+            (best_m, best_n) = best_dimensions
+            if best_solution and (row + 1) * column >= best_m * best_n:
+                continue
+            result = self._saddle_back(timer, (row + 1, column),
+                                       (upper_m, column))
+            if result.get("solution") is None: continue
+            if result["solution_height"] * result["solution_width"] \
+                    < best_m * best_n or not best_solution:
+                best_solution = result
+                best_dimensions = (result["solution_height"],
+                                   result["solution_width"])
         return best_solution
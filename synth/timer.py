@@ -10,6 +10,12 @@ class Timer:
     def elapsed(self):
         return self._elapsed
 
+    def add(self, seconds):
+        """
+        Adds time measured elsewhere, e.g. reported by a running process.
+        """
+        self._elapsed += seconds
+
     @contextlib.contextmanager
     def measure(self, process=False):
         flag = resource.RUSAGE_SELF if not process else resource.RUSAGE_CHILDREN
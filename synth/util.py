@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 
+import array
 import functools
+import itertools as it
+
+import numpy as np
+import pyeda.boolalg.expr as expr
 
 def assert_cnf(function):
     msg = "{}: {} is not in CNF"
@@ -13,3 +18,276 @@ def assert_cnf(function):
     return wrapper
 
 
+def variable_key(variable):
+    """
+    Sort key of a pyeda variable by its name. pyeda orders the operands of an
+    expression by their address, which differs from run to run, so clauses
+    are put in this order before they are numbered.
+    """
+    return (variable.names, variable.indices)
+
+def literal_key(literal):
+    negated = isinstance(literal, expr.Complement)
+    return variable_key(~literal if negated else literal) + (negated, )
+
+def clause_literals(clause):
+    """
+    The literals of a pyeda clause (a disjunction or a literal) in the order
+    of `literal_key()`.
+    """
+    literals = clause.xs if isinstance(clause, expr.OrOp) else (clause, )
+    return sorted(literals, key=literal_key)
+
+def clause_key(clause):
+    return [literal_key(l) for l in clause_literals(clause)]
+
+
+def flat_literals(clauses):
+    """
+    The literals of a flat buffer of 0 terminated clauses (`array('i')`,
+    NumPy array or `ClauseBuffer`) as `array('i')`, `None` for other
+    iterables of clauses.
+    """
+    if isinstance(clauses, ClauseBuffer): return clauses.literals
+    if isinstance(clauses, array.array) and clauses.typecode == "i":
+        return clauses
+    if isinstance(clauses, (array.array, np.ndarray)):
+        literals = array.array("i")
+        literals.frombytes(np.asarray(clauses, dtype=np.intc).tobytes())
+        return literals
+    return None
+
+def split_literals(literals):
+    """
+    Yields the clauses of a flat buffer of 0 terminated clauses as lists.
+    """
+    literals = np.frombuffer(literals, dtype=np.intc) \
+               if isinstance(literals, array.array) else np.asarray(literals)
+    start = 0
+    for end in np.flatnonzero(literals == 0).tolist():
+        yield literals[start:end].tolist()
+        start = end + 1
+
+
+class ClauseBuffer:
+    """
+    Integer clauses in a flat `array('i')`, each terminated by 0. Unlike a
+    list of lists this takes four bytes per literal, large unfolded
+    encodings would otherwise consist of millions of small objects.
+    """
+    def __init__(self, clauses=()):
+        self.literals = array.array("i")
+        self._count = 0
+        self.extend(clauses)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        return split_literals(self.literals)
+
+    def append(self, clause):
+        self.literals.extend(clause)
+        self.literals.append(0)
+        self._count += 1
+
+    def extend(self, clauses):
+        literals = flat_literals(clauses)
+        if literals is None:
+            for clause in clauses: self.append(clause)
+            return
+        assert not literals or literals[-1] == 0, "unterminated clause"
+        self.literals.extend(literals)
+        self._count += literals.count(0)
+
+
+class VariablePool:
+    """
+    Hands out the integer variables of a single synthesis, starting from 1,
+    and maps them back to their keys. The pool is owned by the solver and
+    released with it, unlike pyeda's variable table.
+    """
+    def __init__(self):
+        self._keys = [None]
+        self._integers = dict()
+
+    def __len__(self):
+        return len(self._keys) - 1
+
+    def __iter__(self):
+        return iter(self._keys[1:])
+
+    def variable(self, key):
+        integer = self._integers.get(key)
+        if integer is None:
+            integer = self._integers[key] = self.fresh(key)
+        return integer
+
+    def find(self, key):
+        """
+        The integer of `key`, `None` if it has none.
+        """
+        return self._integers.get(key)
+
+    def fresh(self, key=None):
+        self._keys.append(key)
+        return len(self._keys) - 1
+
+    def decode(self, integer):
+        return self._keys[integer]
+
+    def release(self):
+        self._keys = [None]
+        self._integers = dict()
+
+
+class LiteralMapping:
+    """
+    Translates between pyeda literals and the integer literals used by the
+    clause generators in `synth.constraint`.
+    """
+    def __init__(self, new_variable):
+        self._new_variable = new_variable
+        self._pool = VariablePool()
+
+    def encode(self, literal):
+        negated = isinstance(literal, expr.Complement)
+        var = ~literal if negated else literal
+
+        integer = self._pool.variable(var)
+        if negated: return -integer
+        return integer
+
+    def next_aux(self):
+        return self._pool.fresh(self._new_variable())
+
+    def decode(self, clause):
+        variables = self._pool
+        return expr.Or(*(variables.decode(x) if x > 0 else ~variables.decode(-x)
+                         for x in clause))
+
+
+def expr_clauses(generate, inputs, *args, equivalent=None, new_variable=None,
+                 prefix="aux", **kwargs):
+    """
+    The pyeda clauses of the integer clause generator `generate(inputs,
+    *args, next_aux, equivalent, **kwargs)` called with the pyeda literals
+    `inputs` and `equivalent`. The auxiliaries come from `new_variable()`,
+    without it they are named `(prefix, index)` per call: several encodings
+    in one formula need a common `new_variable`.
+    """
+    if new_variable is None:
+        counter = it.count()
+        new_variable = lambda: expr.exprvar(prefix, next(counter))
+    mapping = LiteralMapping(new_variable)
+    variables = [mapping.encode(x) for x in inputs]
+    equivalent = None if equivalent is None else mapping.encode(equivalent)
+    for clause in generate(variables, *args, mapping.next_aux, equivalent,
+                           **kwargs):
+        yield mapping.decode(clause)
+
+
+class ConstantPropagation:
+    """
+    Partial evaluation of a batch of integer clauses before they reach the
+    solver: unit clauses are propagated, satisfied clauses dropped and false
+    literals removed. Variables from `first` on are local to the batch and
+    disappear once fixed, fixed variables below `first` are kept as unit
+    clauses since other batches may refer to them.
+    """
+    def __init__(self):
+        self.eliminated_clauses = 0
+        self.eliminated_variables = 0
+
+    @staticmethod
+    def _propagate(clauses, occurrences, values):
+        """
+        Extends `values` by unit propagation, returns `False` on a conflict.
+        """
+        units = [c[0] for c in clauses if len(c) == 1]
+        while units:
+            literal = units.pop()
+            value = values.get(abs(literal))
+            if value is not None:
+                if value != (literal > 0): return False
+                continue
+            values[abs(literal)] = literal > 0
+
+            for index in occurrences[abs(literal)]:
+                remaining = list()
+                for x in clauses[index]:
+                    value = values.get(abs(x))
+                    if value is None: remaining.append(x)
+                    elif value == (x > 0): break
+                else:
+                    if not remaining: return False
+                    if len(remaining) == 1: units.append(remaining[0])
+        return True
+
+    def simplify(self, clauses, first):
+        clauses = [list(c) for c in clauses]
+        occurrences = dict()
+        for (index, clause) in enumerate(clauses):
+            for x in clause: occurrences.setdefault(abs(x), list()).append(index)
+
+        values = dict()
+        if not self._propagate(clauses, occurrences, values):
+            self.eliminated_clauses += len(clauses) - 1
+            return [[]]
+
+        result = [[v if value else -v] for (v, value) in values.items()
+                  if v < first]
+        self.eliminated_variables += len(values) - len(result)
+        for clause in clauses:
+            if any(values.get(abs(x)) == (x > 0) for x in clause): continue
+            result.append([x for x in clause if abs(x) not in values])
+
+        self.eliminated_clauses += len(clauses) - len(result)
+        return result
+
+
+class Expansion:
+    """
+    Copies of a template of CNF clauses, one per assignment of the `expanded`
+    variables: those are replaced by their values, the `shared` variables are
+    encoded by the solver and all other variables are fresh per copy.
+    """
+    def __init__(self, cnfs, shared, expanded):
+        self._shared = frozenset(shared)
+        self._expanded = frozenset(expanded)
+        self._template = [self._literals(c) for cnf in cnfs
+                          for c in self._clauses(cnf)]
+
+    @staticmethod
+    def _clauses(cnf):
+        if cnf.is_one(): return ()
+        elif isinstance(cnf, expr.AndOp): return sorted(cnf.xs, key=clause_key)
+        return (cnf, )
+
+    @staticmethod
+    def _literals(clause):
+        if clause.is_zero(): return []
+        return [(~l, False) if isinstance(l, expr.Complement) else (l, True)
+                for l in clause_literals(clause)]
+
+    def clauses(self, solver, assignment):
+        """
+        Yields the integer clauses of the copy for `assignment` (a mapping of
+        the expanded variables to their values), satisfied clauses are left
+        out.
+        """
+        fresh = dict()
+        def encode(variable):
+            if variable in self._shared: return solver.encode(variable)
+            if variable not in fresh: fresh[variable] = solver.new_variable()
+            return fresh[variable]
+
+        for template in self._template:
+            clause = list()
+            for (variable, positive) in template:
+                if variable not in self._expanded:
+                    integer = encode(variable)
+                    clause.append(integer if positive else -integer)
+                elif assignment[variable] == positive: break
+            else:
+                yield clause
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 
 import unittest
+import itertools as it
 import pyeda.boolalg.expr as expr
 
 import hypothesis
 from .util import complex_functions
 
+import synth.sat
 import synth.constraint as constraint
 
 class TestCardinality(unittest.TestCase):
@@ -130,5 +132,104 @@ class TestCardinality(unittest.TestCase):
             self.assertEqual(sat_a.get(equivalent), sat_b.get(equivalent))
 
 
+class TestEqualsClauses(unittest.TestCase):
+    def satisfiable(self, arity, p, values, equivalent=None, **kwargs):
+        solver = synth.sat.Minisat()
+        inputs = solver.new_variables(arity)
+        counter = solver.new_variable
+        if equivalent is None:
+            clauses = constraint.equals_clauses(inputs, p, counter)
+        else:
+            condition = solver.new_variable()
+            clauses = constraint.equals_clauses(inputs, p, counter, condition,
+                                                **kwargs)
+            solver.add_clauses([[condition if equivalent else -condition]])
+        solver.add_clauses(clauses)
+        solver.add_clauses([x if v else -x] for (x, v) in zip(inputs, values))
+        return solver.solve(no_decode=True) is not None
+
+    def check(self, equivalent=None, **kwargs):
+        for arity in range(1, 7):
+            for p in range(arity + 2):
+                for values in it.product((False, True), repeat=arity):
+                    expected = sum(values) == p
+                    if equivalent is False:
+                        expected = kwargs.get("half_reified", False) or not expected
+                    sat = self.satisfiable(arity, p, values, equivalent,
+                                           **kwargs)
+                    self.assertEqual(expected, sat, (arity, p, values))
+
+    def test_equals(self):
+        self.check()
+
+    def test_equals_equivalent(self):
+        self.check(True)
+        self.check(False)
+
+    def test_equals_half_reified(self):
+        self.check(True, half_reified=True)
+        self.check(False, half_reified=True)
+
+
+class TestEqualsClausesPairwise(TestEqualsClauses):
+    encoding = "pairwise"
+
+    def setUp(self):
+        constraint.override(self.encoding)
+
+    def tearDown(self):
+        constraint.override(None)
+
+
+class TestEqualsClausesCardnet(TestEqualsClausesPairwise):
+    encoding = "cardnet"
+
+
+class TestEqualsClausesTotalizer(TestEqualsClausesPairwise):
+    encoding = "totalizer"
+
+
+class TestEncodingSelection(unittest.TestCase):
+    def tearDown(self):
+        constraint.override(None)
+        constraint.reset_clause_counts()
+
+    def test_smallest(self):
+        for (arity, p) in ((3, 1), (4, 2), (12, 1), (12, 2)):
+            sizes = {name: constraint.encoding_size(name, "equals", arity, p)
+                     for name in ("cardnet", "totalizer")}
+            selected = constraint.select_encoding("equals", arity, p)
+            size = constraint.encoding_size(selected, "equals", arity, p)
+            self.assertLessEqual(size, min(sizes.values()))
+
+    def test_override(self):
+        constraint.override("cardnet")
+        self.assertEqual("cardnet", constraint.select_encoding("at_most", 3, 2))
+
+    def test_override_function(self):
+        constraint.override(lambda kind, arity, p:
+                            "totalizer" if kind == "at_least" else None)
+        self.assertEqual("totalizer",
+                         constraint.select_encoding("at_least", 3, 2))
+        self.assertEqual("pairwise", constraint.select_encoding("at_most", 3, 2))
+
+    def test_override_unsupported(self):
+        constraint.override("sequential")
+        self.assertNotEqual("sequential",
+                            constraint.select_encoding("at_most", 3, 2))
+
+    def test_override_unknown(self):
+        with self.assertRaises(ValueError):
+            constraint.override("unknown")
+
+    def test_clause_counts(self):
+        constraint.reset_clause_counts()
+        constraint.override("totalizer")
+        counter = it.count(4)
+        clauses = list(constraint.at_most_clauses([1, 2, 3], 1,
+                                                  lambda: next(counter)))
+        self.assertEqual({"totalizer": len(clauses)}, constraint.clause_counts())
+
+
 if __name__ == '__main__':
     unittest.main()
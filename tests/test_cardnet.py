@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import unittest
+import itertools as it
 import pyeda.boolalg.expr as expr
 
 import synth.constraint.cardnet as cardnet
@@ -260,5 +261,30 @@ class TestCardnetEquals(TestBase):
         self.assertEqual(sat.get(equals), 1)
 
 
+class TestCardnetSkeleton(unittest.TestCase):
+    def network(self, inputs, p):
+        counter = it.count(100)
+        network = cardnet.Cardnet(lambda: next(counter))
+        (variables, clauses) = network.cardnet(inputs, p)
+        return (variables, {frozenset(c) for c in clauses})
+
+    def test_instantiation_matches_network(self):
+        for (arity, p) in ((4, 2), (8, 2), (5, 1), (3, 0)):
+            inputs = [(-1) ** i * (i + 1) for i in range(arity)]
+            (variables, expected) = self.network(inputs, p)
+            counter = it.count(100)
+            clauses = {frozenset(c) for c in
+                       cardnet.at_most_clauses(inputs, p, lambda: next(counter))}
+            expected.add(frozenset([-variables[p]]))
+            self.assertEqual(expected, clauses)
+
+    def test_skeleton_reused(self):
+        counter = it.count(100)
+        list(cardnet.at_most_clauses([1, 2, 3, 4], 2, lambda: next(counter)))
+        hits = cardnet._skeleton.cache_info().hits
+        list(cardnet.at_most_clauses([5, 6, 7, 8], 2, lambda: next(counter)))
+        self.assertEqual(hits + 1, cardnet._skeleton.cache_info().hits)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+import pyeda.boolalg.expr as expr
+
+import synth
+import synth.sat
+import synth.constraint as constraint
+import synth.irredundant
+import synth.reachability
+import synth.base.cnf_cache as cnf_cache
+
+
+class TestCanonicalOrder(unittest.TestCase):
+    def setUp(self):
+        (self.c, self.b, self.a) = (expr.exprvar(x) for x in "cba")
+
+    def test_numbering(self):
+        (a, b, c) = (self.a, self.b, self.c)
+        solver = synth.sat.Dimacs("solver")
+        solver.add(expr.And(expr.Or(c, ~b), expr.Or(b, a)))
+        self.assertEqual([a, b, c], solver.variables())
+        self.assertEqual([[1, 2], [-2, 3]], list(solver.encoded()[1]))
+
+    def test_canonical_form(self):
+        (a, b, c) = (self.a, self.b, self.c)
+        first = synth.Function(None, (a & ~b) | c)
+        second = synth.Function(None, expr.Or(c, ~b & a, a & ~b & c))
+        self.assertEqual("a & ~b | c", first.canonical_form())
+        self.assertEqual(first.canonical_form(), second.canonical_form())
+
+    def test_sorted_inputs(self):
+        function = synth.Function(None, (self.c & self.b) | self.a)
+        self.assertEqual((self.a, self.b, self.c), function.sorted_inputs())
+        domain = list(function.iter_domain())
+        self.assertEqual(8, len(domain))
+        self.assertEqual({self.a: 1, self.b: 0, self.c: 0}, domain[1])
+
+
+class CnfCacheBase:
+    def setUp(self):
+        (a, b, c) = (expr.exprvar(x) for x in "abc")
+        self.function = synth.Function(None, (a & b) | (~a & c))
+        self.directory = tempfile.TemporaryDirectory()
+        cnf_cache.persist(self.directory.name)
+
+    def tearDown(self):
+        cnf_cache.persist(None)
+        constraint.override(None)
+        self.directory.cleanup()
+
+    def encode(self, **options):
+        synthesizer = self.METHOD(self.function, 2, 2, self.SOLVER, **options)
+        solver = synthesizer.solver()
+        synthesizer._encode_cached(solver, synthesizer._add_formula)
+        return (synthesizer._cnf_cached, list(solver._generate_input()),
+                solver.variables())
+
+    def test_restored(self):
+        (cached, formula, variables) = self.encode()
+        self.assertFalse(cached)
+        self.assertEqual(1, len(os.listdir(self.directory.name)))
+        self.assertEqual((True, formula, variables), self.encode())
+
+    def test_options(self):
+        self.encode()
+        (cached, _formula, _variables) = self.encode(symmetry_breaking=True)
+        self.assertFalse(cached)
+        self.assertEqual(2, len(os.listdir(self.directory.name)))
+
+    def test_selection_function(self):
+        constraint.override(lambda kind, arity, p: None)
+        self.encode()
+        self.assertIsNone(self.encode()[0])
+        self.assertEqual(0, len(os.listdir(self.directory.name)))
+
+
+class TestCnfCacheIrredundantQBFUnfolded(CnfCacheBase, unittest.TestCase):
+    METHOD = synth.irredundant.QBFUnfolded
+    SOLVER = "cryptominisat5"
+
+class TestCnfCacheReachabilityQBFUnfolded(CnfCacheBase, unittest.TestCase):
+    METHOD = synth.reachability.QBFUnfolded
+    SOLVER = "cryptominisat5"
+
+    def test_path_deepening(self):
+        self.encode(path_deepening=True)
+        self.assertEqual(0, len(os.listdir(self.directory.name)))
+
+class TestCnfCacheIrredundantQBF(CnfCacheBase, unittest.TestCase):
+    METHOD = synth.irredundant.QBFSynth
+    SOLVER = "depqbf"
+
+class TestCnfCacheIrredundantHybrid(CnfCacheBase, unittest.TestCase):
+    METHOD = synth.irredundant.HybridSynth
+    SOLVER = "depqbf"
+
+class TestCnfCacheReachabilityHybrid(CnfCacheBase, unittest.TestCase):
+    METHOD = synth.reachability.HybridSynth
+    SOLVER = "depqbf"
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import unittest
+import pyeda.boolalg.expr as expr
+
+import synth
+import synth.irredundant
+import synth.reachability
+from synth.util import ConstantPropagation
+
+
+class TestConstantPropagation(unittest.TestCase):
+    def test_satisfied_dropped(self):
+        propagation = ConstantPropagation()
+        clauses = propagation.simplify([[3], [3, 1], [-3, 1, 2]], 3)
+        self.assertEqual([[1, 2]], clauses)
+        self.assertEqual(2, propagation.eliminated_clauses)
+        self.assertEqual(1, propagation.eliminated_variables)
+
+    def test_chain(self):
+        propagation = ConstantPropagation()
+        clauses = propagation.simplify([[-3], [4, 3], [-4, 5], [-5, 1, 2]], 3)
+        self.assertEqual([[1, 2]], clauses)
+        self.assertEqual(3, propagation.eliminated_variables)
+
+    def test_global_kept(self):
+        propagation = ConstantPropagation()
+        clauses = propagation.simplify([[3], [-3, 1], [-1, 2, 4]], 3)
+        self.assertEqual([[1], [2, 4]], clauses)
+        self.assertEqual(1, propagation.eliminated_variables)
+
+    def test_conflict(self):
+        propagation = ConstantPropagation()
+        clauses = propagation.simplify([[3], [-3, 4], [-4, -3], [1, 2]], 3)
+        self.assertEqual([[]], clauses)
+
+
+class TestEliminatedStatistics(unittest.TestCase):
+    def synth(self, module, propagate_constants):
+        (a, b) = (expr.exprvar("a"), expr.exprvar("b"))
+        function = synth.Function(None, a & b | ~a & ~b)
+        synthesizer = module.QBFUnfolded(
+            function, 2, 2, encoding="integer",
+            propagate_constants=propagate_constants)
+        return synthesizer.synth()
+
+    def test_reachability(self):
+        result = self.synth(synth.reachability, True)
+        self.assertIsNotNone(result.get("solution"))
+        self.assertGreater(result["eliminated_clauses"], 0)
+        self.assertGreater(result["eliminated_variables"], 0)
+
+    def test_irredundant(self):
+        result = self.synth(synth.irredundant, True)
+        self.assertIsNotNone(result.get("solution"))
+
+    def test_disabled(self):
+        result = self.synth(synth.reachability, False)
+        self.assertIsNotNone(result.get("solution"))
+        self.assertEqual(0, result["eliminated_clauses"])
+        self.assertEqual(0, result["eliminated_variables"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import unittest
+import pyeda.boolalg.expr as expr
+
+import synth.sat
+from synth.util import Expansion
+
+
+class TestExpansion(unittest.TestCase):
+    def setUp(self):
+        (self.a, self.b, self.x, self.y) = (expr.exprvar(v) for v in "abxy")
+        self.solver = synth.sat.Minisat()
+
+    def test_substituted(self):
+        cnfs = [expr.Or(~self.a, self.x, self.y), expr.Or(self.a, ~self.x)]
+        expansion = Expansion(cnfs, [self.x], [self.a])
+
+        x = self.solver.encode(self.x)
+        clauses = list(expansion.clauses(self.solver, {self.a: True}))
+        self.assertEqual(1, len(clauses))
+        self.assertEqual(x, clauses[0][0])
+        self.assertNotIn(abs(clauses[0][1]), (x, self.solver.encode(self.a)))
+
+        clauses = list(expansion.clauses(self.solver, {self.a: False}))
+        self.assertEqual([[-x]], clauses)
+
+    def test_fresh_per_copy(self):
+        cnfs = [expr.And(expr.Or(self.b, self.y), expr.Or(~self.y, self.x))]
+        expansion = Expansion(cnfs, [self.x, self.y], [self.a])
+        first = list(expansion.clauses(self.solver, {self.a: False}))
+        second = list(expansion.clauses(self.solver, {self.a: True}))
+        self.assertEqual(first[1], second[1])
+        self.assertNotEqual(first[0][0], second[0][0])
+        self.assertEqual(first[0][1], second[0][1])
+
+    def test_constants(self):
+        expansion = Expansion([expr.One, expr.Zero], [], [])
+        self.assertEqual([[]], list(expansion.clauses(self.solver, {})))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import unittest
+import itertools as it
+import pyeda.boolalg.expr as expr
+
+import synth.constraint.gadget as gadget
+
+
+class TestGadget(unittest.TestCase):
+    def setUp(self):
+        self.condition = expr.exprvar("condition")
+        self.inputs = tuple(expr.exprvar(p) for p in "ab")
+        self.selection = {x: (expr.exprvar(("positive", x.name)),
+                              expr.exprvar(("negative", x.name)))
+                          for x in self.inputs}
+
+    def clauses(self, constructor):
+        for inp in self.inputs:
+            (positive, negative) = self.selection[inp]
+            yield from constructor(self.condition, positive, negative, inp)
+
+    def check(self, constructor, expected_value):
+        clauses = list(self.clauses(constructor))
+        literals = [(x, negated) for x in self.inputs
+                    for negated in (False, True)]
+
+        for (x, negated) in literals:
+            selection = {v: (v is self.selection[x][negated])
+                         for v in it.chain.from_iterable(self.selection.values())}
+            for values in it.product((0, 1), repeat=len(self.inputs)):
+                assignment = dict(zip(self.inputs, values))
+                literal_value = bool(assignment[x]) != negated
+
+                fixed = dict(it.chain(selection.items(), assignment.items()))
+                fixed[self.condition] = 1
+                formula = expr.And(*clauses).restrict(fixed)
+                satisfiable = formula.satisfy_one() is not None
+                self.assertEqual(literal_value == expected_value, satisfiable)
+
+    def test_selected_true(self):
+        self.check(gadget.selected_true, True)
+
+    def test_selected_false(self):
+        self.check(gadget.selected_false, False)
+
+    def test_no_condition(self):
+        clauses = list(self.clauses(gadget.selected_true))
+        clauses += list(self.clauses(gadget.selected_false))
+        formula = expr.And(~self.condition, *clauses)
+        self.assertIsNotNone(formula.satisfy_one())
+
+    def test_not_selectable(self):
+        (positive, _negative) = self.selection[self.inputs[0]]
+        clauses = list(gadget.selected_true(self.condition, positive, None,
+                                            self.inputs[0]))
+        self.assertEqual(1, len(clauses))
+        expected = expr.Or(~self.condition, ~positive, self.inputs[0])
+        self.assertTrue(expected.equivalent(clauses[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
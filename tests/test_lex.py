@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+import unittest
+import itertools as it
+import pyeda.boolalg.expr as expr
+
+import synth.constraint.lex as lex
+
+class TestLexLessEqual(unittest.TestCase):
+    def check(self, length):
+        xs = [expr.exprvar("x", i) for i in range(length)]
+        ys = [expr.exprvar("y", i) for i in range(length)]
+        constraint = expr.And(*lex.less_equal(xs, ys))
+
+        for values in it.product((0, 1), repeat=2 * length):
+            (a, b) = (values[:length], values[length:])
+            point = dict(zip(xs + ys, values))
+            restricted = constraint.restrict(point)
+            satisfiable = restricted.satisfy_one() is not None
+            self.assertEqual(a <= b, satisfiable, (a, b))
+
+    def test_less_equal(self):
+        for length in range(1, 4):
+            self.check(length)
+
+    def test_identical(self):
+        (x, y) = (expr.exprvar("x"), expr.exprvar("y"))
+        constraint = list(lex.less_equal([x, y], [x, ~x]))
+        self.assertEqual(1, len(constraint))
+
+    def test_empty(self):
+        self.assertEqual([], list(lex.less_equal([], [])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import unittest
+import itertools as it
+import hypothesis
+import hypothesis.strategies as st
+
+from synth.preprocess import Preprocessor
+
+
+def satisfies(model, clauses):
+    values = {abs(x): x > 0 for x in model}
+    return all(any(values.get(abs(x), False) == (x > 0) for x in c)
+               for c in clauses)
+
+def models(clauses, variables):
+    for values in it.product((False, True), repeat=len(variables)):
+        model = [v if b else -v for (v, b) in zip(variables, values)]
+        if satisfies(model, clauses): yield model
+
+
+@st.composite
+def formulas(draw):
+    size = draw(st.integers(min_value=2, max_value=6))
+    literals = st.integers(min_value=1, max_value=size).flatmap(
+        lambda v: st.sampled_from((v, -v)))
+    clauses = draw(st.lists(st.lists(literals, min_size=1, max_size=3),
+                            min_size=1, max_size=12))
+    return (size, clauses)
+
+
+class TestPreprocessor(unittest.TestCase):
+    def test_units(self):
+        preprocessor = Preprocessor()
+        self.assertEqual([], preprocessor.simplify([[1], [-1, 2], [-2, 3, 4]]))
+        model = preprocessor.extend([])
+        self.assertTrue(satisfies(model, [[1], [-1, 2], [-2, 3, 4]]))
+
+    def test_conflict(self):
+        self.assertEqual([[]], Preprocessor().simplify([[1], [-1, 2], [-2]]))
+
+    def test_kept(self):
+        clauses = [[1, 3], [-3, 2], [3, -2], [-1, 2, 4]]
+        simplified = Preprocessor({3, 4}).simplify(clauses)
+        self.assertEqual([[1, 2]], simplified)
+
+    def test_subsumed(self):
+        clauses = [[1, 2], [1, 2, 3], [-1, -2, 4], [-1, -2, 4, 5]]
+        simplified = Preprocessor(set()).simplify(clauses)
+        self.assertEqual(2, len(simplified))
+
+    @hypothesis.given(formulas())
+    def test_equisatisfiable(self, formula):
+        (size, clauses) = formula
+        preprocessor = Preprocessor()
+        simplified = preprocessor.simplify(clauses)
+        variables = list(range(1, size + 1))
+        model = next(models(simplified, variables), None)
+        self.assertEqual(model is None, next(models(clauses, variables),
+                                             None) is None)
+        if model is not None:
+            self.assertTrue(satisfies(preprocessor.extend(model), clauses))
+
+    @hypothesis.given(formulas(), st.data())
+    def test_projection(self, formula, data):
+        (size, clauses) = formula
+        variables = list(range(1, size + 1))
+        kept = data.draw(st.lists(st.sampled_from(variables), unique=True))
+        eliminable = set(variables) - set(kept)
+        simplified = Preprocessor(eliminable).simplify(clauses)
+        for model in models([], kept):
+            units = [[x] for x in model]
+            self.assertEqual(
+                next(models(clauses + units, variables), None) is None,
+                next(models(simplified + units, variables), None) is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
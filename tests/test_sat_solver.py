@@ -1,18 +1,31 @@
 #!/usr/bin/env python3
 
+import os
 import sys
+import time
+import array
+import asyncio
+import tempfile
 import unittest
 import itertools as it
+import numpy as np
 import pyeda.boolalg.expr as expr
 
+import synth
 import synth.sat
+import synth.timer
 import synth.constraint
+import synth.irredundant
+from synth.util import ClauseBuffer
 
 from .util import solver_exists
+from .util import test_lattice as lattice_equivalent
 
 class TestSat:
+    OPTIONS = dict()
+
     def get_solver(self):
-        factory = synth.sat.Dimacs.from_known(self.SOLVER)
+        factory = synth.sat.Dimacs.from_known(self.SOLVER, **self.OPTIONS)
         return factory()
 
     def setUp(self):
@@ -63,10 +76,33 @@ class TestSat:
         solution = solver.solve(assumptions=assumptions)
         self.assertIsNone(solution)
 
+    def test_add_clauses_buffer(self):
+        solver = self.get_solver()
+        solver.add(expr.And(*self.pos))
+        units = [(-solver.encode(n), 0) for n in self.neg]
+        solver.add_clauses(array.array("i", it.chain(*units[:3])))
+        solver.add_clauses(np.array(list(it.chain(*units[3:]))))
+
+        solution = solver.solve()
+        expected = dict(it.chain(((p, True) for p in self.pos),
+                                 ((n, False) for n in self.neg)))
+        self.assertEqual(expected, solution)
+
+    def test_sat_of_interest(self):
+        solver = self.get_solver()
+        solver.add(expr.And(*self.pos, *(~n for n in self.neg)))
+        unknown = expr.exprvar("unknown")
+        of_interest = [self.pos[0], self.neg[0], unknown]
+
+        expected = {self.pos[0]: True, self.neg[0]: False}
+        self.assertEqual(expected, solver.solve(of_interest))
+        self.assertEqual(expected, solver.solve(of_interest))
+        self.assertEqual(expected, solver.solve(set(of_interest)))
+
 
 class TestQbf(TestSat):
     def get_solver(self):
-        factory = synth.sat.QDimacs.from_known(self.SOLVER)
+        factory = synth.sat.QDimacs.from_known(self.SOLVER, **self.OPTIONS)
         return factory()
 
     def test_qbf_positive(self):
@@ -111,6 +147,303 @@ class TestQbf(TestSat):
         self.assertTrue(sat.get(equals))
 
 
+class TestClauseBuffer(unittest.TestCase):
+    def test_clauses(self):
+        clauses = ClauseBuffer([[1, -2], [3]])
+        clauses.append([])
+        clauses.extend(np.array([-1, 2, 0, 4, 0]))
+        self.assertEqual(5, len(clauses))
+        self.assertEqual([[1, -2], [3], [], [-1, 2], [4]], list(clauses))
+        self.assertEqual([1, -2, 0, 3, 0, 0, -1, 2, 0, 4, 0],
+                         clauses.literals.tolist())
+
+
+class TestDecode(unittest.TestCase):
+    def test_decode(self):
+        (a, b, c) = (expr.exprvar(x) for x in "abc")
+        solver = synth.sat.Dimacs("solver")
+        solver.add(expr.And(expr.Or(a, ~b), c))
+        model = [1, -2, 3]
+        self.assertEqual({a: True, b: False, c: True}, solver.decode(model))
+        self.assertEqual({c: True, a: True}, solver.decode(model, [c, a]))
+        self.assertEqual({b: False}, solver.decode(model[:2], [b, c]))
+
+
+class TestOutputParsing(unittest.TestCase):
+    def test_dimacs(self):
+        solver = synth.sat.Dimacs("solver")
+        lines = iter(["c comment", "s SATISFIABLE", "v 1 -2", "v 3 0"])
+        self.assertEqual([1, -2, 3], solver._parse_output(lines))
+        self.assertIsNone(solver._parse_output(iter(["s UNSATISFIABLE"])))
+
+    def test_minisat(self):
+        solver = synth.sat.DimacsMinisat("minisat")
+        self.assertEqual([-1, 2], solver._parse_output(iter(["SAT", "-1 2 0"])))
+        self.assertIsNone(solver._parse_output(iter(["UNSAT"])))
+        for lines in (["INDET"], []):
+            with self.assertRaises(synth.sat.Unknown):
+                solver._parse_output(iter(lines))
+
+    def test_unknown(self):
+        solver = synth.sat.Dimacs("solver")
+        for lines in ([], ["s SATISFIABLE", "v 1 -2"], ["s INDETERMINATE"]):
+            with self.assertRaises(synth.sat.Unknown):
+                solver._parse_output(iter(lines))
+        with self.assertRaises(synth.sat.Unknown):
+            synth.sat.QDimacs("solver")._parse_output(iter(["s cnf -1 3 2"]))
+
+    def test_qdimacs(self):
+        solver = synth.sat.QDimacs("solver")
+        lines = iter(["c comment", "s cnf 1 3 2", "V -1 0", "V 2 0"])
+        self.assertEqual([-1, 2], solver._parse_output(lines))
+        self.assertTrue(solver._parse_output(iter(["s cnf 1 3 2", "V 1 0"]),
+                                             no_decode=True))
+        self.assertIsNone(solver._parse_output(iter(["s cnf 0 3 2"])))
+
+
+class TestIncrementalDimacs(unittest.TestCase):
+    def setUp(self):
+        (self.a, self.b, self.c) = (expr.exprvar(x) for x in "abc")
+        self.solver = synth.sat.Dimacs.from_known("isolver")()
+
+    def tearDown(self):
+        self.solver.close()
+
+    def test_session(self):
+        (a, b, c) = (self.a, self.b, self.c)
+        self.solver.add(expr.Or(a, b))
+        self.assertEqual({a: False, b: True},
+                         self.solver.solve(assumptions={a: False}))
+        process = self.solver._session
+
+        self.solver.add(expr.Or(~b, c))
+        self.solver.add(~a)
+        self.assertIsNone(self.solver.solve(assumptions={c: False}))
+        self.assertEqual({a: False, b: True, c: True}, self.solver.solve())
+        self.assertIs(process, self.solver._session)
+
+    def test_restart(self):
+        self.solver.add(expr.Or(self.a, self.b))
+        self.assertTrue(self.solver.solve(no_decode=True))
+        self.solver._session.kill()
+        with self.assertRaises(synth.sat.Unknown):
+            self.solver.solve()
+        self.solver.add(~self.a)
+        self.assertEqual({self.a: False, self.b: True}, self.solver.solve())
+
+    def test_parse_output(self):
+        lines = iter(["c time 0.5", "s SATISFIABLE", "v 1 -2 0", "v 3 0"])
+        timer = synth.timer.Timer()
+        self.assertEqual([1, -2], self.solver._parse_output(lines,
+                                                            timer=timer))
+        self.assertEqual(0.5, timer.elapsed())
+        self.assertEqual(["v 3 0"], list(lines))
+
+
+class TestPortfolio(TestSat, unittest.TestCase):
+    def get_solver(self):
+        return synth.sat.Portfolio(("libminisat", "libcryptominisat"))
+
+    def test_winner(self):
+        synth.sat.reset_portfolio_wins()
+        solver = self.get_solver()
+        solver.add(expr.Or(*self.pos))
+        self.assertTrue(solver.solve(no_decode=True))
+        solver.add(expr.And(*(~p for p in self.pos)))
+        self.assertIsNone(solver.solve())
+        self.assertIn(solver.winner, ("libminisat", "libcryptominisat"))
+        self.assertEqual(2, sum(synth.sat.portfolio_wins().values()))
+        solver.close()
+
+    def test_failing_backend(self):
+        solver = synth.sat.Portfolio(("unknown", "libminisat"))
+        solver.add(self.pos[0])
+        for _ in range(2):
+            self.assertEqual({self.pos[0]: True}, solver.solve())
+            self.assertEqual("libminisat", solver.winner)
+        solver.close()
+
+        solver = synth.sat.Portfolio(("unknown", ))
+        solver.add(self.pos[0])
+        with self.assertRaises(RuntimeError):
+            solver.solve()
+
+    def test_cancel(self):
+        with tempfile.NamedTemporaryFile(mode="r") as fob:
+            script = ("import os, time; print(os.getpid(), file=open({!r}, "
+                      "'w'), flush=True); time.sleep(10)").format(fob.name)
+            solver = synth.sat.Portfolio(
+                ("cryptominisat5", ), limits=synth.sat.Limits(wall=1),
+                executable=sys.executable, args=("-c", script))
+            solver.add(self.pos[0])
+            with self.assertRaises(synth.sat.Unknown):
+                solver.solve()
+            pid = int(fob.read())
+        # killed with the cancelled worker
+        for _ in range(100):
+            try:
+                with open("/proc/{}/stat".format(pid)) as stat:
+                    if stat.read().split(") ")[-1].startswith("Z"): break
+            except FileNotFoundError: break
+            time.sleep(0.01)
+        else: self.fail("solver process {} still runs".format(pid))
+
+    def test_synthesis(self):
+        (a, b, c) = (expr.exprvar(x) for x in "abc")
+        function = synth.Function(None, (a & b) | (~a & c))
+        synthesizer = synth.irredundant.CegarSynth(
+            function, 2, 2, "portfolio", portfolio=("libminisat", "isolver"))
+        solution = synthesizer.synth().get("solution")
+        self.assertTrue(lattice_equivalent(function, solution))
+
+
+class TestLimits(unittest.TestCase):
+    def setUp(self):
+        self.variable = expr.exprvar("a")
+
+    def solve(self, solver):
+        solver.add(self.variable)
+        return solver.solve()
+
+    def pigeonhole(self, solver, holes=12):
+        pigeons = [solver.new_variables(holes) for _ in range(holes + 1)]
+        solver.add_clauses(pigeons)
+        solver.add_clauses([-p[hole], -q[hole]] for hole in range(holes)
+                           for (p, q) in it.combinations(pigeons, 2))
+        return solver.solve(no_decode=True)
+
+    def test_wall(self):
+        solver = synth.sat.Dimacs("sleep", args=("10", ),
+                                  limits=synth.sat.Limits(wall=0.2))
+        with self.assertRaises(synth.sat.Unknown):
+            self.solve(solver)
+
+    def test_cpu(self):
+        solver = synth.sat.Dimacs(sys.executable,
+                                  args=("-c", "while True: pass"),
+                                  limits=synth.sat.Limits(cpu=1))
+        with self.assertRaises(synth.sat.Unknown):
+            self.solve(solver)
+
+    def test_memory(self):
+        solver = synth.sat.Dimacs(sys.executable,
+                                  args=("-c", "x = bytearray(1 << 30)"),
+                                  limits=synth.sat.Limits(memory=256))
+        with self.assertRaises(synth.sat.Unknown):
+            self.solve(solver)
+
+    def test_limits_at_start(self):
+        script = ("import resource\n"
+                  "(soft, _) = resource.getrlimit(resource.RLIMIT_AS)\n"
+                  "(cpu, _) = resource.getrlimit(resource.RLIMIT_CPU)\n"
+                  "print('s UNSATISFIABLE' if (soft, cpu) == ({}, 7) "
+                  "else '')").format(256 * 1024 * 1024)
+        solver = synth.sat.Dimacs(sys.executable, args=("-c", script),
+                                  limits=synth.sat.Limits(cpu=7, memory=256))
+        self.assertIsNone(self.solve(solver))
+
+    def test_binding(self):
+        limits = synth.sat.Limits(wall=0.2)
+        for name in ("libminisat", "isolver"):
+            factory = synth.sat.backend(name, limits=limits)
+            self.assertEqual({self.variable: True}, self.solve(factory()))
+            with self.assertRaises(synth.sat.Unknown):
+                self.pigeonhole(factory())
+
+    def test_binding_cpu(self):
+        factory = synth.sat.backend("libminisat",
+                                    limits=synth.sat.Limits(cpu=1))
+        solver = factory()
+        with self.assertRaises(synth.sat.Unknown):
+            self.pigeonhole(solver)
+        # a new worker answers the next call
+        solver = factory()
+        self.assertEqual({self.variable: True}, self.solve(solver))
+
+
+def run_async(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try: return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+class AsyncSolve:
+    def get_solver(self):
+        solver = super().get_solver()
+        solve = solver.solve_async
+        solver.solve = lambda *args, **kwargs: run_async(solve(*args,
+                                                               **kwargs))
+        return solver
+
+
+class TestAsync(unittest.TestCase):
+    def setUp(self):
+        self.variable = expr.exprvar("a")
+
+    def solver(self, script, **kwargs):
+        solver = synth.sat.Dimacs(sys.executable, args=("-c", script),
+                                  **kwargs)
+        solver.add(self.variable)
+        return solver
+
+    def test_concurrent(self):
+        script = ("import sys, time; sys.stdin.read(); time.sleep(0.5); "
+                  "print('s SATISFIABLE'); print('v 1 0')")
+        solvers = [self.solver(script) for _ in range(8)]
+        async def solve_all():
+            return await asyncio.gather(*(s.solve_async() for s in solvers))
+        results = run_async(solve_all())
+        self.assertEqual([{self.variable: True}] * 8, results)
+
+    def test_cancel(self):
+        with tempfile.NamedTemporaryFile(mode="r") as fob:
+            script = ("import os, time; print(os.getpid(), file=open({!r}, "
+                      "'w'), flush=True); time.sleep(10)").format(fob.name)
+            solver = self.solver(script)
+            async def cancel():
+                task = asyncio.ensure_future(solver.solve_async())
+                while not os.path.getsize(fob.name):
+                    await asyncio.sleep(0.01)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            run_async(cancel())
+            # killed and reaped
+            with self.assertRaises(ProcessLookupError):
+                os.kill(int(fob.read()), 0)
+
+    def test_wall(self):
+        solver = self.solver("import time; time.sleep(10)",
+                             limits=synth.sat.Limits(wall=0.2))
+        with self.assertRaises(synth.sat.Unknown):
+            run_async(solver.solve_async())
+
+    def test_timer(self):
+        script = ("x = 0\nfor i in range(3 * 10 ** 6): x += i\n"
+                  "print('s UNSATISFIABLE')")
+        (first, second) = (self.solver(script), self.solver(script))
+        timers = (synth.timer.Timer(), synth.timer.Timer())
+        async def solve_both():
+            return await asyncio.gather(first.solve_async(timer=timers[0]),
+                                        second.solve_async(timer=timers[1]))
+        total = synth.timer.Timer()
+        with total.measure(process=True):
+            self.assertEqual([None, None], run_async(solve_both()))
+        # each is charged its own process only
+        for timer in timers: self.assertGreater(timer.elapsed(), 0.05)
+        self.assertLessEqual(sum(t.elapsed() for t in timers),
+                             total.elapsed() + 0.01)
+
+    def test_thread(self):
+        solver = synth.sat.Minisat()
+        solver.add(~self.variable)
+        self.assertEqual({self.variable: False},
+                         run_async(solver.solve_async()))
+
+
 class TestMinisat(TestSat, unittest.TestCase):
     def get_solver(self):
         return synth.sat.Minisat()
@@ -120,20 +453,41 @@ class TestCryptominisat(TestSat, unittest.TestCase):
     def get_solver(self):
         return synth.sat.Cryptominisat()
 
+    def test_add_clauses_nested(self):
+        class Binding:
+            def __init__(self): self.clauses = list()
+            def add_clauses(self, clauses):
+                for clause in clauses: self.clauses.append(list(clause))
+
+        solver = self.get_solver()
+        solver._solver = Binding()
+        solver.add_clauses(array.array("i", [1, -2, 0, 3, 0]))
+        solver.add_clauses(array.array("i", [-1, 0]))
+        self.assertEqual([[1, -2], [3], [-1]], solver._solver.clauses)
+
 
 thismodule = sys.modules[__name__]
 
+variants = (("", dict()), ("Preprocessed", {"preprocess": True}))
+modes = (("", ()), ("Async", (AsyncSolve, )))
+
 for solver in synth.sat.Dimacs.SOLVER:
     if solver_exists(solver):
-        class_name = "Test{}Dimacs".format(solver.capitalize())
-        clazz = type(class_name, (TestSat, unittest.TestCase), {"SOLVER": solver})
-        setattr(thismodule, class_name, clazz)
+        for ((variant, options), (mode, bases)) in it.product(variants, modes):
+            class_name = "Test{}Dimacs{}{}".format(solver.capitalize(),
+                                                   variant, mode)
+            clazz = type(class_name, bases + (TestSat, unittest.TestCase),
+                         {"SOLVER": solver, "OPTIONS": options})
+            setattr(thismodule, class_name, clazz)
 
 for solver in synth.sat.QDimacs.SOLVER:
     if solver_exists(solver):
-        class_name = "Test{}QDimacs".format(solver.capitalize())
-        clazz = type(class_name, (TestQbf, unittest.TestCase), {"SOLVER": solver})
-        setattr(thismodule, class_name, clazz)
+        for ((variant, options), (mode, bases)) in it.product(variants, modes):
+            class_name = "Test{}QDimacs{}{}".format(solver.capitalize(),
+                                                    variant, mode)
+            clazz = type(class_name, bases + (TestQbf, unittest.TestCase),
+                         {"SOLVER": solver, "OPTIONS": options})
+            setattr(thismodule, class_name, clazz)
 
 
 if __name__ == '__main__':
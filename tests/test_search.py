@@ -5,6 +5,8 @@ import operator
 import unittest
 import hypothesis
 
+import synth.sat
+
 from .util import lattice_dimensions_with_lower_bound
 
 from synth.search import Simple
@@ -39,6 +41,19 @@ class DummySynthesizer:
         return dict()
 
 
+class UnknownSynthesizer(DummySynthesizer):
+    def __init__(self, dimensions, unknown):
+        super().__init__(dimensions)
+        self._unknown = unknown
+        self.probes = 0
+
+    def synth(self, *args):
+        if (self.m, self.n) in self._unknown:
+            self.probes += 1
+            raise synth.sat.Unknown("limit")
+        return super().synth(*args)
+
+
 class SearchBase:
     @hypothesis.given(lattice_dimensions_with_lower_bound())
     def test_search(self, dimensions_and_lower_bound):
@@ -57,6 +72,62 @@ class SearchBase:
         result_dim = (result.get("solution_height"), result.get("solution_width"))
         self.assertEqual(operator.mul(*minimal_dim), operator.mul(*result_dim))
 
+    def _setup_unknown(self, dimensions_and_lower_bound, unknown=None):
+        (lower_bound, dimensions) = dimensions_and_lower_bound
+        upper_bound = (len(dimensions), len(dimensions[0]))
+        minimal_dim = min(((m, n) for (m, row) in enumerate(dimensions, 1)
+                           for (n, value) in enumerate(row, 1)
+                            if value), key=lambda x: x[0]*x[1])
+        function = DummyFunction(lower_bound, upper_bound)
+        if unknown is None: unknown = {minimal_dim}
+        return (function, UnknownSynthesizer(dimensions, unknown),
+                DummySynthesizer(dimensions), minimal_dim)
+
+    @hypothesis.given(lattice_dimensions_with_lower_bound())
+    def test_unknown(self, dimensions_and_lower_bound):
+        (function, synthesizer, dummy, minimal_dim) = \
+            self._setup_unknown(dimensions_and_lower_bound)
+
+        result = self.SEARCH(function, synthesizer).synth()
+        self.assertEqual(synthesizer.probes, result["unknown_probes"])
+        if result.get("solution") is not None:
+            self.assertTrue(dummy._get(result["solution_height"],
+                                       result["solution_width"]))
+            result_dim = (result["solution_height"], result["solution_width"])
+            if operator.mul(*result_dim) == operator.mul(*minimal_dim):
+                return
+        # the only smaller lattice has no answer
+        self.assertIs(False, result.get("minimal"))
+
+    @hypothesis.given(lattice_dimensions_with_lower_bound())
+    def test_unknown_larger(self, dimensions_and_lower_bound):
+        (_lower_bound, dimensions) = dimensions_and_lower_bound
+        minimal_dim = min(((m, n) for (m, row) in enumerate(dimensions, 1)
+                           for (n, value) in enumerate(row, 1)
+                            if value), key=lambda x: x[0]*x[1])
+        larger = {(m, n) for m in range(1, len(dimensions) + 1)
+                  for n in range(1, len(dimensions[0]) + 1)
+                  if m * n > operator.mul(*minimal_dim)}
+        (function, synthesizer, _dummy, minimal_dim) = \
+            self._setup_unknown(dimensions_and_lower_bound, larger)
+
+        # the minimum lies behind the probes without answer
+        result = self.SEARCH(function, synthesizer).synth()
+        self.assertIsNotNone(result.get("solution"))
+        result_dim = (result["solution_height"], result["solution_width"])
+        self.assertEqual(operator.mul(*minimal_dim), operator.mul(*result_dim))
+        self.assertTrue(result.get("minimal", True))
+
+    @hypothesis.given(lattice_dimensions_with_lower_bound())
+    def test_retry(self, dimensions_and_lower_bound):
+        (function, synthesizer, dummy, minimal_dim) = \
+            self._setup_unknown(dimensions_and_lower_bound)
+
+        result = self.SEARCH(function, synthesizer, retry=dummy).synth()
+        self.assertEqual(0, result["unknown_probes"])
+        result_dim = (result.get("solution_height"), result.get("solution_width"))
+        self.assertEqual(operator.mul(*minimal_dim), operator.mul(*result_dim))
+
 
 thismodule = sys.modules[__name__]
 
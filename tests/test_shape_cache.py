@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+import synth.sat
+import synth.constraint as constraint
+import synth.base.shape_cache as shape_cache
+
+
+def at_most_one(slots, next_aux):
+    yield from constraint.at_most_clauses(slots, 1, next_aux)
+
+
+class TestShapeCache(unittest.TestCase):
+    def setUp(self):
+        shape_cache.clear()
+        self.generated = 0
+
+    def tearDown(self):
+        shape_cache.persist(None)
+        shape_cache.clear()
+        constraint.override(None)
+
+    def generate(self, slots, next_aux):
+        self.generated += 1
+        yield from at_most_one(slots, next_aux)
+
+    def solutions(self, key):
+        solver = synth.sat.Minisat()
+        interface = solver.new_variables(4)
+        solver.add_clauses(shape_cache.clauses(solver, key, interface,
+                                               self.generate))
+        return [solver._solver.solve(assumptions=[interface[a], interface[b]])
+                for a in range(4) for b in range(4) if a != b]
+
+    def test_reused(self):
+        self.assertEqual([False] * 12, self.solutions(("at_most_one", 4)))
+        self.assertEqual([False] * 12, self.solutions(("at_most_one", 4)))
+        self.assertEqual(1, self.generated)
+
+    def test_fresh_auxiliaries(self):
+        constraint.override("cardnet")
+        solver = synth.sat.Minisat()
+        interface = solver.new_variables(4)
+        first = list(shape_cache.clauses(solver, ("key", ), interface,
+                                         self.generate))
+        second = list(shape_cache.clauses(solver, ("key", ), interface,
+                                          self.generate))
+        variables = lambda clauses: {abs(x) for c in clauses for x in c}
+        self.assertEqual(set(interface),
+                         variables(first) & variables(second))
+
+    def test_selection_function(self):
+        constraint.override(lambda kind, arity, p: None)
+        self.solutions(("at_most_one", 4))
+        self.solutions(("at_most_one", 4))
+        self.assertEqual(2, self.generated)
+
+    def test_persisted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            shape_cache.persist(directory)
+            self.solutions(("at_most_one", 4))
+            self.assertEqual(1, len(os.listdir(directory)))
+
+            shape_cache.clear()
+            self.assertEqual([False] * 12, self.solutions(("at_most_one", 4)))
+            self.assertEqual(1, self.generated)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 import sys
 import unittest
 import hypothesis
+import hypothesis.strategies as st
 
 from .util import solver_exists
 from .util import test_lattice
@@ -24,8 +25,10 @@ class TestDualProductConstruction(unittest.TestCase):
 
 
 class SynthBase:
+    OPTIONS = dict()
+
     def synthesizer(self, function, m, n, no_decode=False):
-        method = self.METHOD.with_solver(self.SOLVER, no_decode)
+        method = self.METHOD.with_solver(self.SOLVER, no_decode, **self.OPTIONS)
         return method(function, m, n)
 
     @hypothesis.given(function_and_bounds())
@@ -45,35 +48,115 @@ class SynthBaseExtended(SynthBase):
         self.assertTrue(test_lattice(function, solution))
 
 
+class EncodingEquivalenceBase:
+    def solver_with(self, function, m, n, encoding):
+        synthesizer = self.METHOD(function, m, n, self.SOLVER,
+                                  encoding=encoding)
+        solver = synthesizer.solver()
+        for clause in synthesizer._assert_variables_set():
+            solver.add(clause)
+        for clause in synthesizer._assert_one_literal_used():
+            solver.add(clause)
+        literals = synthesizer._encode_literals_at_position(solver)
+        for assignment in function.function.iter_domain():
+            synthesizer._add_assertions_per_assignment(solver, assignment,
+                                                       literals)
+        return (synthesizer, solver)
+
+    @hypothesis.given(function_and_bounds(), st.data())
+    def test_equivalent_encoding(self, function_bounds, data):
+        (function, (m, n)) = function_bounds
+        (synthesizer, pyeda_solver) = self.solver_with(function, m, n, "pyeda")
+        (_, integer_solver) = self.solver_with(function, m, n, "integer")
+
+        inputs = list(synthesizer._input_literals())
+        random_lattice = [[data.draw(st.sampled_from(inputs))
+                           for _ in range(n)] for _ in range(m)]
+        lattices = (synth.DualProductConstruction(function).synth(),
+                    random_lattice)
+
+        for lattice in lattices:
+            assumptions = {synthesizer._literal_at_position_is(i, j, x): True
+                           for (i, row) in enumerate(lattice, 1)
+                           for (j, x) in enumerate(row, 1)}
+            expected = pyeda_solver.solve(assumptions=assumptions)
+            actual = integer_solver.solve(assumptions=assumptions)
+            self.assertEqual(expected is None, actual is None)
+
+
 thismodule = sys.modules[__name__]
 modules = (("irredundant", synth.irredundant),
            ("reachability", synth.reachability))
+unfolded_variants = (("Pyeda", {"encoding": "pyeda"}),
+                     ("Integer", {"encoding": "integer"}),
+                     ("Unpropagated", {"encoding": "integer",
+                                       "propagate_constants": False}),
+                     ("Symmetry", {"encoding": "integer",
+                                   "symmetry_breaking": True}),
+                     ("Reduced", {"encoding": "integer",
+                                  "reduce_domain": True}))
+reachability_variants = (("Deepening", {"path_deepening": True}), )
+tseitin_variant = (("Tseitin", {"tseitin_threshold": 0}), )
+pruning_variants = (("Symmetry", {"symmetry_breaking": True}),
+                    ("Reduced", {"reduce_domain": True}))
 
 for solver in ("libminisat", ): #synth.sat.Dimacs.SOLVER:
     if solver_exists(solver):
         for (method_name, method_module) in modules:
-            class_name = "TestQBFUnfolded{}{}".format(solver.capitalize(),
-                                                      method_name.capitalize())
-            clazz = type(class_name, (SynthBaseExtended, unittest.TestCase),
+            variants = unfolded_variants + (reachability_variants
+                if method_module is synth.reachability else ())
+            for (variant, options) in variants:
+                class_name = "TestQBFUnfolded{}{}{}".format(
+                    solver.capitalize(), method_name.capitalize(), variant)
+                clazz = type(class_name, (SynthBaseExtended, unittest.TestCase),
+                            {"METHOD": method_module.QBFUnfolded,
+                             "SOLVER": solver, "OPTIONS": options})
+                setattr(thismodule, class_name, clazz)
+
+for solver in ("libminisat", "isolver"): #synth.sat.Dimacs.SOLVER:
+    if solver_exists(solver):
+        for (method_name, method_module) in modules:
+            variants = unfolded_variants + tseitin_variant + (reachability_variants
+                if method_module is synth.reachability else ())
+            for (variant, options) in variants:
+                class_name = "TestCegarSynth{}{}{}".format(
+                    solver.capitalize(), method_name.capitalize(), variant)
+                clazz = type(class_name, (SynthBaseExtended, unittest.TestCase),
+                            {"METHOD": method_module.CegarSynth,
+                             "SOLVER": solver, "OPTIONS": options})
+                setattr(thismodule, class_name, clazz)
+
+for solver in ("libminisat", ):
+    if solver_exists(solver):
+        for (method_name, method_module) in modules:
+            class_name = "TestEncodingEquivalence{}{}".format(
+                solver.capitalize(), method_name.capitalize())
+            clazz = type(class_name, (EncodingEquivalenceBase, unittest.TestCase),
                         {"METHOD": method_module.QBFUnfolded, "SOLVER": solver})
             setattr(thismodule, class_name, clazz)
 
-for solver in ("libminisat", ): #synth.sat.Dimacs.SOLVER:
-    if solver_exists(solver):
-        for (method_name, method_module) in modules:
-            class_name = "TestCegarSynth{}{}".format(solver.capitalize(),
-                                                      method_name.capitalize())
+if solver_exists("depqbf"):
+    for (method_name, method_module) in modules:
+        for (variant, options) in (("", dict()), ) + tseitin_variant \
+                                  + pruning_variants:
+            class_name = "TestQBFSynth{}{}{}".format("depqbf".capitalize(),
+                                                     method_name.capitalize(),
+                                                     variant)
             clazz = type(class_name, (SynthBaseExtended, unittest.TestCase),
-                        {"METHOD": method_module.CegarSynth, "SOLVER": solver})
+                        {"METHOD": method_module.QBFSynth, "SOLVER": "depqbf",
+                         "OPTIONS": options})
             setattr(thismodule, class_name, clazz)
 
 if solver_exists("depqbf"):
     for (method_name, method_module) in modules:
-        class_name = "TestQBFSynth{}{}".format("depqbf".capitalize(),
-                                               method_name.capitalize())
-        clazz = type(class_name, (SynthBaseExtended, unittest.TestCase),
-                    {"METHOD": method_module.QBFSynth, "SOLVER": "depqbf"})
-        setattr(thismodule, class_name, clazz)
+        for (variant, options) in (("", dict()),
+                                   ("Expanded", {"expanded_inputs": 8})):
+            class_name = "TestHybridSynth{}{}{}".format(
+                "depqbf".capitalize(), method_name.capitalize(), variant)
+            clazz = type(class_name, (SynthBaseExtended, unittest.TestCase),
+                        {"METHOD": method_module.HybridSynth, "SOLVER": "depqbf",
+                         "OPTIONS": options})
+            setattr(thismodule, class_name, clazz)
 
 if solver_exists("rareqs"):
     for (method_name, method_module) in modules:
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import unittest
+import hypothesis
+import pyeda.boolalg.expr as expr
+
+from .util import complex_functions
+
+import synth
+import synth.irredundant
+
+
+class TestTruthTable(unittest.TestCase):
+    @hypothesis.given(complex_functions())
+    def test_function_values(self, bool_function):
+        table = synth.Function(None, bool_function).truth_table()
+        self.assertEqual(len(table), 1 << len(bool_function.support))
+        for assignment in bool_function.iter_domain():
+            expected = bool_function.compose(assignment).simplify().is_one()
+            self.assertEqual(expected, table.function[table.index(assignment)])
+
+    @hypothesis.given(complex_functions())
+    def test_literal_values(self, bool_function):
+        table = synth.Function(None, bool_function).truth_table()
+        literals = [l for x in bool_function.support for l in (x, ~x)]
+        (ones, zeros) = table.literal_values(literals)
+        for assignment in bool_function.iter_domain():
+            row = table.index(assignment)
+            for (index, literal) in enumerate(literals):
+                value = literal.compose(assignment).simplify()
+                self.assertEqual(value.is_one(), ones[row, index])
+                self.assertEqual(value.is_zero(), zeros[row, index])
+
+    @hypothesis.given(complex_functions())
+    def test_symmetric(self, bool_function):
+        table = synth.Function(None, bool_function).truth_table()
+        inputs = bool_function.inputs
+        for (a, b) in zip(inputs, inputs[1:]):
+            for skew in (False, True):
+                (c, d) = (~b, ~a) if skew else (b, a)
+                swapped = bool_function.compose({a: c, b: d})
+                expected = swapped.equivalent(bool_function)
+                self.assertEqual(expected, table.symmetric(a, b, skew))
+
+
+class TestSymmetry(unittest.TestCase):
+    def setUp(self):
+        self.inputs = tuple(expr.exprvar(x) for x in "abcd")
+
+    def test_majority(self):
+        (a, b, c, _d) = self.inputs
+        function = synth.Function(None, a & b | a & c | b & c)
+        self.assertEqual([(a, b, c)], function.symmetry_groups())
+        self.assertEqual([(a, b, False), (b, c, False)],
+                         list(function.symmetric_pairs()))
+
+    def test_groups(self):
+        (a, b, c, d) = self.inputs
+        function = synth.Function(None, a & b | c & d)
+        self.assertEqual([(a, b), (c, d)], function.symmetry_groups())
+
+    def test_skew(self):
+        (a, b, _c, _d) = self.inputs
+        function = synth.Function(None, a & ~b)
+        self.assertEqual([], function.symmetry_groups())
+        self.assertEqual([(a, b, True)], list(function.symmetric_pairs()))
+
+
+class TestAdmissibleLiterals(unittest.TestCase):
+    def test_unate(self):
+        (a, b, c) = (expr.exprvar(x) for x in "abc")
+        function = synth.Function(None, a & ~b | a & c)
+        self.assertEqual({a, ~b, c}, function.admissible_literals())
+
+    def test_binate(self):
+        (a, b) = (expr.exprvar(x) for x in "ab")
+        function = synth.Function(None, a & ~b | ~a & b)
+        self.assertEqual({a, ~a, b, ~b}, function.admissible_literals())
+
+    @hypothesis.given(complex_functions())
+    def test_reduced_positions(self, bool_function):
+        function = synth.Function(None, bool_function)
+        synthesizer = synth.irredundant.QBFUnfolded(function, 2, 2,
+                                                    reduce_domain=True)
+        literals = list(synthesizer._input_literals())
+        self.assertIn(expr.exprvar("constant"), literals)
+        self.assertIn(~expr.exprvar("constant"), literals)
+        for literal in literals:
+            variable = ~literal if isinstance(literal, expr.Complement) \
+                       else literal
+            if variable in bool_function.support:
+                self.assertIn(literal, function.admissible_literals())
+
+
+class TestInputsByFrequency(unittest.TestCase):
+    def test_order(self):
+        (a, b, c) = (expr.exprvar(x) for x in "abc")
+        function = synth.Function(None, a & b | a & c)
+        self.assertEqual([a, b, c], function.inputs_by_frequency())
+        function = synth.Function(None, a & c | b & c)
+        self.assertEqual([c, a, b], function.inputs_by_frequency())
+
+    def test_expanded(self):
+        (a, b, c) = (expr.exprvar(x) for x in "abc")
+        function = synth.Function(None, a & b | a & c)
+        synthesizer = synth.irredundant.HybridSynth(function, 2, 2,
+                                                    expanded_inputs=5)
+        self.assertEqual([a, b], synthesizer._expanded())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import unittest
+import hypothesis
+import hypothesis.strategies as st
+import pyeda.boolalg.expr as expr
+
+from .util import literals
+from .util import complex_functions
+
+import synth.constraint.tseitin as tseitin
+
+
+@st.composite
+def operators(draw, children):
+    binary = (expr.Xor, expr.Equal, expr.Implies)
+    ternary = (expr.ITE, )
+    operator = draw(st.sampled_from(binary + ternary + (expr.Not, )))
+    if operator is expr.Not: return expr.Not(draw(children), simplify=False)
+    arity = 3 if operator in ternary else 2
+    return operator(*(draw(children) for _ in range(arity)), simplify=False)
+
+
+def mixed_functions():
+    extend = lambda c: st.one_of(operators(c), complex_functions())
+    return st.recursive(literals(), extend, max_leaves=8)
+
+
+class TestTseitin(unittest.TestCase):
+    def check_equisatisfiable(self, formula):
+        clauses = list(tseitin.encode(formula))
+        for assignment in formula.iter_domain():
+            expected = formula.restrict(assignment).is_one()
+            restricted = expr.And(*clauses).restrict(assignment)
+            self.assertEqual(expected, restricted.satisfy_one() is not None)
+
+    @hypothesis.given(complex_functions())
+    def test_implies(self, function):
+        path = expr.exprvar("path")
+        self.check_equisatisfiable(expr.Implies(function, path))
+        self.check_equisatisfiable(expr.Implies(~function, path))
+
+    @hypothesis.given(mixed_functions())
+    def test_operators(self, function):
+        self.check_equisatisfiable(function)
+        self.check_equisatisfiable(expr.Not(function, simplify=False))
+
+    @hypothesis.given(complex_functions())
+    def test_cnf_size(self, function):
+        formula = expr.Implies(function, expr.exprvar("path"))
+        cnf = formula.to_cnf()
+        clauses = len(cnf.xs) if cnf.ASTOP == "and" else 1
+        self.assertLessEqual(clauses, tseitin.cnf_size(formula))
+
+    def test_linear_xor(self):
+        inputs = [expr.exprvar("x", i) for i in range(16)]
+        formula = expr.Implies(expr.Xor(*inputs), expr.exprvar("path"))
+        clauses = list(tseitin.encode(formula))
+        self.assertLess(len(clauses), 4 * len(inputs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import unittest
+import hypothesis
+import hypothesis.strategies as st
+
+import synth.sat
+from synth.reachability.unrolling import Unrolling
+
+
+@st.composite
+def lattices(draw):
+    m = draw(st.integers(min_value=2, max_value=4))
+    n = draw(st.integers(min_value=2, max_value=4))
+    switches = draw(st.lists(st.booleans(), min_size=m * n, max_size=m * n))
+    return (m, n, switches)
+
+
+class TestUnrolling(unittest.TestCase):
+    def reachable(self, unrolling, switches):
+        result = set(unrolling.start.nonzero()[0].tolist())
+        for _ in range(unrolling.rounds):
+            result |= {c for c in range(unrolling.size)
+                       if any(c_ in result and switches[c_]
+                              for c_ in unrolling.neighbours[c] if c_ >= 0)}
+        return result
+
+    def satisfiable(self, unrolling, switches, cell):
+        solver = synth.sat.Minisat()
+        size = unrolling.size
+        switch = solver.new_variables(size)
+        reachable = solver.new_variables(size * (unrolling.rounds + 1))
+        step = solver.new_variables(size * unrolling.rounds)
+        solver.add_clauses(unrolling.clauses(switch, reachable, step))
+        solver.add_clauses([s if v else -s] for (s, v) in zip(switch, switches))
+        solver.add_clauses([[reachable[-size + cell]]])
+        return solver.solve(no_decode=True) is not None
+
+    def check(self, lattice, diagonal):
+        (m, n, switches) = lattice
+        unrolling = Unrolling(m, n, diagonal, (m * n) // 2)
+        expected = self.reachable(unrolling, switches)
+        for cell in range(unrolling.size):
+            self.assertEqual(cell in expected,
+                             self.satisfiable(unrolling, switches, cell))
+
+    @hypothesis.given(lattices())
+    def test_positive(self, lattice):
+        self.check(lattice, False)
+
+    @hypothesis.given(lattices())
+    def test_negative(self, lattice):
+        self.check(lattice, True)
+
+    def satisfiable_continued(self, first, second, switches, cell):
+        solver = synth.sat.Minisat()
+        (size, rounds) = (first.size, first.rounds + second.rounds)
+        switch = solver.new_variables(size)
+        reachable = solver.new_variables(size * (rounds + 1))
+        step = solver.new_variables(size * rounds)
+        (middle, split) = (size * (first.rounds + 1), size * first.rounds)
+        solver.add_clauses(first.clauses(switch, reachable[:middle],
+                                         step[:split]))
+        solver.add_clauses(second.clauses(switch, reachable[middle - size:],
+                                          step[split:], initial=False))
+        solver.add_clauses([s if v else -s] for (s, v) in zip(switch, switches))
+        solver.add_clauses([[reachable[-size + cell]]])
+        return solver.solve(no_decode=True) is not None
+
+    @hypothesis.given(lattices(), st.booleans())
+    def test_continued(self, lattice, diagonal):
+        (m, n, switches) = lattice
+        rounds = (m * n) // 2
+        first = Unrolling(m, n, diagonal, rounds // 2)
+        second = Unrolling(m, n, diagonal, rounds - first.rounds)
+        expected = self.reachable(Unrolling(m, n, diagonal, rounds), switches)
+        for cell in range(first.size):
+            self.assertEqual(cell in expected, self.satisfiable_continued(
+                first, second, switches, cell))
+
+    def test_neighbours(self):
+        unrolling = Unrolling(3, 3, False, 4)
+        self.assertEqual([1, 3, 5, 7], unrolling.neighbours[4].tolist())
+        self.assertEqual([1, 3], [c for c in unrolling.neighbours[0] if c >= 0])
+        unrolling = Unrolling(3, 3, True, 4)
+        self.assertEqual([0, 1, 2, 3, 5, 6, 7, 8], unrolling.neighbours[4].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
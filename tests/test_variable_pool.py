@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import unittest
+import pyeda.boolalg.expr as expr
+
+import synth
+import synth.irredundant
+from synth.util import VariablePool
+from synth.util import expr_clauses
+
+
+class TestVariablePool(unittest.TestCase):
+    def test_variable(self):
+        pool = VariablePool()
+        (a, b) = (expr.exprvar("a"), expr.exprvar("b"))
+        self.assertEqual(1, pool.variable(a))
+        self.assertEqual(2, pool.variable(b))
+        self.assertEqual(1, pool.variable(a))
+        self.assertEqual(b, pool.decode(2))
+        self.assertEqual(2, len(pool))
+
+    def test_find(self):
+        pool = VariablePool()
+        pool.variable("a")
+        self.assertEqual(1, pool.find("a"))
+        self.assertIsNone(pool.find("b"))
+        self.assertEqual(1, len(pool))
+
+    def test_fresh(self):
+        pool = VariablePool()
+        integers = [pool.fresh() for _ in range(3)]
+        self.assertEqual([1, 2, 3], integers)
+        self.assertEqual(4, pool.fresh("key"))
+        self.assertEqual([None, None, None, "key"], list(pool))
+
+    def test_release(self):
+        pool = VariablePool()
+        pool.variable("a")
+        pool.release()
+        self.assertEqual(0, len(pool))
+        self.assertEqual(1, pool.fresh())
+
+    def test_aux_reused_after_synthesis(self):
+        (a, b) = (expr.exprvar("a"), expr.exprvar("b"))
+        function = synth.Function(None, a & b | ~a & ~b)
+        synthesizer = synth.irredundant.CegarSynth(function, 2, 2)
+        synthesizer.synth()
+        self.assertEqual(expr.exprvar("synth", 1), synthesizer._next_aux())
+
+
+
+class TestExprClauses(unittest.TestCase):
+    @staticmethod
+    def generate(inputs, next_aux, equivalent):
+        aux = next_aux()
+        yield [-equivalent, aux]
+        yield [-aux] + inputs
+
+    def test_decode(self):
+        (a, b, e) = (expr.exprvar(x) for x in "abe")
+        names = iter(expr.exprvar("x", i) for i in range(3))
+        clauses = list(expr_clauses(self.generate, [a, ~b], equivalent=e,
+                                    new_variable=lambda: next(names)))
+        x = expr.exprvar("x", 0)
+        expected = [expr.Or(~e, x), expr.Or(~x, a, ~b)]
+        self.assertEqual(2, len(clauses))
+        for (clause, other) in zip(clauses, expected):
+            self.assertTrue(clause.equivalent(other))
+
+    def test_prefix(self):
+        (a, e) = (expr.exprvar("a"), expr.exprvar("e"))
+        aux = expr.exprvar("test", 0)
+        for _ in range(2):
+            (clause, _) = expr_clauses(self.generate, [a], equivalent=e,
+                                       prefix="test")
+            # named per call
+            self.assertTrue(clause.equivalent(expr.Or(~e, aux)))
+
+
+if __name__ == '__main__':
+    unittest.main()
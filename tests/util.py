@@ -10,7 +10,7 @@ import synth
 
 
 def solver_exists(name):
-    if name in ("libcryptominisat", "libminisat"): return True
+    if name in ("libcryptominisat", "libminisat", "isolver"): return True
     try: subprocess.run([name], input="", stdout=subprocess.PIPE,
                         stderr=subprocess.PIPE)
     except FileNotFoundError: return False